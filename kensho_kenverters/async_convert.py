@@ -0,0 +1,201 @@
+# Copyright 2024-present Kensho Technologies, LLC.
+"""Asyncio API to run the converters in an executor without blocking the event loop.
+
+Loading and converting a large document takes hundreds of milliseconds of CPU time. The
+converters run in a thread or process executor instead, and a semaphore bounds the number of
+conversions in flight, so callers can start one conversion per incoming document and let the
+excess wait without queueing unbounded work in the executor.
+"""
+
+import asyncio
+import functools
+import os
+import threading
+import weakref
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, Any, AsyncIterable, Callable, TypeVar
+
+from .convert_output import (
+    convert_output_to_items_list_and_relations,
+    convert_output_to_markdown,
+    convert_output_to_str,
+)
+from .extract_output_models import (
+    ConvertOutputResult,
+    SerializedDocumentType,
+    TableGridAndStructure,
+)
+from .output_to_tables import build_table_grids, extract_pd_dfs_from_output
+from .utils import load_output_from_json
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Default number of conversions in flight at once
+DEFAULT_MAX_CONCURRENCY = 4
+# Default maximum size of documents read from async iterables, in bytes
+DEFAULT_MAX_DOCUMENT_SIZE = 1 << 30
+
+ResultType = TypeVar("ResultType")
+
+AsyncDocumentType = (
+    SerializedDocumentType | bytes | os.PathLike[str] | AsyncIterable[bytes]
+)
+
+
+def _load_and_convert(
+    converter: Callable[..., ResultType],
+    serialized_document: SerializedDocumentType | bytes | os.PathLike[str],
+    options: dict[str, Any],
+) -> ResultType:
+    """Load the document if it is JSON, then convert it. Runs in the executor."""
+    if isinstance(serialized_document, (bytes, os.PathLike)):
+        serialized_document = load_output_from_json(
+            serialized_document, lazy_text_node_data=True
+        )
+    return converter(serialized_document, **options)
+
+
+class AsyncConverter:
+    """Run converters in an executor, with a bounded number of conversions in flight.
+
+    Pydantic holds the GIL while it validates a whole document, so with a thread executor the
+    event loop still stalls while a large document loads. Process executors keep the event loop
+    responsive and convert in parallel, but the document and the result are pickled to and from
+    the worker, so pass JSON bytes or file paths rather than loaded documents to them.
+
+    A converter can be used from several event loops, for example across asyncio.run calls.
+    Every event loop gets its own semaphore, so max_concurrency applies per event loop.
+    """
+
+    def __init__(
+        self,
+        executor: Executor | None = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_document_size: int = DEFAULT_MAX_DOCUMENT_SIZE,
+    ) -> None:
+        """Convert in the executor, or the default executor of the event loop if None.
+
+        Args:
+            executor: the executor running the conversions
+            max_concurrency: the maximum number of conversions in flight per event loop
+            max_document_size: the maximum size of documents read from async iterables, in bytes
+        """
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self.max_document_size = max_document_size
+        # Semaphores are bound to the event loop they are first used in
+        self._semaphores: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, asyncio.Semaphore
+        ] = weakref.WeakKeyDictionary()
+        self._semaphores_lock = threading.Lock()
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Get the semaphore of the running event loop, creating it on first use."""
+        loop = asyncio.get_running_loop()
+        with self._semaphores_lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def _read_document(self, chunks: AsyncIterable[bytes]) -> bytes:
+        """Read a document from an async iterable of byte chunks, up to the maximum size."""
+        document_chunks = []
+        document_size = 0
+        async for chunk in chunks:
+            document_size += len(chunk)
+            if document_size > self.max_document_size:
+                raise ValueError(
+                    f"The document is larger than {self.max_document_size} bytes"
+                )
+            document_chunks.append(chunk)
+        return b"".join(document_chunks)
+
+    async def convert(
+        self,
+        converter: Callable[..., ResultType],
+        serialized_document: AsyncDocumentType,
+        **options: Any,
+    ) -> ResultType:
+        """Convert a document in the executor once fewer than max_concurrency are in flight.
+
+        Args:
+            converter: a converter taking the document as first argument, for example
+                convert_output_to_markdown. It must be picklable for process executors.
+            serialized_document: a serialized document, or the ExtractOutputModel loaded from it.
+                JSON bytes, the path of a JSON file, or an async iterable of JSON byte chunks are
+                loaded in the executor. Chunks are read once the semaphore is acquired.
+            options: the keyword arguments of the converter
+
+        Returns:
+            the result of converter(serialized_document, **options)
+
+        Raises:
+            ValueError: if an async iterable yields more than max_document_size bytes
+        """
+        loop = asyncio.get_running_loop()
+        async with self._get_semaphore():
+            if isinstance(serialized_document, AsyncIterable):
+                serialized_document = await self._read_document(serialized_document)
+            return await loop.run_in_executor(
+                self.executor,
+                functools.partial(
+                    _load_and_convert, converter, serialized_document, options
+                ),
+            )
+
+    async def convert_output_to_markdown(
+        self, serialized_document: AsyncDocumentType
+    ) -> str:
+        """Convert a document to markdown as convert_output.convert_output_to_markdown."""
+        return await self.convert(convert_output_to_markdown, serialized_document)
+
+    async def convert_output_to_str(
+        self, serialized_document: AsyncDocumentType
+    ) -> str:
+        """Convert a document to text as convert_output.convert_output_to_str."""
+        return await self.convert(convert_output_to_str, serialized_document)
+
+    async def convert_output_to_items_list_and_relations(
+        self,
+        serialized_document: AsyncDocumentType,
+        return_locations: bool = False,
+        return_relations: bool = False,
+    ) -> ConvertOutputResult:
+        """Convert a document to items as convert_output_to_items_list_and_relations."""
+        return await self.convert(
+            convert_output_to_items_list_and_relations,
+            serialized_document,
+            return_locations=return_locations,
+            return_relations=return_relations,
+        )
+
+    async def build_table_grids(
+        self,
+        serialized_document: AsyncDocumentType,
+        duplicate_merged_cells_content_flag: bool = True,
+    ) -> dict[str, TableGridAndStructure]:
+        """Build the table grids of a document as output_to_tables.build_table_grids."""
+        return await self.convert(
+            build_table_grids,
+            serialized_document,
+            duplicate_merged_cells_content_flag=duplicate_merged_cells_content_flag,
+        )
+
+    async def extract_pd_dfs_from_output(
+        self,
+        serialized_document: AsyncDocumentType,
+        duplicate_merged_cells_content_flag: bool = True,
+        use_first_row_as_header: bool = True,
+        include_figure_extracted_table: bool = False,
+    ) -> list["pd.DataFrame"]:
+        """Extract the tables of a document as output_to_tables.extract_pd_dfs_from_output."""
+        return await self.convert(
+            extract_pd_dfs_from_output,
+            serialized_document,
+            duplicate_merged_cells_content_flag=duplicate_merged_cells_content_flag,
+            use_first_row_as_header=use_first_row_as_header,
+            include_figure_extracted_table=include_figure_extracted_table,
+        )
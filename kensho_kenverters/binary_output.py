@@ -0,0 +1,481 @@
+# Copyright 2024-present Kensho Technologies, LLC.
+"""Functions to save parsed Extract output to a binary file and reload it with mmap.
+
+The file holds the content nodes in pre-order as arrays, a table of the unique strings, the
+annotations as arrays and all locations in a single float32 array. Reloading maps the file and
+copies the arrays out, so no JSON is parsed or validated, then closes the mapping. Locations stay
+in a single array viewed as LocationModel objects on demand, and the text node data stays as
+JSON bytes until it is read.
+
+File layout: an 8 byte magic string, the length of the header as an 8 byte little endian
+integer, the JSON header describing every array section, then the sections aligned to 8 bytes.
+"""
+
+import json
+import mmap
+import os
+import tempfile
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+from .constants import AnnotationType
+from .extract_output_models import (
+    COMPACT_LOCATIONS_CONTEXT_KEY,
+    AnnotationDataModel,
+    AnnotationModel,
+    CompactLocations,
+    ContentModel,
+    ExtractOutputModel,
+    LazyTextNodeDataModel,
+    PDFPageModel,
+    RelationAnnotationDataModel,
+    RelationAnnotationModel,
+    SerializedDocumentType,
+    TableStructureAnnotationModel,
+    TextNodeDataModel,
+)
+from .utils import _construct_model, load_output_to_pydantic
+
+BINARY_FORMAT_MAGIC = b"KVOUTBIN"
+TEMPORARY_FILE_SUFFIX = ".tmp"
+BINARY_FORMAT_VERSION = 1
+# Index of missing strings, text node data and locations in the arrays
+NO_INDEX = -1
+
+_SECTION_ALIGNMENT = 8
+_HEADER_LENGTH_SIZE = 8
+# Annotation types, by their kind index in the annotation_kinds array
+_ANNOTATION_TYPES = [
+    AnnotationType.TABLE_STRUCTURE.value,
+    AnnotationType.FIGURE_EXTRACTED_TABLE_STRUCTURE.value,
+    AnnotationType.RELATION.value,
+]
+_IS_COLUMN_HEADER_FLAG = 1
+_IS_PROJECTED_ROW_HEADER_FLAG = 2
+
+
+class _StringTable:
+    """Table of unique strings, referenced by index."""
+
+    def __init__(self) -> None:
+        self._string_to_index: dict[str, int] = {}
+
+    def add(self, string: str | None) -> int:
+        """Get the index of a string, adding it if needed, or NO_INDEX for None."""
+        if string is None:
+            return NO_INDEX
+        return self._string_to_index.setdefault(string, len(self._string_to_index))
+
+    def to_arrays(self) -> tuple[npt.NDArray[np.uint8], npt.NDArray[np.int64]]:
+        """Get the UTF-8 bytes of all strings and the byte offset of each, with an end offset."""
+        encoded_strings = [string.encode("utf-8") for string in self._string_to_index]
+        string_offsets = np.zeros(len(encoded_strings) + 1, dtype=np.int64)
+        np.cumsum(
+            [len(encoded_string) for encoded_string in encoded_strings],
+            out=string_offsets[1:],
+        )
+        string_data = np.frombuffer(b"".join(encoded_strings), dtype=np.uint8)
+        return string_data, string_offsets
+
+
+class _LocationTable:
+    """Rows of all locations, with the start row of every list of locations."""
+
+    def __init__(self) -> None:
+        self.rows: list[tuple[float, float, float, float, int]] = []
+
+    def add(self, locations: Any) -> tuple[int, int]:
+        """Add a list of locations and get its (start, end) rows, or NO_INDEX for None."""
+        if locations is None:
+            return NO_INDEX, NO_INDEX
+        start = len(self.rows)
+        self.rows.extend(
+            (
+                location.height,
+                location.width,
+                location.x,
+                location.y,
+                location.page_number,
+            )
+            for location in locations
+        )
+        return start, len(self.rows)
+
+
+def _get_text_node_data_json(text_node_data: TextNodeDataModel) -> bytes:
+    """Serialize text node data to JSON bytes, reusing the raw data of lazy text node data."""
+    if isinstance(text_node_data, LazyTextNodeDataModel):
+        raw_json = text_node_data.get_raw_json()
+        if raw_json is not None:
+            return raw_json
+    return TextNodeDataModel.model_dump_json(text_node_data).encode("utf-8")
+
+
+def _get_document_arrays(
+    parsed_serialized_document: ExtractOutputModel,
+) -> tuple[dict[str, npt.NDArray[Any]], bool]:
+    """Get the array sections of a parsed document, and if it has PDF pages."""
+    string_table = _StringTable()
+    location_table = _LocationTable()
+
+    # Content nodes in pre-order
+    node_rows: list[tuple[int, int, int, int, int, int]] = []
+    text_node_data_chunks: list[bytes] = []
+    text_node_data_ranges: list[tuple[int, int]] = []
+    text_node_data_size = 0
+    content_stack = [parsed_serialized_document.content_tree]
+    while content_stack:
+        content = content_stack.pop()
+        location_start, location_end = location_table.add(content.locations)
+        node_rows.append(
+            (
+                string_table.add(content.uid),
+                string_table.add(content.type),
+                string_table.add(content.content),
+                len(content.children),
+                location_start,
+                location_end,
+            )
+        )
+        if content.text_node_data is None:
+            text_node_data_ranges.append((NO_INDEX, NO_INDEX))
+        else:
+            text_node_data_json = _get_text_node_data_json(content.text_node_data)
+            text_node_data_chunks.append(text_node_data_json)
+            text_node_data_ranges.append(
+                (text_node_data_size, text_node_data_size + len(text_node_data_json))
+            )
+            text_node_data_size += len(text_node_data_json)
+        content_stack.extend(reversed(content.children))
+
+    # Annotations
+    annotation_rows: list[tuple[int, ...]] = []
+    annotation_content_uids: list[int] = []
+    annotation_content_uid_starts = [0]
+    for annotation in parsed_serialized_document.annotations:
+        kind = _ANNOTATION_TYPES.index(annotation.type)
+        if isinstance(annotation, RelationAnnotationModel):
+            annotation_rows.append(
+                (
+                    kind,
+                    string_table.add(annotation.data.relation_type),
+                    string_table.add(annotation.data.source_content_uid),
+                    string_table.add(annotation.data.target_content_uid),
+                    0,
+                    0,
+                    NO_INDEX,
+                    0,
+                    NO_INDEX,
+                    NO_INDEX,
+                )
+            )
+        else:
+            data = annotation.data
+            location_start, location_end = location_table.add(annotation.locations)
+            annotation_rows.append(
+                (
+                    kind,
+                    data.index[0],
+                    data.index[1],
+                    data.span[0],
+                    data.span[1],
+                    0,
+                    string_table.add(data.value),
+                    (_IS_COLUMN_HEADER_FLAG if data.is_column_header else 0)
+                    | (
+                        _IS_PROJECTED_ROW_HEADER_FLAG
+                        if data.is_projected_row_header
+                        else 0
+                    ),
+                    location_start,
+                    location_end,
+                )
+            )
+            annotation_content_uids.extend(
+                string_table.add(uid) for uid in annotation.content_uids
+            )
+        annotation_content_uid_starts.append(len(annotation_content_uids))
+
+    pdf_pages = parsed_serialized_document.pdf_pages
+    string_data, string_offsets = string_table.to_arrays()
+    sections: dict[str, npt.NDArray[Any]] = {
+        "string_data": string_data,
+        "string_offsets": string_offsets,
+        "nodes": np.array(node_rows, dtype=np.int64).reshape(-1, 6),
+        "text_node_data": np.frombuffer(
+            b"".join(text_node_data_chunks), dtype=np.uint8
+        ),
+        "text_node_data_ranges": np.array(
+            text_node_data_ranges, dtype=np.int64
+        ).reshape(-1, 2),
+        "annotations": np.array(annotation_rows, dtype=np.int64).reshape(-1, 10),
+        "annotation_content_uids": np.array(annotation_content_uids, dtype=np.int64),
+        "annotation_content_uid_starts": np.array(
+            annotation_content_uid_starts, dtype=np.int64
+        ),
+        "locations": np.array(location_table.rows, dtype=np.float32).reshape(-1, 5),
+        "pdf_pages": np.array(
+            [
+                (pdf_page.height, pdf_page.width, pdf_page.required_ccw_rotation)
+                for pdf_page in pdf_pages or []
+            ],
+            dtype=np.float64,
+        ).reshape(-1, 3),
+    }
+    return sections, pdf_pages is not None
+
+
+def save_output_to_binary(
+    serialized_document: SerializedDocumentType, file_path: str | os.PathLike[str]
+) -> None:
+    """Save Extract output to a binary file that load_output_from_binary maps back in place.
+
+    Locations are stored as float32, so values with up to 7 significant digits load back the
+    same, as with compact_locations in load_output_to_pydantic.
+
+    Args:
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
+        file_path: the path of the binary file to write. The file is replaced atomically, so
+            documents loaded from it stay readable.
+    """
+    parsed_serialized_document = load_output_to_pydantic(
+        serialized_document, lazy_text_node_data=True
+    )
+    sections, has_pdf_pages = _get_document_arrays(parsed_serialized_document)
+
+    section_headers = {}
+    offset = 0
+    for name, section in sections.items():
+        section_headers[name] = {
+            "dtype": section.dtype.str,
+            "shape": list(section.shape),
+            "offset": offset,
+        }
+        offset += -(-section.nbytes // _SECTION_ALIGNMENT) * _SECTION_ALIGNMENT
+    header = json.dumps(
+        {
+            "version": BINARY_FORMAT_VERSION,
+            "has_pdf_pages": has_pdf_pages,
+            "sections": section_headers,
+        }
+    ).encode("utf-8")
+    # Pad the header so the sections start aligned
+    header += b" " * (-len(header) % _SECTION_ALIGNMENT)
+
+    # Write to a temporary file renamed into place, so loads running at the same time never map
+    # a truncated file
+    file_descriptor, temporary_file_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(file_path)), suffix=TEMPORARY_FILE_SUFFIX
+    )
+    try:
+        with os.fdopen(file_descriptor, "wb") as f:
+            f.write(BINARY_FORMAT_MAGIC)
+            f.write(len(header).to_bytes(_HEADER_LENGTH_SIZE, "little"))
+            f.write(header)
+            for section in sections.values():
+                section_bytes = np.ascontiguousarray(section).tobytes()
+                f.write(section_bytes)
+                f.write(b"\0" * (-len(section_bytes) % _SECTION_ALIGNMENT))
+        os.replace(temporary_file_path, file_path)
+    except BaseException:
+        os.remove(temporary_file_path)
+        raise
+
+
+def _read_sections(buffer: mmap.mmap) -> tuple[dict[str, npt.NDArray[Any]], bool]:
+    """Copy the array sections out of a mapped binary file, so the file can be unmapped."""
+    magic_length = len(BINARY_FORMAT_MAGIC)
+    if buffer[:magic_length] != BINARY_FORMAT_MAGIC:
+        raise ValueError("Not a binary Extract output file")
+    header_start = magic_length + _HEADER_LENGTH_SIZE
+    header_length = int.from_bytes(buffer[magic_length:header_start], "little")
+    header_end = header_start + header_length
+    header = json.loads(buffer[header_start:header_end])
+    if header["version"] != BINARY_FORMAT_VERSION:
+        raise ValueError(
+            f"Binary Extract output version must be {BINARY_FORMAT_VERSION}. "
+            f"Found {header['version']}"
+        )
+    sections_start = header_end
+    sections = {
+        name: np.frombuffer(
+            buffer,
+            dtype=np.dtype(section_header["dtype"]),
+            count=int(np.prod(section_header["shape"])),
+            offset=sections_start + section_header["offset"],
+        )
+        .reshape(section_header["shape"])
+        .copy()
+        for name, section_header in header["sections"].items()
+    }
+    return sections, header["has_pdf_pages"]
+
+
+def _get_locations(
+    location_array: npt.NDArray[np.float32], start: int, end: int
+) -> CompactLocations | None:
+    """View a range of rows of the location array, or None for NO_INDEX."""
+    if start == NO_INDEX:
+        return None
+    return CompactLocations(location_array, start, end)
+
+
+def load_output_from_binary(file_path: str | os.PathLike[str]) -> ExtractOutputModel:
+    """Load Extract output saved with save_output_to_binary by mapping the file.
+
+    The arrays of the file are copied out of the mapping, which is closed before returning, so
+    the document holds no file handle. Nodes and annotations are built from the arrays directly,
+    locations are CompactLocations views of the location array, and text node data is validated
+    from its JSON bytes the first time it is read. Locations load as with compact_locations in
+    load_output_to_pydantic.
+
+    Args:
+        file_path: the path of the binary file
+
+    Returns:
+        the parsed document, which can be passed to every converter
+    """
+    with open(file_path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as buffer:
+        sections, has_pdf_pages = _read_sections(buffer)
+
+    string_offsets = sections["string_offsets"].tolist()
+    string_data = sections["string_data"].tobytes()
+    strings = [
+        string_data[start:end].decode("utf-8")
+        for start, end in zip(string_offsets[:-1], string_offsets[1:])
+    ]
+    location_array = sections["locations"]
+    text_node_data = sections["text_node_data"].tobytes()
+    text_node_data_context = {COMPACT_LOCATIONS_CONTEXT_KEY: True}
+
+    # Rebuild the content tree from the nodes in pre-order
+    root: ContentModel | None = None
+    # Open nodes with the number of children they still miss
+    open_nodes: list[tuple[ContentModel, int]] = []
+    for (uid, content_type, content, num_children, location_start, location_end), (
+        text_node_data_start,
+        text_node_data_end,
+    ) in zip(sections["nodes"].tolist(), sections["text_node_data_ranges"].tolist()):
+        node = _construct_model(
+            ContentModel,
+            {
+                "uid": strings[uid],
+                "type": strings[content_type],
+                "content": None if content == NO_INDEX else strings[content],
+                "children": [],
+                "locations": _get_locations(
+                    location_array, location_start, location_end
+                ),
+                "text_node_data": (
+                    None
+                    if text_node_data_start == NO_INDEX
+                    else LazyTextNodeDataModel.from_raw_data(
+                        text_node_data[text_node_data_start:text_node_data_end],
+                        text_node_data_context,
+                    )
+                ),
+            },
+        )
+        if open_nodes:
+            parent, num_missing_children = open_nodes.pop()
+            parent.children.append(node)
+            if num_missing_children > 1:
+                open_nodes.append((parent, num_missing_children - 1))
+        else:
+            root = node
+        if num_children > 0:
+            open_nodes.append((node, num_children))
+    if root is None:
+        raise ValueError("No content tree found in the binary Extract output file")
+
+    annotations: list[AnnotationModel] = []
+    annotation_content_uids = sections["annotation_content_uids"].tolist()
+    annotation_content_uid_starts = sections["annotation_content_uid_starts"].tolist()
+    for annotation_index, annotation_row in enumerate(sections["annotations"].tolist()):
+        kind, *values = annotation_row
+        annotation_type = _ANNOTATION_TYPES[kind]
+        if annotation_type == AnnotationType.RELATION.value:
+            relation_type, source_content_uid, target_content_uid = values[:3]
+            annotations.append(
+                _construct_model(
+                    RelationAnnotationModel,
+                    {
+                        "data": _construct_model(
+                            RelationAnnotationDataModel,
+                            {
+                                "relation_type": strings[relation_type],
+                                "source_content_uid": strings[source_content_uid],
+                                "target_content_uid": strings[target_content_uid],
+                            },
+                        ),
+                        "type": annotation_type,
+                    },
+                )
+            )
+            continue
+        (
+            row,
+            col,
+            row_span,
+            col_span,
+            _,
+            value,
+            flags,
+            location_start,
+            location_end,
+        ) = values
+        content_uid_start = annotation_content_uid_starts[annotation_index]
+        content_uid_end = annotation_content_uid_starts[annotation_index + 1]
+        annotations.append(
+            _construct_model(
+                TableStructureAnnotationModel,
+                {
+                    "content_uids": [
+                        strings[uid]
+                        for uid in annotation_content_uids[
+                            content_uid_start:content_uid_end
+                        ]
+                    ],
+                    "data": _construct_model(
+                        AnnotationDataModel,
+                        {
+                            "index": (row, col),
+                            "span": (row_span, col_span),
+                            "value": None if value == NO_INDEX else strings[value],
+                            "is_column_header": bool(flags & _IS_COLUMN_HEADER_FLAG),
+                            "is_projected_row_header": bool(
+                                flags & _IS_PROJECTED_ROW_HEADER_FLAG
+                            ),
+                        },
+                    ),
+                    "type": annotation_type,
+                    "locations": _get_locations(
+                        location_array, location_start, location_end
+                    ),
+                },
+            )
+        )
+
+    pdf_pages = [
+        _construct_model(
+            PDFPageModel,
+            {
+                "height": height,
+                "width": width,
+                "required_ccw_rotation": int(required_ccw_rotation),
+            },
+        )
+        for height, width, required_ccw_rotation in sections["pdf_pages"].tolist()
+    ]
+    return _construct_model(
+        ExtractOutputModel,
+        {
+            "annotations": annotations,
+            "content_tree": root,
+            "pdf_pages": pdf_pages if has_pdf_pages else None,
+        },
+    )
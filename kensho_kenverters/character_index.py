@@ -0,0 +1,309 @@
+# Copyright 2024-present Kensho Technologies, LLC.
+"""Index of character bounding boxes built from the text node data of the output.
+
+The text node data of each content node holds text runs, usually one per line, with the location
+of the run and the relative horizontal offset of every character in the run. The index flattens
+them into contiguous arrays, so the boxes of any character range can be found with a binary
+search instead of walking the nested lists.
+"""
+
+from dataclasses import dataclass
+from typing import Iterator, NamedTuple, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from .extract_output_models import ContentModel, LocationModel, SerializedDocumentType
+from .utils import load_output_to_pydantic
+
+# Page number of characters whose text run has no location
+NO_PAGE_NUMBER = -1
+
+
+class CharacterBoxes(NamedTuple):
+    """Bounding boxes of character ranges, with one row per query and text run in the range."""
+
+    query_indices: npt.NDArray[np.int64]
+    page_numbers: npt.NDArray[np.int64]
+    x: npt.NDArray[np.float64]
+    y: npt.NDArray[np.float64]
+    width: npt.NDArray[np.float64]
+    height: npt.NDArray[np.float64]
+
+
+@dataclass(frozen=True)
+class CharacterIndex:
+    """Character bounding box index of a document.
+
+    Character positions are offsets in the content string of each node. They are aligned with
+    the characters of the node's text runs on their non white space characters.
+
+    Attributes:
+        uid_to_node_index: content uid to node index
+        node_content_starts: start of each node in content_to_text_char, with one extra end value
+        content_to_text_char: for every content character, its index in the flattened text run
+            characters, or -1 if the node has no text runs
+        char_x_starts: left edge of every text run character
+        char_x_ends: right edge of every text run character
+        run_starts: index of the first character of each run, with one extra end value
+        run_page_numbers: page number of each run, or NO_PAGE_NUMBER if it has no location
+        run_y: top edge of each run
+        run_heights: height of each run
+    """
+
+    uid_to_node_index: dict[str, int]
+    node_content_starts: npt.NDArray[np.int64]
+    content_to_text_char: npt.NDArray[np.int64]
+    char_x_starts: npt.NDArray[np.float64]
+    char_x_ends: npt.NDArray[np.float64]
+    run_starts: npt.NDArray[np.int64]
+    run_page_numbers: npt.NDArray[np.int64]
+    run_y: npt.NDArray[np.float64]
+    run_heights: npt.NDArray[np.float64]
+
+    def get_character_boxes(
+        self,
+        content_uids: Sequence[str],
+        starts: Sequence[int] | npt.NDArray[np.int64],
+        ends: Sequence[int] | npt.NDArray[np.int64],
+    ) -> CharacterBoxes:
+        """Get the boxes of many character ranges at once with vectorized binary searches.
+
+        Args:
+            content_uids: the content uid of each query
+            starts: the first content character offset of each query
+            ends: the content character offset after the end of each query
+
+        Returns:
+            the boxes of all queries, with one row per query and text run it overlaps. Queries
+                on nodes without text node data or on empty ranges have no rows.
+        """
+        try:
+            node_indices = np.array(
+                [self.uid_to_node_index[uid] for uid in content_uids], dtype=np.int64
+            )
+        except KeyError as e:
+            raise KeyError(f"No text node data for content uid {e.args[0]}") from e
+        node_content_starts = self.node_content_starts[node_indices]
+        node_content_lengths = (
+            self.node_content_starts[node_indices + 1] - node_content_starts
+        )
+        starts_arr = np.clip(
+            np.asarray(starts, dtype=np.int64), 0, node_content_lengths
+        )
+        ends_arr = np.clip(np.asarray(ends, dtype=np.int64), 0, node_content_lengths)
+        query_indices = np.flatnonzero(ends_arr > starts_arr)
+
+        # First and last characters of each query in the flattened text run characters
+        first_chars = self.content_to_text_char[
+            node_content_starts[query_indices] + starts_arr[query_indices]
+        ]
+        last_chars = self.content_to_text_char[
+            node_content_starts[query_indices] + ends_arr[query_indices] - 1
+        ]
+        has_text = first_chars >= 0
+        query_indices = query_indices[has_text]
+        first_chars = first_chars[has_text]
+        last_chars = last_chars[has_text]
+
+        # One row per query and text run overlapping the query
+        first_runs = np.searchsorted(self.run_starts, first_chars, side="right") - 1
+        last_runs = np.searchsorted(self.run_starts, last_chars, side="right") - 1
+        num_runs = last_runs - first_runs + 1
+        row_group_starts = np.repeat(np.cumsum(num_runs) - num_runs, num_runs)
+        runs = np.repeat(first_runs, num_runs) + (
+            np.arange(int(num_runs.sum()), dtype=np.int64) - row_group_starts
+        )
+        row_first_chars = np.maximum(
+            np.repeat(first_chars, num_runs), self.run_starts[runs]
+        )
+        row_last_chars = np.minimum(
+            np.repeat(last_chars, num_runs), self.run_starts[runs + 1] - 1
+        )
+        row_query_indices = np.repeat(query_indices, num_runs)
+
+        keep = (self.run_page_numbers[runs] != NO_PAGE_NUMBER) & (
+            row_last_chars >= row_first_chars
+        )
+        runs = runs[keep]
+        row_first_chars = row_first_chars[keep]
+        row_last_chars = row_last_chars[keep]
+        x_starts = np.minimum(
+            self.char_x_starts[row_first_chars], self.char_x_ends[row_last_chars]
+        )
+        x_ends = np.maximum(
+            self.char_x_starts[row_first_chars], self.char_x_ends[row_last_chars]
+        )
+        return CharacterBoxes(
+            query_indices=row_query_indices[keep],
+            page_numbers=self.run_page_numbers[runs],
+            x=x_starts,
+            y=self.run_y[runs],
+            width=x_ends - x_starts,
+            height=self.run_heights[runs],
+        )
+
+    def get_character_locations(
+        self, content_uid: str, start: int, end: int
+    ) -> list[LocationModel]:
+        """Get the locations of the characters [start, end) of a content node.
+
+        Args:
+            content_uid: the content uid of the node
+            start: the first content character offset
+            end: the content character offset after the end of the range
+
+        Returns:
+            one location per text run, usually per line, covered by the range
+        """
+        character_boxes = self.get_character_boxes([content_uid], [start], [end])
+        return [
+            LocationModel(
+                height=float(height),
+                width=float(width),
+                x=float(x),
+                y=float(y),
+                page_number=int(page_number),
+            )
+            for page_number, x, y, width, height in zip(
+                character_boxes.page_numbers,
+                character_boxes.x,
+                character_boxes.y,
+                character_boxes.width,
+                character_boxes.height,
+            )
+        ]
+
+
+def _iter_content_nodes(content: ContentModel) -> Iterator[ContentModel]:
+    """Yield the content node and all its descendants."""
+    yield content
+    for child in content.children:
+        yield from _iter_content_nodes(child)
+
+
+def _align_content_to_text(content: str, text: str) -> list[int]:
+    """Get the index in text of every character of content, matching non white space characters.
+
+    White space in content maps to white space in text if there is one at that position, and
+    otherwise to the next text character. The mapping is monotonic even if the non white space
+    characters of content and text differ.
+    """
+    if not text:
+        return [-1] * len(content)
+    last_text_index = len(text) - 1
+    content_to_text = []
+    text_index = 0
+    for char in content:
+        if char.isspace():
+            content_to_text.append(min(text_index, last_text_index))
+            if text_index < len(text) and text[text_index].isspace():
+                text_index += 1
+        else:
+            while text_index < len(text) and text[text_index].isspace():
+                text_index += 1
+            content_to_text.append(min(text_index, last_text_index))
+            text_index += 1
+    return content_to_text
+
+
+def _get_relative_char_offsets(
+    text: str, character_offsets: Sequence[float] | None
+) -> list[float]:
+    """Get the relative start offset of every character of a text run.
+
+    Runs without offsets spread their characters evenly. Missing offsets are set to the end of
+    the run, and extra offsets are ignored.
+    """
+    if not character_offsets:
+        return [index / len(text) for index in range(len(text))]
+    relative_offsets = list(character_offsets[: len(text)])
+    relative_offsets += [1.0] * (len(text) - len(relative_offsets))
+    return relative_offsets
+
+
+def build_character_index(
+    serialized_document: SerializedDocumentType,
+) -> CharacterIndex:
+    """Build the character bounding box index of a document from its text node data.
+
+    Requires Extract output with character offsets. Nodes without text node data are not indexed.
+
+    Args:
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
+
+    Returns:
+        a CharacterIndex answering "which boxes hold characters start..end of content uid X"
+            with get_character_locations, or for many ranges at once with get_character_boxes
+
+    Example:
+        character_index = build_character_index(serialized_document)
+        character_index.get_character_locations("4", 0, 16)
+        [LocationModel(height=0.01188, width=0.12791, x=0.1, y=0.10141, page_number=0)]
+    """
+    parsed_serialized_document = load_output_to_pydantic(serialized_document)
+
+    uid_to_node_index: dict[str, int] = {}
+    node_content_starts = [0]
+    content_to_text_char: list[int] = []
+    char_relative_starts: list[float] = []
+    char_relative_ends: list[float] = []
+    char_runs: list[int] = []
+    run_starts = [0]
+    run_page_numbers: list[int] = []
+    run_locations: list[tuple[float, float, float, float]] = []
+
+    for content in _iter_content_nodes(parsed_serialized_document.content_tree):
+        text_node_data = content.text_node_data
+        if text_node_data is None or text_node_data.texts is None:
+            continue
+        node_text_start = run_starts[-1]
+        texts = text_node_data.texts
+        text_locations = text_node_data.text_locations or [None] * len(texts)
+        character_offsets = text_node_data.character_offsets or [None] * len(texts)
+        for text, text_location, run_character_offsets in zip(
+            texts, text_locations, character_offsets
+        ):
+            relative_starts = _get_relative_char_offsets(text, run_character_offsets)
+            char_relative_starts.extend(relative_starts)
+            char_relative_ends.extend(relative_starts[1:] + [1.0][: len(text)])
+            char_runs.extend([len(run_page_numbers)] * len(text))
+            run_starts.append(run_starts[-1] + len(text))
+            if text_location is None:
+                run_page_numbers.append(NO_PAGE_NUMBER)
+                run_locations.append((0.0, 0.0, 0.0, 0.0))
+            else:
+                run_page_numbers.append(text_location.page_number)
+                run_locations.append(
+                    (
+                        text_location.x,
+                        text_location.y,
+                        text_location.width,
+                        text_location.height,
+                    )
+                )
+        node_text = "".join(texts)
+        content_to_text_char.extend(
+            text_index + node_text_start if text_index >= 0 else -1
+            for text_index in _align_content_to_text(content.content or "", node_text)
+        )
+        uid_to_node_index[content.uid] = len(node_content_starts) - 1
+        node_content_starts.append(len(content_to_text_char))
+
+    run_locations_arr = np.array(run_locations, dtype=np.float64).reshape(-1, 4)
+    char_runs_arr = np.array(char_runs, dtype=np.int64)
+    char_run_x = run_locations_arr[char_runs_arr, 0]
+    char_run_widths = run_locations_arr[char_runs_arr, 2]
+    return CharacterIndex(
+        uid_to_node_index=uid_to_node_index,
+        node_content_starts=np.array(node_content_starts, dtype=np.int64),
+        content_to_text_char=np.array(content_to_text_char, dtype=np.int64),
+        char_x_starts=char_run_x
+        + np.array(char_relative_starts, dtype=np.float64) * char_run_widths,
+        char_x_ends=char_run_x
+        + np.array(char_relative_ends, dtype=np.float64) * char_run_widths,
+        run_starts=np.array(run_starts, dtype=np.int64),
+        run_page_numbers=np.array(run_page_numbers, dtype=np.int64),
+        run_y=run_locations_arr[:, 1].copy(),
+        run_heights=run_locations_arr[:, 3].copy(),
+    )
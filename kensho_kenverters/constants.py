@@ -2,7 +2,7 @@
 """Constants, enums, and type aliases for use across modules."""
 
 from enum import Enum
-from typing import TypeAlias
+from typing import Literal, TypeAlias, get_args
 
 CATEGORY_KEY = "category"
 TEXT_KEY = "text"
@@ -12,7 +12,20 @@ LOCATIONS_KEY = "locations"
 CONTENT_ID_KEY = "content_id"
 DOCUMENT_CATEGORY_KEY = "DOCUMENT"
 
+# Keys of the Extract output JSON
+OUTPUT_KEY = "output"
+ANNOTATIONS_KEY = "annotations"
+CONTENT_TREE_KEY = "content_tree"
+CHILDREN_KEY = "children"
+CONTENT_TYPE_KEY = "type"
+
 TableType: TypeAlias = list[list[str]]
+ChunkBudgetUnitType: TypeAlias = Literal["characters", "tokens"]
+OutputFormatType: TypeAlias = Literal[
+    "text", "markdown", "text_by_page", "markdown_by_page"
+]
+OUTPUT_FORMATS = frozenset(get_args(OutputFormatType))
+TableFileFormatType: TypeAlias = Literal["csv", "tsv"]
 
 
 class AnnotationType(Enum):
@@ -93,6 +106,22 @@ FIGURE_CONTENT_CATEGORIES = {
     ContentCategory.FIGURE.value,
 }
 
+# Nesting level of each section heading category, as lowercase item categories.
+# Sections of a heading contain every following section with a greater level.
+SECTION_HEADING_LEVELS = {
+    ContentCategory.TITLE.value.lower(): 0,
+    ContentCategory.H1.value.lower(): 1,
+    ContentCategory.H2.value.lower(): 2,
+    ContentCategory.H3.value.lower(): 3,
+    ContentCategory.H4.value.lower(): 4,
+    ContentCategory.H5.value.lower(): 5,
+}
+# Level of the section tree root, which contains the whole document
+DOCUMENT_SECTION_LEVEL = -1
+
 RELATIONS_BETWEEN_ITEMS = {"support"}
 
+# Approximate number of characters per token, used for token budgets without a tokenizer
+CHARACTERS_PER_TOKEN = 4
+
 EMPTY_STRING = ""
@@ -0,0 +1,260 @@
+# Copyright 2024-present Kensho Technologies, LLC.
+"""On-disk cache of conversion results keyed by a hash of the document, converter and options.
+
+Every result is pickled to its own file, named by the hash of the document, the converter name,
+its options and the package version. Files are written to a temporary file and renamed into place,
+so readers in other processes see either a complete file or no file. Reading a file updates its
+modification time, and the files read least recently are removed once the cache grows past its
+size bound.
+
+Documents are given as dictionaries, JSON bytes or JSON file paths, and hashed as they are
+without loading them, so a cached result costs a hash of the document and a read of the result.
+Loaded ExtractOutputModels are not accepted, since hashing them means serializing every node.
+"""
+
+import hashlib
+import importlib
+import importlib.metadata
+import json
+import logging
+import os
+import pickle
+import tempfile
+import time
+from typing import Any, Callable, TypeVar
+
+from pydantic_core import to_json
+
+from .utils import load_output_from_json
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE_SUFFIX = ".pkl"
+TEMPORARY_FILE_SUFFIX = ".tmp"
+# Default size bound of the cache directory, in bytes
+DEFAULT_MAX_CACHE_SIZE = 1 << 30
+# Age in seconds after which temporary files are taken as left over by failed writers
+TEMPORARY_FILE_MAX_AGE = 3600
+
+ResultType = TypeVar("ResultType")
+
+CachedDocumentType = dict[str, Any] | bytes | os.PathLike[str]
+
+
+def _get_package_version() -> str:
+    """Get the installed version of the package, so upgrades do not reuse stale results."""
+    try:
+        return importlib.metadata.version("kensho_kenverters")
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _hash_document(serialized_document: CachedDocumentType) -> str:
+    """Hash a document given as a dictionary, JSON bytes or a JSON file path, as it is."""
+    if isinstance(serialized_document, os.PathLike):
+        document_hash = hashlib.blake2b()
+        with open(serialized_document, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                document_hash.update(chunk)
+        return document_hash.hexdigest()
+    if isinstance(serialized_document, bytes):
+        return hashlib.blake2b(serialized_document).hexdigest()
+    if isinstance(serialized_document, dict):
+        return hashlib.blake2b(to_json(serialized_document)).hexdigest()
+    raise TypeError(
+        "Documents are cached as dictionaries, JSON bytes or JSON file paths. "
+        f"Found {type(serialized_document).__name__}"
+    )
+
+
+def _get_converter_name(converter: Callable[..., Any]) -> str:
+    """Get the qualified name of a converter, which must be importable under that name.
+
+    Lambdas, nested functions and functools.partial objects have no name identifying them, so
+    their results could be mixed up with the results of other converters.
+    """
+    module_name = getattr(converter, "__module__", None)
+    qualified_name = getattr(converter, "__qualname__", None)
+    if (
+        not isinstance(module_name, str)
+        or not isinstance(qualified_name, str)
+        or "<" in qualified_name
+    ):
+        raise ValueError(
+            f"Cannot cache the results of {converter!r}. Converters must be module level "
+            "functions, with their options passed as keyword arguments"
+        )
+    resolved: Any = importlib.import_module(module_name)
+    for name in qualified_name.split("."):
+        resolved = getattr(resolved, name, None)
+    if resolved is not converter:
+        raise ValueError(
+            f"Cannot cache the results of {converter!r}, which is not "
+            f"{module_name}.{qualified_name}"
+        )
+    return f"{module_name}.{qualified_name}"
+
+
+def _get_options_key(options: dict[str, Any]) -> str:
+    """Serialize converter options canonically, so equal options give the same key."""
+    try:
+        return json.dumps(options, sort_keys=True, separators=(",", ":"))
+    except TypeError as e:
+        raise ValueError(
+            f"Cannot cache converter options which are not JSON values: {e}"
+        ) from e
+
+
+class ConversionCache:
+    """On-disk LRU cache of conversion results, safe to share between processes.
+
+    Results are stored with pickle, so only use cache directories that no one else can write to.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike[str],
+        max_size: int = DEFAULT_MAX_CACHE_SIZE,
+    ) -> None:
+        """Use the directory as cache, creating it if needed, bounded to max_size bytes."""
+        self.directory = os.fspath(directory)
+        self.max_size = max_size
+        self._package_version = _get_package_version()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get_key(
+        self,
+        converter: Callable[..., Any],
+        document_hash: str,
+        options: dict[str, Any],
+    ) -> str:
+        """Get the cache key of a converter called with options on a document."""
+        key_parts = [
+            self._package_version,
+            _get_converter_name(converter),
+            _get_options_key(options),
+            document_hash,
+        ]
+        return hashlib.blake2b("\0".join(key_parts).encode()).hexdigest()
+
+    def _get_file_path(self, key: str) -> str:
+        """Get the path of the cache file of a key."""
+        return os.path.join(self.directory, key + CACHE_FILE_SUFFIX)
+
+    def _read(self, key: str) -> tuple[bool, Any]:
+        """Read a cached result and mark it as recently used, returning if it was found."""
+        file_path = self._get_file_path(key)
+        try:
+            with open(file_path, "rb") as f:
+                result = pickle.load(f)
+            os.utime(file_path)
+        except FileNotFoundError:
+            # Not cached, or removed by another process
+            return False, None
+        except Exception:  # pylint: disable=broad-except
+            # Truncated or corrupted files, or results of classes which no longer load
+            logger.warning(
+                "Removing unreadable conversion cache file %s", file_path, exc_info=True
+            )
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+            return False, None
+        return True, result
+
+    def _write(self, key: str, result: Any) -> None:
+        """Write a result atomically, then remove the least recently used results if needed."""
+        file_descriptor, temporary_file_path = tempfile.mkstemp(
+            dir=self.directory, suffix=TEMPORARY_FILE_SUFFIX
+        )
+        try:
+            with os.fdopen(file_descriptor, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_file_path, self._get_file_path(key))
+        except BaseException:
+            os.remove(temporary_file_path)
+            raise
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove the least recently used results until the cache fits in its size bound.
+
+        Temporary files older than TEMPORARY_FILE_MAX_AGE, left over by writers which did not
+        finish, are removed as well.
+        """
+        cache_files = []
+        cache_size = 0
+        min_temporary_file_time = time.time() - TEMPORARY_FILE_MAX_AGE
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                is_temporary_file = entry.name.endswith(TEMPORARY_FILE_SUFFIX)
+                if not (is_temporary_file or entry.name.endswith(CACHE_FILE_SUFFIX)):
+                    continue
+                try:
+                    stat = entry.stat()
+                    if is_temporary_file:
+                        if stat.st_mtime < min_temporary_file_time:
+                            os.remove(entry.path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                cache_files.append((stat.st_mtime, stat.st_size, entry.path))
+                cache_size += stat.st_size
+        cache_files.sort()
+        for _, file_size, file_path in cache_files:
+            if cache_size <= self.max_size:
+                break
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                # Already removed by another process
+                pass
+            cache_size -= file_size
+
+    def clear(self) -> None:
+        """Remove all cached results, and the temporary files left over by failed writers."""
+        min_temporary_file_time = time.time() - TEMPORARY_FILE_MAX_AGE
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.name.endswith(CACHE_FILE_SUFFIX) or (
+                        entry.name.endswith(TEMPORARY_FILE_SUFFIX)
+                        and entry.stat().st_mtime < min_temporary_file_time
+                    ):
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def convert(
+        self,
+        converter: Callable[..., ResultType],
+        serialized_document: CachedDocumentType,
+        **options: Any,
+    ) -> ResultType:
+        """Get the result of a converter from the cache, or convert and cache it.
+
+        Args:
+            converter: a module level converter taking the document as first argument, for
+                example convert_output_to_markdown or build_table_grids
+            serialized_document: a serialized document, its JSON bytes or the path of its JSON
+                file, hashed as it is and only loaded if the result is not cached. Loaded
+                ExtractOutputModels are not accepted.
+            options: the keyword arguments of the converter, which must be JSON values
+
+        Returns:
+            the result of converter(serialized_document, **options)
+        """
+        key = self.get_key(converter, _hash_document(serialized_document), options)
+        is_cached, result = self._read(key)
+        if is_cached:
+            return result  # type: ignore[no-any-return]
+        if isinstance(serialized_document, dict):
+            converted = converter(serialized_document, **options)
+        else:
+            converted = converter(
+                load_output_from_json(serialized_document, lazy_text_node_data=True),
+                **options,
+            )
+        self._write(key, converted)
+        return converted
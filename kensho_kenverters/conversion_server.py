@@ -0,0 +1,565 @@
+# Copyright 2024-present Kensho Technologies, LLC.
+"""Local HTTP server exposing the converters, with a warm pool of worker processes.
+
+Every endpoint takes the Extract output JSON, either the output itself or an Extract response
+with the output in its "output" key, as the POST body:
+
+    POST /markdown            convert_output_to_markdown, as text/markdown
+    POST /text                convert_output_to_str, as text/plain
+    POST /markdown_by_page    convert_output_to_markdown_by_page, as a JSON list
+    POST /text_by_page        convert_output_to_str_by_page, as a JSON list
+    POST /items               convert_output_to_items_list_and_relations, as JSON
+    POST /tables              build_table_grids, as JSON
+    GET /metrics              request counts and latencies per endpoint, as JSON
+    GET /health               "ok"
+
+Boolean converter options are given as query parameters, for example /items?return_locations=true.
+Requests are loaded and converted in worker processes started and warmed up with the server, and
+only the serialized response comes back to the server. When all workers are busy and the pending
+request queue is full, requests are rejected with 503 and a Retry-After header instead of
+queueing without bound, and with 503 as well when a worker dies, after which the workers are
+restarted. Request bodies are read before the request waits for a worker, within a timeout,
+so slow clients do not hold the workers. Requests without a valid Content-Length are rejected
+with 411 or 400, and failed conversions return 500.
+
+Run with: python -m kensho_kenverters.conversion_server --port 8080 --workers 4
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BufferedReader
+from logging import basicConfig, getLogger
+from typing import Any, Callable, cast
+from urllib.parse import parse_qsl, urlsplit
+
+from pydantic_core import ValidationError as PydanticValidationError
+from pydantic_core import to_json
+
+from .convert_output import (
+    convert_output_to_items_list_and_relations,
+    convert_output_to_markdown,
+    convert_output_to_markdown_by_page,
+    convert_output_to_str,
+    convert_output_to_str_by_page,
+)
+from .output_to_tables import build_table_grids
+from .utils import load_output_from_json
+
+logger = getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+# Requests waiting for a worker, per worker, before new requests are rejected
+DEFAULT_PENDING_REQUESTS_PER_WORKER = 2
+# Requests with larger bodies are rejected, in bytes
+DEFAULT_MAX_REQUEST_SIZE = 1 << 30
+# Seconds a client may take to send a request, or stay idle between requests
+DEFAULT_REQUEST_TIMEOUT = 60
+# Request bodies are read in blocks of at most this size, in bytes
+REQUEST_READ_SIZE = 1 << 20
+# Number of latest request latencies kept per endpoint for the percentiles
+LATENCY_WINDOW_SIZE = 1000
+# Seconds clients are asked to wait before retrying rejected requests
+RETRY_AFTER_SECONDS = 1
+
+_JSON_CONTENT_TYPE = "application/json"
+_TRUE_VALUES = ("1", "true", "yes")
+_FALSE_VALUES = ("0", "false", "no")
+
+
+@dataclass(frozen=True)
+class _Endpoint:
+    """Converter of an endpoint, with its options and the serialization of its result."""
+
+    converter: Callable[..., Any]
+    content_type: str
+    serialize: Callable[[Any], bytes]
+    options: tuple[str, ...] = ()
+
+
+def _serialize_text(result: str) -> bytes:
+    """Serialize a text result."""
+    return result.encode("utf-8")
+
+
+def _serialize_table_grids(result: dict[str, Any]) -> bytes:
+    """Serialize table grids with the field names of each table."""
+    return to_json(
+        {
+            table_uid: table_grid_and_structure._asdict()
+            for table_uid, table_grid_and_structure in result.items()
+        }
+    )
+
+
+_ENDPOINTS = {
+    "/markdown": _Endpoint(
+        convert_output_to_markdown, "text/markdown; charset=utf-8", _serialize_text
+    ),
+    "/text": _Endpoint(
+        convert_output_to_str, "text/plain; charset=utf-8", _serialize_text
+    ),
+    "/markdown_by_page": _Endpoint(
+        convert_output_to_markdown_by_page, _JSON_CONTENT_TYPE, to_json
+    ),
+    "/text_by_page": _Endpoint(
+        convert_output_to_str_by_page, _JSON_CONTENT_TYPE, to_json
+    ),
+    "/items": _Endpoint(
+        convert_output_to_items_list_and_relations,
+        _JSON_CONTENT_TYPE,
+        to_json,
+        ("return_locations", "return_relations"),
+    ),
+    "/tables": _Endpoint(
+        build_table_grids,
+        _JSON_CONTENT_TYPE,
+        _serialize_table_grids,
+        ("duplicate_merged_cells_content_flag",),
+    ),
+}
+
+
+# Small output with a text and a table, converted by every worker before its first request
+_WARM_UP_OUTPUT = json.dumps(
+    {
+        "annotations": [
+            {
+                "type": "table_structure",
+                "content_uids": ["3"],
+                "data": {"index": [0, 0], "span": [1, 1]},
+            }
+        ],
+        "content_tree": {
+            "uid": "0",
+            "type": "DOCUMENT",
+            "content": None,
+            "children": [
+                {"uid": "1", "type": "TEXT", "content": "Warm up", "children": []},
+                {
+                    "uid": "2",
+                    "type": "TABLE",
+                    "content": None,
+                    "children": [
+                        {
+                            "uid": "3",
+                            "type": "TABLE_CELL",
+                            "content": "1",
+                            "children": [],
+                        }
+                    ],
+                },
+            ],
+        },
+    }
+).encode("utf-8")
+
+
+def _warm_up_worker() -> None:
+    """Convert a small output with every endpoint, when a worker process starts.
+
+    This builds the validators and serializers of the models and runs every converter once, so
+    the first requests of the worker do not pay for it.
+    """
+    for path, endpoint in _ENDPOINTS.items():
+        options = dict.fromkeys(endpoint.options, True)
+        status, result = _convert_in_worker(path, _WARM_UP_OUTPUT, options)
+        if status != HTTPStatus.OK:
+            logger.warning(
+                "Could not warm up %s: %s", path, result.decode("utf-8", "replace")
+            )
+
+
+def _convert_in_worker(
+    path: str, body: bytes, options: dict[str, bool]
+) -> tuple[int, bytes]:
+    """Load and convert a request body in a worker process.
+
+    Returns:
+        the HTTP status and the serialized result, or the error message
+    """
+    endpoint = _ENDPOINTS[path]
+    try:
+        parsed_serialized_document = load_output_from_json(
+            body, lazy_text_node_data=True
+        )
+    except (PydanticValidationError, ValueError) as e:
+        return HTTPStatus.BAD_REQUEST, f"Invalid Extract output: {e}".encode("utf-8")
+    try:
+        result = endpoint.converter(parsed_serialized_document, **options)
+        return HTTPStatus.OK, endpoint.serialize(result)
+    except (TypeError, ValueError) as e:
+        return (
+            HTTPStatus.UNPROCESSABLE_ENTITY,
+            f"Could not convert the Extract output: {e}".encode("utf-8"),
+        )
+    except Exception as e:  # pylint: disable=broad-except
+        # Valid output with inconsistent contents, such as table cells without annotations
+        logger.exception("Could not convert the Extract output for %s", path)
+        return (
+            HTTPStatus.INTERNAL_SERVER_ERROR,
+            f"Could not convert the Extract output: {type(e).__name__}: {e}".encode(
+                "utf-8"
+            ),
+        )
+
+
+@dataclass(frozen=True)
+class _Response:
+    """Status, content type and body of a response, with its extra headers."""
+
+    status: int
+    content_type: str
+    body: bytes
+    headers: dict[str, str] | None = None
+
+
+def _get_text_response(
+    status: int, text: str, headers: dict[str, str] | None = None
+) -> _Response:
+    """Get a plain text response, such as an error message."""
+    return _Response(status, "text/plain; charset=utf-8", text.encode("utf-8"), headers)
+
+
+class _RequestMetrics:
+    """Thread-safe request counts and latencies per endpoint."""
+
+    def __init__(self) -> None:
+        """Start with no requests."""
+        self._lock = threading.Lock()
+        self._counts: dict[str, dict[int, int]] = {}
+        self._latencies: dict[str, deque[float]] = {}
+        self._in_flight = 0
+
+    def start_request(self) -> None:
+        """Count a request in flight."""
+        with self._lock:
+            self._in_flight += 1
+
+    def finish_request(self, path: str, status: int, latency: float) -> None:
+        """Record the status and latency of a finished request."""
+        with self._lock:
+            self._in_flight -= 1
+            status_counts = self._counts.setdefault(path, {})
+            status_counts[status] = status_counts.get(status, 0) + 1
+            self._latencies.setdefault(path, deque(maxlen=LATENCY_WINDOW_SIZE)).append(
+                latency
+            )
+
+    def get_snapshot(self) -> dict[str, Any]:
+        """Get the counts by status and latency percentiles, in seconds, of every endpoint."""
+        with self._lock:
+            endpoints = {}
+            for path, status_counts in self._counts.items():
+                latencies = sorted(self._latencies[path])
+                endpoints[path] = {
+                    "count": sum(status_counts.values()),
+                    "status_counts": {
+                        str(int(status)): count
+                        for status, count in status_counts.items()
+                    },
+                    "latency_mean": sum(latencies) / len(latencies),
+                    **{
+                        f"latency_p{percentile}": latencies[
+                            min(len(latencies) - 1, len(latencies) * percentile // 100)
+                        ]
+                        for percentile in (50, 95, 99)
+                    },
+                    "latency_max": latencies[-1],
+                }
+            return {"in_flight": self._in_flight, "endpoints": endpoints}
+
+
+def _parse_options(query: str, option_names: tuple[str, ...]) -> dict[str, bool]:
+    """Parse the boolean converter options of a query string."""
+    options = {}
+    for name, value in parse_qsl(query):
+        if name not in option_names:
+            raise ValueError(f"Unknown option {name}. Options are {list(option_names)}")
+        if value.lower() in _TRUE_VALUES:
+            options[name] = True
+        elif value.lower() in _FALSE_VALUES:
+            options[name] = False
+        else:
+            raise ValueError(f"Option {name} must be true or false. Found {value}")
+    return options
+
+
+class _ConversionRequestHandler(BaseHTTPRequestHandler):
+    """Handle conversion, metrics and health check requests."""
+
+    protocol_version = "HTTP/1.1"
+    server: "ConversionServer"
+
+    def setup(self) -> None:
+        """Apply the request timeout of the server to the connection."""
+        super().setup()
+        self.connection.settimeout(self.server.request_timeout)
+
+    def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=W0622
+        """Log requests with the module logger instead of stderr."""
+        logger.debug(format, *args)
+
+    def _send_body(
+        self,
+        status: int,
+        content_type: str,
+        body: bytes,
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        """Send a response with its Content-Length."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_response(self, response: _Response) -> None:
+        """Send a response."""
+        self._send_body(
+            response.status, response.content_type, response.body, response.headers
+        )
+
+    def _send_text(
+        self, status: int, text: str, headers: dict[str, str] | None = None
+    ) -> None:
+        """Send a plain text response, such as an error message."""
+        self._send_response(_get_text_response(status, text, headers))
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Serve the metrics and the health check."""
+        path = urlsplit(self.path).path
+        if path == "/metrics":
+            self._send_body(
+                HTTPStatus.OK,
+                _JSON_CONTENT_TYPE,
+                json.dumps(self.server.metrics.get_snapshot()).encode("utf-8"),
+            )
+        elif path == "/health":
+            self._send_text(HTTPStatus.OK, "ok")
+        else:
+            self._send_text(HTTPStatus.NOT_FOUND, f"Unknown path {path}")
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        """Convert the Extract output in the request body."""
+        start_time = time.perf_counter()
+        self.server.metrics.start_request()
+        url = urlsplit(self.path)
+        response = _get_text_response(
+            HTTPStatus.INTERNAL_SERVER_ERROR, "Could not handle the request"
+        )
+        try:
+            response = self._handle_conversion(url.path, url.query)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Could not handle the request for %s", url.path)
+            self.close_connection = True
+        finally:
+            # Recorded before the response is sent, so clients see their request in the metrics
+            self.server.metrics.finish_request(
+                url.path if url.path in _ENDPOINTS else "unknown",
+                response.status,
+                time.perf_counter() - start_time,
+            )
+        self._send_response(response)
+
+    def _get_content_length(self) -> int | _Response:
+        """Get the length of the request body, or the error response for invalid lengths."""
+        content_length_header = self.headers.get("Content-Length")
+        if content_length_header is None:
+            return _get_text_response(
+                HTTPStatus.LENGTH_REQUIRED, "Requests must have a Content-Length"
+            )
+        try:
+            content_length = int(content_length_header)
+        except ValueError:
+            content_length = -1
+        if content_length < 0:
+            return _get_text_response(
+                HTTPStatus.BAD_REQUEST,
+                f"Invalid Content-Length {content_length_header}",
+            )
+        if content_length > self.server.max_request_size:
+            return _get_text_response(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                f"Request bodies are limited to {self.server.max_request_size} bytes",
+            )
+        return content_length
+
+    def _read_body(self, content_length: int) -> bytes | _Response:
+        """Read the request body, or get the error response for incomplete or slow bodies."""
+        deadline = time.monotonic() + self.server.request_timeout
+        rfile = cast(BufferedReader, self.rfile)
+        chunks = []
+        remaining = content_length
+        try:
+            while remaining > 0:
+                if time.monotonic() > deadline:
+                    raise TimeoutError
+                # Returns what the client sent so far, so the deadline is checked in between
+                chunk = rfile.read1(min(remaining, REQUEST_READ_SIZE))
+                if not chunk:
+                    return _get_text_response(
+                        HTTPStatus.BAD_REQUEST,
+                        "The request body is shorter than its Content-Length",
+                    )
+                chunks.append(chunk)
+                remaining -= len(chunk)
+        except TimeoutError:
+            return _get_text_response(
+                HTTPStatus.REQUEST_TIMEOUT,
+                f"Request bodies must be sent within {self.server.request_timeout} seconds",
+            )
+        return b"".join(chunks)
+
+    def _handle_conversion(self, path: str, query: str) -> _Response:
+        """Convert the request body in a worker, returning the response to send."""
+        endpoint = _ENDPOINTS.get(path)
+        if endpoint is None:
+            self.close_connection = True
+            return _get_text_response(HTTPStatus.NOT_FOUND, f"Unknown path {path}")
+        content_length = self._get_content_length()
+        if isinstance(content_length, _Response):
+            self.close_connection = True
+            return content_length
+        try:
+            options = _parse_options(query, endpoint.options)
+        except ValueError as e:
+            self.close_connection = True
+            return _get_text_response(HTTPStatus.BAD_REQUEST, str(e))
+
+        # Read before taking a request slot, so slow clients only hold their own thread
+        body = self._read_body(content_length)
+        if isinstance(body, _Response):
+            self.close_connection = True
+            return body
+
+        # Backpressure: reject requests once the workers and the pending queue are full
+        if not self.server.request_slots.acquire(blocking=False):
+            return _get_text_response(
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                "All workers are busy",
+                {"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+        try:
+            executor = self.server.executor
+            try:
+                status, result = executor.submit(
+                    _convert_in_worker, path, body, options
+                ).result()
+            except BrokenProcessPool:
+                # A worker died, for example out of memory. Later requests use new workers.
+                self.server.replace_broken_executor(executor)
+                return _get_text_response(
+                    HTTPStatus.SERVICE_UNAVAILABLE,
+                    "The conversion worker stopped, retry the request",
+                    {"Retry-After": str(RETRY_AFTER_SECONDS)},
+                )
+        finally:
+            self.server.request_slots.release()
+        if status == HTTPStatus.OK:
+            return _Response(status, endpoint.content_type, result)
+        return _Response(status, "text/plain; charset=utf-8", result)
+
+
+class ConversionServer(ThreadingHTTPServer):
+    """HTTP server converting Extract output in a warm pool of worker processes."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        max_workers: int = 1,
+        max_pending_requests: int | None = None,
+        max_request_size: int = DEFAULT_MAX_REQUEST_SIZE,
+        request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+    ) -> None:
+        """Bind the server and start its worker processes.
+
+        Args:
+            host: the host to listen on
+            port: the port to listen on, or 0 for any free port
+            max_workers: the number of worker processes
+            max_pending_requests: the number of requests waiting for a worker before new
+                requests are rejected with 503. Defaults to two per worker.
+            max_request_size: the maximum request body size, in bytes
+            request_timeout: the seconds a client may take to send a request body, or stay
+                idle between requests on a connection
+        """
+        super().__init__((host, port), _ConversionRequestHandler)
+        self.max_workers = max_workers
+        self.max_request_size = max_request_size
+        self.request_timeout = request_timeout
+        self.metrics = _RequestMetrics()
+        if max_pending_requests is None:
+            max_pending_requests = DEFAULT_PENDING_REQUESTS_PER_WORKER * max_workers
+        self.request_slots = threading.BoundedSemaphore(
+            max_workers + max_pending_requests
+        )
+        self.executor = self._create_executor()
+        self._executor_lock = threading.Lock()
+        # Start and warm up every worker now, so the first requests do not wait for them
+        for future in [self.executor.submit(os.getpid) for _ in range(max_workers)]:
+            future.result()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        """Create a worker pool, whose workers warm up when they start."""
+        return ProcessPoolExecutor(self.max_workers, initializer=_warm_up_worker)
+
+    def replace_broken_executor(self, executor: ProcessPoolExecutor) -> None:
+        """Replace a worker pool broken by a dead worker, unless another request already did."""
+        with self._executor_lock:
+            if self.executor is executor:
+                self.executor = self._create_executor()
+                executor.shutdown(wait=False)
+
+    def server_close(self) -> None:
+        """Close the socket and stop the worker processes."""
+        super().server_close()
+        self.executor.shutdown()
+
+
+def main() -> None:
+    """Run the conversion server until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--max-pending-requests", type=int, default=None)
+    parser.add_argument(
+        "--request-timeout", type=float, default=DEFAULT_REQUEST_TIMEOUT
+    )
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+    basicConfig(
+        level=args.log_level.upper(),
+        format="%(asctime)s %(processName)s %(name)s %(levelname)s %(message)s",
+    )
+    with ConversionServer(
+        args.host,
+        args.port,
+        args.workers,
+        args.max_pending_requests,
+        request_timeout=args.request_timeout,
+    ) as server:
+        logger.info("Serving conversions on %s:%s", *server.server_address[:2])
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
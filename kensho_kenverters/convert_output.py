@@ -1,41 +1,51 @@
 # Copyright 2024-present Kensho Technologies, LLC.
 """Functions for converting the JSON output into markdown, text, and lists of extracted segments."""
 
+import bisect
 from collections import defaultdict
 from logging import getLogger
-from typing import Any
+from typing import Any, Callable, Collection, Iterable, Iterator, Sequence, cast
 
 from .constants import (
     CATEGORY_KEY,
     CONTENT_ID_KEY,
     DOCUMENT_CATEGORY_KEY,
-    ELEMENT_TITLE_CONTENT_CATEGORIES,
     EMPTY_STRING,
     FIGURE_EXTRACTED_TABLE_KEY,
     LOCATIONS_KEY,
+    OUTPUT_FORMATS,
     RELATIONS_BETWEEN_ITEMS,
     TABLE_KEY,
     TEXT_KEY,
     AnnotationType,
     ContentCategory,
+    OutputFormatType,
     TableType,
 )
 from .extract_output_models import (
+    AnnotationModel,
     ContentModel,
     ConvertOutputResult,
-    LocationModel,
+    ExtractOutputModel,
+    MultiOutputResult,
+    OffsetSpan,
     RelationAnnotationModel,
+    SerializedDocumentType,
     TableStructureAnnotationModel,
+    TextWithOffsets,
 )
 from .output_to_tables import (
     build_content_grid_from_figure_extracted_table_cell_annotations,
-    get_table_uid_to_annotations_mapping,
     get_table_uid_to_cells_mapping,
 )
-from .utils import load_output_to_pydantic
+from .renderers import MARKDOWN_RENDERER, ItemRenderer, get_renderer
+from .utils import _get_document_index, load_output_to_pydantic
 
 logger = getLogger(__name__)
 
+# Called with the index and the segment every time a segment is added to the item list
+SegmentCallbackType = Callable[[int, dict[str, Any]], None]
+
 
 def table_to_markdown(table: TableType) -> str:
     """Convert 2D grid table to a single string with | as a delimiter."""
@@ -92,34 +102,22 @@ def _construct_table_from_cells(
     return table
 
 
-def _get_markdown_text(item: dict[str, Any]) -> str:
-    """Convert an item to markdown text based on its category."""
-    # Add # to titles for full markdown
-    if item[CATEGORY_KEY] in (
-        ContentCategory.TITLE.value.lower(),
-        ContentCategory.H1.value.lower(),
-    ):
-        return "# " + item[TEXT_KEY]  # type: ignore[no-any-return]
-    # Add ## to section headers
-    elif item[CATEGORY_KEY] == ContentCategory.H2.value.lower():
-        return "## " + item[TEXT_KEY]  # type: ignore[no-any-return]
-    # Add ### to figure titles and table titles
-    elif (
-        item[CATEGORY_KEY]
-        in [content_type.lower() for content_type in ELEMENT_TITLE_CONTENT_CATEGORIES]
-        or item[CATEGORY_KEY] == ContentCategory.H3.value.lower()
-    ):
-        return "### " + item[TEXT_KEY]  # type: ignore[no-any-return]
-    # Add #### to H4
-    elif item[CATEGORY_KEY] == ContentCategory.H4.value.lower():
-        return "#### " + item[TEXT_KEY]  # type: ignore[no-any-return]
-    # Add ##### to H5
-    elif item[CATEGORY_KEY] == ContentCategory.H5.value.lower():
-        return "##### " + item[TEXT_KEY]  # type: ignore[no-any-return]
-    return item[TEXT_KEY]  # type: ignore[no-any-return]
+# Convert an item to markdown text based on its category
+_get_markdown_text = MARKDOWN_RENDERER.render_item
 
+# Creates the segment of a content node, given the table cell structure
+_SegmentCreatorType = Callable[
+    [
+        ContentModel,
+        dict[str, tuple[int, int]],
+        dict[str, tuple[int, int]],
+        dict[str, list[TableStructureAnnotationModel]],
+    ],
+    dict[str, Any],
+]
 
-def _create_segment(
+
+def _skip_segment(
     content: ContentModel,
     uid_to_index: dict[str, tuple[int, int]],
     uid_to_span: dict[str, tuple[int, int]],
@@ -127,68 +125,116 @@ def _create_segment(
         str, list[TableStructureAnnotationModel]
     ],
 ) -> dict[str, Any]:
-    """Create segment dictionary from the content, and if applicable its matching table cells."""
-    segment: dict[str, Any] = {}
-    # DOCUMENT is just a head node
-    if content.type == DOCUMENT_CATEGORY_KEY:
+    """Create no segment, for nodes without one of their own."""
+    return {}
+
+
+def _create_table_segment(
+    content: ContentModel,
+    uid_to_index: dict[str, tuple[int, int]],
+    uid_to_span: dict[str, tuple[int, int]],
+    figure_extracted_table_uid_to_cell_annotations: dict[
+        str, list[TableStructureAnnotationModel]
+    ],
+) -> dict[str, Any]:
+    """Create the segment of a table from the table cell structure of its cells."""
+    # Construct the table from cells
+    table_cells = content.children
+    # Drop tables with no cells
+    if len(table_cells) == 0:
         return {}
-    # For tables, use table cell structures read above
-    elif content.type in (
-        ContentCategory.TABLE.value,
-        ContentCategory.TABLE_OF_CONTENTS.value,
-    ):
-        # Construct the table from cells
-        table_cells = content.children
-        # Drop tables with no cells
-        if len(table_cells) == 0:
-            return {}
-        table = _construct_table_from_cells(table_cells, uid_to_index, uid_to_span)
-        # Drop tables with length 0
-        if len(table) == 0:
-            return {}
-        segment = {
-            CONTENT_ID_KEY: content.uid,
-            CATEGORY_KEY: content.type.lower(),
-            TABLE_KEY: table,
-            TEXT_KEY: table_to_markdown(table),
-        }
-    elif content.type == ContentCategory.FIGURE_EXTRACTED_TABLE.value:
-        figure_extracted_table = (
-            build_content_grid_from_figure_extracted_table_cell_annotations(
-                figure_extracted_table_uid_to_cell_annotations[content.uid]
-            )
+    table = _construct_table_from_cells(table_cells, uid_to_index, uid_to_span)
+    # Drop tables with length 0
+    if len(table) == 0:
+        return {}
+    return {
+        CONTENT_ID_KEY: content.uid,
+        CATEGORY_KEY: content.type.lower(),
+        TABLE_KEY: table,
+        TEXT_KEY: table_to_markdown(table),
+    }
+
+
+def _create_figure_extracted_table_segment(
+    content: ContentModel,
+    uid_to_index: dict[str, tuple[int, int]],
+    uid_to_span: dict[str, tuple[int, int]],
+    figure_extracted_table_uid_to_cell_annotations: dict[
+        str, list[TableStructureAnnotationModel]
+    ],
+) -> dict[str, Any]:
+    """Create the segment of a figure extracted table from its cell annotations."""
+    figure_extracted_table = (
+        build_content_grid_from_figure_extracted_table_cell_annotations(
+            figure_extracted_table_uid_to_cell_annotations[content.uid]
         )
-        # Drop tables with length 0
-        if len(figure_extracted_table) == 0:
-            return {}
-        segment = {
-            CONTENT_ID_KEY: content.uid,
-            CATEGORY_KEY: content.type.lower(),
-            FIGURE_EXTRACTED_TABLE_KEY: figure_extracted_table,
-            TEXT_KEY: table_to_markdown(figure_extracted_table),
-        }
-    elif content.type in (
-        ContentCategory.TABLE_CELL.value,
-        ContentCategory.FIGURE_EXTRACTED_TABLE_CELL.value,
-    ):
-        # Skip - already accounted for in tables
+    )
+    # Drop tables with length 0
+    if len(figure_extracted_table) == 0:
         return {}
-    # For texts and titles, add the text content and the category
-    elif content.type in [e.value for e in ContentCategory]:
-        segment = {
-            CONTENT_ID_KEY: content.uid,
-            CATEGORY_KEY: content.type.lower(),
-            TEXT_KEY: content.content or EMPTY_STRING,
-        }
-    else:
+    return {
+        CONTENT_ID_KEY: content.uid,
+        CATEGORY_KEY: content.type.lower(),
+        FIGURE_EXTRACTED_TABLE_KEY: figure_extracted_table,
+        TEXT_KEY: table_to_markdown(figure_extracted_table),
+    }
+
+
+def _create_text_segment(
+    content: ContentModel,
+    uid_to_index: dict[str, tuple[int, int]],
+    uid_to_span: dict[str, tuple[int, int]],
+    figure_extracted_table_uid_to_cell_annotations: dict[
+        str, list[TableStructureAnnotationModel]
+    ],
+) -> dict[str, Any]:
+    """Create the segment of a text or title with its content and category."""
+    return {
+        CONTENT_ID_KEY: content.uid,
+        CATEGORY_KEY: content.type.lower(),
+        TEXT_KEY: content.content or EMPTY_STRING,
+    }
+
+
+_CONTENT_CATEGORY_VALUES = [e.value for e in ContentCategory]
+# Segment creator of every content type, texts and titles unless listed otherwise
+_SEGMENT_CREATORS: dict[str, _SegmentCreatorType] = {
+    **{category: _create_text_segment for category in _CONTENT_CATEGORY_VALUES},
+    # DOCUMENT is just a head node
+    DOCUMENT_CATEGORY_KEY: _skip_segment,
+    ContentCategory.TABLE.value: _create_table_segment,
+    ContentCategory.TABLE_OF_CONTENTS.value: _create_table_segment,
+    ContentCategory.FIGURE_EXTRACTED_TABLE.value: _create_figure_extracted_table_segment,
+    # Skip - already accounted for in tables
+    ContentCategory.TABLE_CELL.value: _skip_segment,
+    ContentCategory.FIGURE_EXTRACTED_TABLE_CELL.value: _skip_segment,
+}
+
+
+def _create_segment(
+    content: ContentModel,
+    uid_to_index: dict[str, tuple[int, int]],
+    uid_to_span: dict[str, tuple[int, int]],
+    figure_extracted_table_uid_to_cell_annotations: dict[
+        str, list[TableStructureAnnotationModel]
+    ],
+) -> dict[str, Any]:
+    """Create segment dictionary from the content, and if applicable its matching table cells."""
+    segment_creator = _SEGMENT_CREATORS.get(content.type)
+    if segment_creator is None:
         raise TypeError(
-            f"Content category must be in {[e.value for e in ContentCategory]}. "
+            f"Content category must be in {_CONTENT_CATEGORY_VALUES}. "
             f"Found {content.type}"
         )
-    return segment
+    return segment_creator(
+        content,
+        uid_to_index,
+        uid_to_span,
+        figure_extracted_table_uid_to_cell_annotations,
+    )
 
 
-def _get_segments_from_all_children(
+def _iter_segments_from_all_children(
     content: ContentModel,
     uid_to_index: dict[str, tuple[int, int]],
     uid_to_span: dict[str, tuple[int, int]],
@@ -196,48 +242,162 @@ def _get_segments_from_all_children(
         str, list[TableStructureAnnotationModel]
     ],
     return_locations: bool,
-    segments: list[dict[str, Any]],
-    visited: list[str],
-) -> None:
-    """Recursively get all text from the content node and its children."""
+    visited: set[str],
+) -> Iterator[dict[str, Any]]:
+    """Recursively yield all segments from the content node and its children in reading order."""
     if content.uid in visited:
         return
 
-    # Get current segment from content and add to list
+    # Get current segment from content
     segment = _create_segment(
         content,
         uid_to_index,
         uid_to_span,
         figure_extracted_table_uid_to_cell_annotations,
     )
-    visited.append(content.uid)
+    visited.add(content.uid)
     if segment:
         if return_locations:
             segment[LOCATIONS_KEY] = content.locations
-        segments.append(segment)
+        yield segment
 
     # Get all children segments
     for child in content.children:
-        _get_segments_from_all_children(
+        yield from _iter_segments_from_all_children(
             child,
             uid_to_index,
             uid_to_span,
             figure_extracted_table_uid_to_cell_annotations,
             return_locations,
-            segments,
             visited,
         )
 
 
+def _get_item_relations(
+    annotations: Sequence[AnnotationModel],
+) -> list[dict[str, str]]:
+    """Get the supported relations between items from the relation annotations."""
+    relations = []
+    for annotation in annotations:
+        if isinstance(annotation, RelationAnnotationModel):
+            if annotation.data.relation_type in RELATIONS_BETWEEN_ITEMS:
+                relations.append(
+                    {
+                        "relation_type": annotation.data.relation_type,
+                        "source_content_id": annotation.data.source_content_uid,
+                        "target_content_id": annotation.data.target_content_uid,
+                    }
+                )
+    return relations
+
+
+class _TableCellStructure:
+    """Table cell structure read from the annotations, one annotation at a time."""
+
+    def __init__(self) -> None:
+        self.uid_to_index: dict[str, tuple[int, int]] = {}
+        self.uid_to_span: dict[str, tuple[int, int]] = {}
+        self.figure_extracted_cell_uid_to_annotation: dict[
+            str, TableStructureAnnotationModel
+        ] = {}
+
+    def add_annotation(self, annotation: AnnotationModel) -> None:
+        """Read the table cell structure of an annotation."""
+        if annotation.type == AnnotationType.TABLE_STRUCTURE.value:
+            content_uids = annotation.content_uids  # a list
+            row, col = annotation.data.index  # 2D index of table cell
+            for uid in content_uids:
+                self.uid_to_index[uid] = (row, col)
+                self.uid_to_span[uid] = annotation.data.span
+        elif annotation.type == AnnotationType.FIGURE_EXTRACTED_TABLE_STRUCTURE.value:
+            self.figure_extracted_cell_uid_to_annotation[annotation.content_uids[0]] = (
+                annotation
+            )
+        elif annotation.type != AnnotationType.RELATION.value:
+            raise TypeError(f"{annotation.type} is not a supported annotation type")
+
+    def iter_content_items(
+        self, content: ContentModel, return_locations: bool, visited: set[str]
+    ) -> Iterator[dict[str, Any]]:
+        """Yield the items of a content node and its descendants in reading order.
+
+        Tables must be within the content node, so subtrees of the content tree can be
+        converted one at a time, sharing the visited uids.
+        """
+        figure_extracted_table_uid_to_cell_annotations = {
+            table_uid: [
+                self.figure_extracted_cell_uid_to_annotation[cell.uid]
+                for cell in cells
+                if cell.uid in self.figure_extracted_cell_uid_to_annotation
+            ]
+            for table_uid, cells in get_table_uid_to_cells_mapping(content).items()
+        }
+        yield from _iter_segments_from_all_children(
+            content,
+            self.uid_to_index,
+            self.uid_to_span,
+            figure_extracted_table_uid_to_cell_annotations,
+            return_locations,
+            visited,
+        )
+
+
+def _build_table_cell_structure(
+    parsed_serialized_document: ExtractOutputModel,
+) -> _TableCellStructure:
+    """Build the table cell structure of all annotations of a parsed Extract output."""
+    table_cell_structure = _TableCellStructure()
+    for annotation in parsed_serialized_document.annotations:
+        table_cell_structure.add_annotation(annotation)
+    return table_cell_structure
+
+
+def _iter_document_items(
+    parsed_serialized_document: ExtractOutputModel,
+    return_locations: bool = False,
+) -> Iterator[dict[str, Any]]:
+    """Yield the items of a parsed Extract output one at a time in reading order."""
+    table_cell_structure = _get_document_index(
+        parsed_serialized_document, _build_table_cell_structure
+    )
+    yield from table_cell_structure.iter_content_items(
+        parsed_serialized_document.content_tree, return_locations, set()
+    )
+
+
+def _convert_parsed_output_to_items_list_and_relations(
+    parsed_serialized_document: ExtractOutputModel,
+    return_locations: bool = False,
+    return_relations: bool = False,
+    on_segment: SegmentCallbackType | None = None,
+) -> ConvertOutputResult:
+    """Convert a parsed Extract output into a list of items and their relationships.
+
+    If on_segment is given, it is called for every item in reading order as soon as the item is
+    added, so callers can build other structures in the same traversal.
+    """
+    relations = (
+        _get_item_relations(parsed_serialized_document.annotations)
+        if return_relations
+        else None
+    )
+    segments: list[dict[str, Any]] = []
+    for segment in _iter_document_items(parsed_serialized_document, return_locations):
+        segments.append(segment)
+        if on_segment is not None:
+            on_segment(len(segments) - 1, segment)
+    return ConvertOutputResult(item_list=segments, relations=relations)
+
+
 def convert_output_to_items_list_and_relations(
-    serialized_document: dict[str, Any],
+    serialized_document: SerializedDocumentType,
     return_locations: bool = False,
     return_relations: bool = False,
 ) -> ConvertOutputResult:
     """Convert Extract output into a list of items and their relationships.
 
     Args:
-        serialized_document: a serialized document
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
         return_locations: whether to return segment locations in the result
         return_relations: whether to return relations between items in the result
 
@@ -260,87 +420,218 @@ def convert_output_to_items_list_and_relations(
             relations: None if return_relations is False, otherwise a list of dictionaries
                 each containing "relation_type", "source_content_id", and "target_content_id".
     """
-    parsed_serialized_document = load_output_to_pydantic(serialized_document)
-    annotations = parsed_serialized_document.annotations
+    return _convert_parsed_output_to_items_list_and_relations(
+        load_output_to_pydantic(serialized_document, lazy_text_node_data=True),
+        return_locations=return_locations,
+        return_relations=return_relations,
+    )
 
-    # Read table cell structure
-    uid_to_index: dict[str, tuple[int, int]] = {}
-    uid_to_span: dict[str, tuple[int, int]] = {}
-    relations: list[dict[str, str]] | None = [] if return_relations else None
-    for annotation in annotations:
-        if annotation.type == AnnotationType.TABLE_STRUCTURE.value:
-            content_uids = annotation.content_uids  # a list
-            row, col = annotation.data.index  # 2D index of table cell
-            for uid in content_uids:
-                uid_to_index[uid] = (row, col)
-                uid_to_span[uid] = annotation.data.span
-        elif annotation.type == AnnotationType.FIGURE_EXTRACTED_TABLE_STRUCTURE.value:
-            continue
-        elif annotation.type == AnnotationType.RELATION.value:
-            if relations is not None:
-                assert isinstance(annotation, RelationAnnotationModel)
-                if annotation.data.relation_type in RELATIONS_BETWEEN_ITEMS:
-                    relations.append(
-                        {
-                            "relation_type": annotation.data.relation_type,
-                            "source_content_id": annotation.data.source_content_uid,
-                            "target_content_id": annotation.data.target_content_uid,
-                        }
-                    )
-        else:
-            raise TypeError(f"{annotation.type} is not a supported annotation type")
 
-    figure_extracted_table_cell_annotations = [
-        annotation
-        for annotation in annotations
-        if annotation.type == AnnotationType.FIGURE_EXTRACTED_TABLE_STRUCTURE.value
-    ]
-    table_uid_to_cells_mapping = get_table_uid_to_cells_mapping(
-        parsed_serialized_document.content_tree
-    )
-    figure_extracted_table_uid_to_cell_annotations = (
-        get_table_uid_to_annotations_mapping(
-            table_uid_to_cells_mapping,
-            figure_extracted_table_cell_annotations,
+def _get_item_page_numbers(item: dict[str, Any]) -> list[int]:
+    """Get the page number of every location of an item, or page 0 if it has no locations."""
+    locations = item[LOCATIONS_KEY]
+    if locations is None:
+        logger.info(
+            "Unable to get location information from the output file. "
+            "Putting all text on one page."
         )
-    )
+        return [0]
+    return [location.page_number for location in locations]
 
-    # Parse content into segments
-    content_tree = parsed_serialized_document.content_tree
-    segments: list[dict[str, Any]] = []
-    visited: list[str] = []
-    _get_segments_from_all_children(
-        content_tree,
-        uid_to_index,
-        uid_to_span,
-        figure_extracted_table_uid_to_cell_annotations,
-        return_locations,
-        segments,
-        visited,
+
+def _render_items(
+    document_items: Iterable[dict[str, Any]],
+    outputs: Collection[OutputFormatType],
+) -> MultiOutputResult:
+    """Render the requested output formats from the document items in a single pass.
+
+    Items are rendered to markdown at most once, and the page numbers of an item are looked up
+    at most once, however many formats need them. Items need locations for the by-page formats.
+    """
+    unknown_outputs = set(outputs) - OUTPUT_FORMATS
+    if unknown_outputs:
+        raise ValueError(
+            f"Unknown output formats {sorted(unknown_outputs)}, "
+            f"expected a subset of {sorted(OUTPUT_FORMATS)}"
+        )
+    return_text = "text" in outputs
+    return_markdown = "markdown" in outputs
+    return_text_by_page = "text_by_page" in outputs
+    return_markdown_by_page = "markdown_by_page" in outputs
+
+    texts: list[str] = []
+    markdown_texts: list[str] = []
+    page_texts: defaultdict[int, list[str]] = defaultdict(list)
+    page_markdown_texts: defaultdict[int, list[str]] = defaultdict(list)
+    for item in document_items:
+        item_text = item[TEXT_KEY]
+        markdown_text = (
+            _get_markdown_text(item)
+            if return_markdown or return_markdown_by_page
+            else EMPTY_STRING
+        )
+        # Some types like figures don't have content
+        if item_text:
+            if return_text:
+                texts.append(item_text)
+            if return_markdown:
+                markdown_texts.append(markdown_text)
+        if return_text_by_page or return_markdown_by_page:
+            for page_number in _get_item_page_numbers(item):
+                if return_text_by_page:
+                    page_texts[page_number].append(item_text)
+                if return_markdown_by_page:
+                    page_markdown_texts[page_number].append(markdown_text)
+
+    result = MultiOutputResult()
+    if return_text:
+        result.text = "\n".join(texts)
+    if return_markdown:
+        result.markdown = "\n".join(markdown_texts)
+    if return_text_by_page:
+        result.text_by_page = [
+            "\n".join(text) for _, text in sorted(page_texts.items())
+        ]
+    if return_markdown_by_page:
+        result.markdown_by_page = [
+            "\n".join(text) for _, text in sorted(page_markdown_texts.items())
+        ]
+    return result
+
+
+def convert_output_multi(
+    serialized_document: SerializedDocumentType,
+    outputs: Collection[OutputFormatType],
+) -> MultiOutputResult:
+    """Convert Extract output into several output formats in a single traversal.
+
+    The document is loaded and its items are built once for all formats, so requesting several
+    formats costs little more than requesting the most expensive one.
+
+    Args:
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
+        outputs: the output formats to render, among "text", "markdown", "text_by_page" and
+            "markdown_by_page"
+
+    Returns:
+        A MultiOutputResult dataclass with the same values as convert_output_to_str,
+            convert_output_to_markdown, convert_output_to_str_by_page and
+            convert_output_to_markdown_by_page for the requested formats, and None for the
+            others.
+
+    Raises:
+        ValueError: if an output format is unknown
+    """
+    return_locations = "text_by_page" in outputs or "markdown_by_page" in outputs
+    parsed_serialized_document = load_output_to_pydantic(
+        serialized_document, lazy_text_node_data=True
+    )
+    return _render_items(
+        _iter_document_items(parsed_serialized_document, return_locations), outputs
     )
-    return ConvertOutputResult(item_list=segments, relations=relations)
 
 
-def convert_output_to_str(serialized_document: dict[str, Any]) -> str:
+def convert_output_to_str(serialized_document: SerializedDocumentType) -> str:
     """Convert entire Extract output into a single string.
 
     Args:
-        serialized_document: a serialized document
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
 
     Returns:
         full text string of the document with markdown-style tables using | as a delimiter
     """
+    return cast(str, convert_output_multi(serialized_document, ["text"]).text)
+
+
+def _join_item_texts_with_offsets(
+    document_items: list[dict[str, Any]],
+    get_item_text: Callable[[dict[str, Any]], str],
+) -> TextWithOffsets:
+    """Join the item texts with newlines, recording the character span of every item."""
+    item_texts: list[str] = []
+    offset_spans: list[OffsetSpan] = []
+    current_offset = 0
+    for item_index, item in enumerate(document_items):
+        # Some types like figures don't have content
+        if not item[TEXT_KEY]:
+            continue
+        item_text = get_item_text(item)
+        if item_texts:
+            # Newline delimiter between items
+            current_offset += 1
+        offset_spans.append(
+            OffsetSpan(
+                start=current_offset,
+                end=current_offset + len(item_text),
+                content_id=item[CONTENT_ID_KEY],
+                item_index=item_index,
+                locations=item[LOCATIONS_KEY],
+            )
+        )
+        item_texts.append(item_text)
+        current_offset += len(item_text)
+    return TextWithOffsets(text="\n".join(item_texts), offset_spans=offset_spans)
+
+
+def get_offset_spans_in_range(
+    offset_spans: list[OffsetSpan], start: int, end: int
+) -> list[OffsetSpan]:
+    """Get the item spans overlapping the character range [start, end) with a binary search.
+
+    Args:
+        offset_spans: item spans sorted by start offset, as in TextWithOffsets
+        start: the first character offset of the range
+        end: the character offset after the end of the range
+
+    Returns:
+        the item spans overlapping the range, in order
+    """
+    first_index = bisect.bisect_right(offset_spans, start, key=lambda span: span.start)
+    # The span starting before the range may still overlap it
+    if first_index > 0 and offset_spans[first_index - 1].end > start:
+        first_index -= 1
+    last_index = bisect.bisect_left(offset_spans, end, key=lambda span: span.start)
+    return offset_spans[first_index:last_index]
+
+
+def convert_output_to_str_with_offsets(
+    serialized_document: SerializedDocumentType,
+) -> TextWithOffsets:
+    r"""Convert entire Extract output into a single string and the character span of every item.
+
+    Args:
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
+
+    Returns:
+        A TextWithOffsets dataclass with:
+            text: the same string as convert_output_to_str
+            offset_spans: an OffsetSpan for each item in the text, sorted by start offset, with
+                the content id, item index and locations of the item. Use
+                get_offset_spans_in_range to map a character range back to its items.
+
+    Example Output:
+        TextWithOffsets(
+            text='2019\ntest noise string at top\n...',
+            offset_spans=[
+                OffsetSpan(start=0, end=4, content_id='1', item_index=0, locations=[...]),
+                OffsetSpan(start=5, end=29, content_id='2', item_index=1, locations=[...]),
+                ...
+            ]
+        )
+    """
     document_items = convert_output_to_items_list_and_relations(
-        serialized_document
+        serialized_document, return_locations=True
     ).item_list
-    return "\n".join(item[TEXT_KEY] for item in document_items if item[TEXT_KEY])
+    return _join_item_texts_with_offsets(document_items, lambda item: item[TEXT_KEY])
 
 
-def convert_output_to_str_by_page(serialized_document: dict[str, Any]) -> list[str]:
+def convert_output_to_str_by_page(
+    serialized_document: SerializedDocumentType,
+) -> list[str]:
     r"""Convert entire Extract output into a single string by page.
 
     Args:
-        serialized_document: a serialized document
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
 
     Returns:
         a list of full text strings of the document by page with markdown-style tables
@@ -353,53 +644,53 @@ def convert_output_to_str_by_page(serialized_document: dict[str, Any]) -> list[s
             'Supplementary materials found here\n|T|L|'
         ]
     """
-    document_items = convert_output_to_items_list_and_relations(
-        serialized_document, return_locations=True
-    ).item_list
-    page_texts = defaultdict(list)
-    for item in document_items:
-        locations = item[LOCATIONS_KEY]
-        if locations is None:
-            logger.info(
-                "Unable to get location information from the output file. "
-                "Putting all text on one page."
-            )
-            locations = [LocationModel(page_number=0, height=1, width=1, x=0, y=0)]
-        for location in locations:
-            page_texts[location.page_number].append(item[TEXT_KEY])
-    return ["\n".join(text) for _, text in sorted(page_texts.items())]
+    return cast(
+        list[str],
+        convert_output_multi(serialized_document, ["text_by_page"]).text_by_page,
+    )
 
 
-def convert_output_to_markdown(serialized_document: dict[str, Any]) -> str:
+def convert_output_to_markdown(serialized_document: SerializedDocumentType) -> str:
     """Convert entire Extract output into a single markdown string.
 
     Args:
-        serialized_document: a serialized document
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
 
     Returns:
         full text string of the document with markdown-style tables using | as a delimiter
         and titles prefaced with #
     """
+    return cast(str, convert_output_multi(serialized_document, ["markdown"]).markdown)
+
+
+def convert_output_to_markdown_with_offsets(
+    serialized_document: SerializedDocumentType,
+) -> TextWithOffsets:
+    """Convert entire Extract output into a single markdown string and the span of every item.
+
+    Args:
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
+
+    Returns:
+        A TextWithOffsets dataclass with:
+            text: the same string as convert_output_to_markdown
+            offset_spans: an OffsetSpan for each item in the text, sorted by start offset, with
+                the content id, item index and locations of the item. Spans of titles include
+                their # prefix.
+    """
     document_items = convert_output_to_items_list_and_relations(
-        serialized_document
+        serialized_document, return_locations=True
     ).item_list
-    item_texts = []
-    for item in document_items:
-        # Some types like figures don't have content
-        if not item[TEXT_KEY]:
-            continue
-        item_text = _get_markdown_text(item)
-        item_texts.append(item_text)
-    return "\n".join(item_texts)
+    return _join_item_texts_with_offsets(document_items, _get_markdown_text)
 
 
 def convert_output_to_markdown_by_page(
-    serialized_document: dict[str, Any],
+    serialized_document: SerializedDocumentType,
 ) -> list[str]:
     r"""Convert entire Extract output into a markdown string per page.
 
     Args:
-        serialized_document: a serialized document
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
 
     Returns:
         list of full text strings of the document by page with markdown-style tables using |
@@ -412,21 +703,34 @@ def convert_output_to_markdown_by_page(
             'Supplementary materials found here\n|T|L|'
         ]
     """
-    document_items = convert_output_to_items_list_and_relations(
-        serialized_document, return_locations=True
-    ).item_list
-    page_texts = defaultdict(list)
+    return cast(
+        list[str],
+        convert_output_multi(
+            serialized_document, ["markdown_by_page"]
+        ).markdown_by_page,
+    )
 
-    for item in document_items:
-        item_text = _get_markdown_text(item)
-        locations = item[LOCATIONS_KEY]
-        if locations is None:
-            logger.info(
-                "Unable to get location information from the output file. "
-                "Putting all text on one page."
-            )
-            locations = [LocationModel(page_number=0, height=1, width=1, x=0, y=0)]
-        for location in locations:
-            page_texts[location.page_number].append(item_text)
 
-    return ["\n".join(text) for _, text in sorted(page_texts.items())]
+def convert_output_with_renderer(
+    serialized_document: SerializedDocumentType,
+    renderer: str | ItemRenderer,
+) -> str:
+    """Convert entire Extract output into a single string with a renderer.
+
+    Args:
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
+        renderer: a renderer, or the name of a registered renderer such as "text", "markdown"
+            or "html"
+
+    Returns:
+        the rendered text of every item with content, joined by the separator of the renderer
+
+    Raises:
+        ValueError: if no renderer is registered with the name
+    """
+    if isinstance(renderer, str):
+        renderer = get_renderer(renderer)
+    parsed_serialized_document = load_output_to_pydantic(
+        serialized_document, lazy_text_node_data=True
+    )
+    return renderer.render(_iter_document_items(parsed_serialized_document))
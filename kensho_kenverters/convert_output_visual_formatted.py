@@ -6,7 +6,7 @@ The resulting visual formatting will resemble the original document's layout.
 
 import math
 from logging import getLogger
-from typing import Any, TypeAlias
+from typing import Any, Sequence, TypeAlias
 
 from .constants import (
     EMPTY_STRING,
@@ -15,14 +15,26 @@ from .constants import (
     AnnotationType,
     ContentCategory,
 )
-from .extract_output_models import ContentModel, LocationModel
+from .extract_output_models import (
+    ContentModel,
+    ExtractOutputModel,
+    LocationModel,
+    PDFPageModel,
+    SerializedDocumentType,
+)
 from .utils import load_output_to_pydantic
 
 logger = getLogger(__name__)
 
-LocationListType: TypeAlias = list[LocationModel] | None
+LocationListType: TypeAlias = Sequence[LocationModel] | None
+PageCanvasSizesType: TypeAlias = dict[int, tuple[int, int]]
+# Sorted, non-overlapping (start column, text) intervals of one text row
+SparseRowType: TypeAlias = list[tuple[int, str]]
+# Row index to text intervals for the occupied rows of one page
+SparsePageType: TypeAlias = dict[int, SparseRowType]
 MAX_RETRIES = 10
 HEIGHT_INC_AMOUNT = 50
+SUPPORTED_CCW_ROTATIONS = (0, 90, 180, 270)
 
 
 class PageTooShortException(Exception):
@@ -49,14 +61,81 @@ def _get_segments_from_table_cells(
     return segments
 
 
+def _rotate_location(location: LocationModel, ccw_rotation: int) -> LocationModel:
+    """Rotate a relative location counterclockwise so that it lies on the upright page.
+
+    Locations are relative to the page as stored in the PDF, with the origin in the top left
+    corner. Rotating the page by 90 or 270 degrees swaps its width and height.
+    """
+    ccw_rotation %= 360
+    if ccw_rotation not in SUPPORTED_CCW_ROTATIONS:
+        raise ValueError(
+            f"Page rotation must be one of {SUPPORTED_CCW_ROTATIONS}. Found {ccw_rotation}"
+        )
+    if ccw_rotation == 0:
+        return location
+    if ccw_rotation == 90:
+        x, y = location.y, 1 - location.x - location.width
+        width, height = location.height, location.width
+    elif ccw_rotation == 180:
+        x, y = 1 - location.x - location.width, 1 - location.y - location.height
+        width, height = location.width, location.height
+    else:
+        x, y = 1 - location.y - location.height, location.x
+        width, height = location.height, location.width
+    return LocationModel(
+        height=height,
+        width=width,
+        # Clip rounding errors so boxes on the page edge stay on the canvas
+        x=max(x, 0.0),
+        y=max(y, 0.0),
+        page_number=location.page_number,
+    )
+
+
+def _get_upright_page_dimensions(pdf_page: PDFPageModel) -> tuple[float, float]:
+    """Get the width and height of a PDF page once its required rotation is applied."""
+    if pdf_page.required_ccw_rotation % 180 == 90:
+        return pdf_page.height, pdf_page.width
+    return pdf_page.width, pdf_page.height
+
+
+def _get_page_canvas_sizes(
+    pdf_pages: list[PDFPageModel] | None,
+    page_width: int,
+    page_height: int,
+) -> PageCanvasSizesType:
+    """Get the (width, height) in characters of the canvas for each page number.
+
+    The largest upright page width and height in the document map to page_width and
+    page_height. Every other page is scaled down proportionally, so that the number of
+    characters per inch is the same on every page. Pages missing from the result use the full
+    page_width x page_height canvas.
+    """
+    if not pdf_pages:
+        return {}
+    upright_dimensions = [_get_upright_page_dimensions(page) for page in pdf_pages]
+    max_width = max(width for width, _ in upright_dimensions)
+    max_height = max(height for _, height in upright_dimensions)
+    if max_width <= 0 or max_height <= 0:
+        return {}
+    return {
+        page_number: (
+            max(round(page_width * width / max_width), 1),
+            max(round(page_height * height / max_height), 1),
+        )
+        for page_number, (width, height) in enumerate(upright_dimensions)
+    }
+
+
 def _convert_output_to_texts_with_locs(
-    serialized_document: dict[str, Any],
+    parsed_serialized_document: ExtractOutputModel,
 ) -> list[dict[str, Any]]:
     """Convert Extract output into a list of items.
 
     These items include document titles, texts, and table cells with text and location.
+    Locations are rotated to the upright page if the PDF page information requires it.
     """
-    parsed_serialized_document = load_output_to_pydantic(serialized_document)
     annotations = parsed_serialized_document.annotations
 
     # Read table cell structure
@@ -106,126 +185,197 @@ def _convert_output_to_texts_with_locs(
                 f"Found {content.type}"
             )
 
+    pdf_pages = parsed_serialized_document.pdf_pages or []
+    page_rotations = {
+        page_number: page.required_ccw_rotation
+        for page_number, page in enumerate(pdf_pages)
+        if page.required_ccw_rotation % 360 != 0
+    }
+    if page_rotations:
+        for segment in segments:
+            if segment[LOCATIONS_KEY] is not None:
+                segment[LOCATIONS_KEY] = [
+                    _rotate_location(
+                        location, page_rotations.get(location.page_number, 0)
+                    )
+                    for location in segment[LOCATIONS_KEY]
+                ]
+
     return segments
 
 
+def _write_to_sparse_row(
+    row_intervals: SparseRowType, start_col: int, row_text: str
+) -> SparseRowType:
+    """Write row_text at start_col, overwriting any text already in those columns.
+
+    The row is a list of non-overlapping (start column, text) intervals sorted by start column.
+    Intervals never start or end with a space, since blank columns are not stored.
+    """
+    end_col = start_col + len(row_text)
+    new_row_intervals: SparseRowType = []
+    for interval_start, interval_text in row_intervals:
+        interval_end = interval_start + len(interval_text)
+        if interval_end <= start_col or interval_start >= end_col:
+            new_row_intervals.append((interval_start, interval_text))
+            continue
+        # Keep the parts of the existing interval outside of the overwritten columns
+        left_text = interval_text[: max(start_col - interval_start, 0)].rstrip()
+        if left_text:
+            new_row_intervals.append((interval_start, left_text))
+        right_start_index = max(end_col - interval_start, 0)
+        right_text = interval_text[right_start_index:]
+        if right_text.strip():
+            right_start = interval_end - len(right_text)
+            num_left_spaces = len(right_text) - len(right_text.lstrip())
+            new_row_intervals.append(
+                (right_start + num_left_spaces, right_text.strip())
+            )
+    stripped_row_text = row_text.strip()
+    if stripped_row_text:
+        num_left_spaces = len(row_text) - len(row_text.lstrip())
+        new_row_intervals.append((start_col + num_left_spaces, stripped_row_text))
+    new_row_intervals.sort()
+    return new_row_intervals
+
+
+def _layout_segment_rows(
+    text: str,
+    segment_width: int,
+    segment_height: int,
+    last_row_index: int,
+    resize: bool,
+) -> list[str]:
+    """Lay out the words of a segment in a box of segment_width x segment_height characters.
+
+    Returns one string of segment_width characters per row of the box.
+    """
+    segment_arr = [[" " for _ in range(segment_width)] for _ in range(segment_height)]
+    current_col = 0
+    current_row = 0
+
+    for word in text.split():
+        # Check if word fits in line
+        if current_col + len(word) >= segment_width:
+            current_row += 1  # Move to the next line if it doesn't fit
+            current_col = 0  # Reset to the start of the box
+
+        # Check if word exceeds the box vertically or horizontally
+        if current_row >= segment_height or current_col + len(word) > segment_width:
+            if resize:
+                raise PageTooShortException
+            else:
+                logger.info(
+                    "Not enough space to finish the segment, skipping remaining words "
+                    "in this segment."
+                )
+                break  # Skip remaining words if no space
+        for i, char in enumerate(word):
+            segment_arr[current_row][current_col + i] = char
+        current_col += len(word) + 1
+
+    segment_rows = ["".join(row) for row in segment_arr]
+    # Spread out the lines more if we don't take up the entire box
+    if current_row != last_row_index:
+        num_rows_used = min(current_row + 1, segment_height)
+        num_rows_between_lines = int(segment_height / num_rows_used)
+        blank_row = " " * segment_width
+        new_segment_rows = [blank_row for _ in range(segment_height)]
+        for line_index in range(0, num_rows_used):
+            new_line_index = min(
+                line_index * num_rows_between_lines, segment_height - 1
+            )
+            new_segment_rows[new_line_index] = segment_rows[line_index]
+        return new_segment_rows
+    return segment_rows
+
+
 def _convert_segments_to_dict(
     document_items: list[dict[str, Any]],
     page_width: int,
     page_height: int,
     resize: bool,
-) -> dict[str, list[list[str]]]:
-    """Convert extracted document segments into a dictionary of page -> 2D text representation."""
-    page_text_arrs: dict[str, list[list[str]]] = {}
+    page_canvas_sizes: PageCanvasSizesType | None = None,
+) -> dict[int, SparsePageType]:
+    """Convert extracted document segments into a dictionary of page -> sparse text rows.
+
+    Each page only stores its occupied rows, as lists of text intervals, so memory is
+    proportional to the amount of text rather than to the canvas size. Pages in
+    page_canvas_sizes get a canvas of that (width, height), all other pages use
+    page_width x page_height. Text outside of the canvas is dropped.
+    """
+    page_canvas_sizes = page_canvas_sizes or {}
+    sparse_pages: dict[int, SparsePageType] = {}
     for item in document_items:
         for location in item[LOCATIONS_KEY]:
             page_number = location.page_number
-            # If this is the first time we see a box with this page number, create the page array
-            if page_number not in page_text_arrs:
-                page_text_arrs[page_number] = [
-                    [" " for _ in range(page_width)] for _ in range(page_height)
-                ]
+            canvas_width, canvas_height = page_canvas_sizes.get(
+                page_number, (page_width, page_height)
+            )
+            # If this is the first time we see a box with this page number, create the page
+            sparse_page = sparse_pages.setdefault(page_number, {})
 
             # Get segment coordinates
-            x_0 = math.floor(location.x * page_width)
-            y_0 = math.floor(location.y * page_height)
-            x_1 = x_0 + math.ceil(location.width * page_width)
-            y_1 = y_0 + math.ceil(location.height * page_height)
-            words = item["text"].split()
+            x_0 = math.floor(location.x * canvas_width)
+            y_0 = math.floor(location.y * canvas_height)
+            x_1 = x_0 + math.ceil(location.width * canvas_width)
+            y_1 = y_0 + math.ceil(location.height * canvas_height)
 
-            # Create segment array to later put into page array
+            # Lay out the segment text in its box to later put into the page
             segment_width = max(x_1 - x_0, 1)
             segment_height = max(y_1 - y_0, 1)
-            segment_arr = [
-                [" " for _ in range(segment_width)] for _ in range(segment_height)
-            ]
-            current_col = 0
-            current_row = 0
-
-            for word in words:
-                # Check if word fits in line
-                if current_col + len(word) >= segment_width:
-                    current_row += 1  # Move to the next line if it doesn't fit
-                    current_col = 0  # Reset to the start of the box
-
-                # Check if word exceeds the box vertically or horizontally
-                if (
-                    current_row >= segment_height
-                    or current_col + len(word) > segment_width
-                ):
-                    if resize:
-                        raise PageTooShortException
-                    else:
-                        logger.info(
-                            "Not enough space to finish the segment, skipping remaining words "
-                            "in this segment."
-                        )
-                        break  # Skip remaining words if no space
-                for i, char in enumerate(word):
-                    segment_arr[current_row][current_col + i] = char
-                current_col += len(word) + 1
-
-            # Spread out the lines more if we don't take up the entire box
-            if current_row != y_1 - 1:
-                num_rows_used = min(current_row + 1, segment_height)
-                num_rows_between_lines = int(segment_height / num_rows_used)
-                new_segment_arr = [
-                    [" " for _ in range(segment_width)] for _ in range(segment_height)
-                ]
-                for line_index in range(0, num_rows_used):
-                    new_line_index = min(
-                        line_index * num_rows_between_lines, segment_height - 1
-                    )
-                    new_segment_arr[new_line_index] = segment_arr[line_index]
-            else:
-                new_segment_arr = segment_arr
-
-            for i in range(segment_height):
-                for j in range(segment_width):
-                    page_text_arrs[page_number][y_0 + i][x_0 + j] = new_segment_arr[i][
-                        j
-                    ]
-
-    return page_text_arrs
-
-
-def _non_blank_line(text_line_str: str) -> bool:
-    """Check if line is not blank."""
-    return any(line.strip() for line in text_line_str)
-
-
-def _num_left_white_spaces(text_line_list: list[str]) -> int:
-    """Check how many spaces are on the lefthand side of the text for later cleaning purposes."""
-    last_left_space_index = 0
-    for char in text_line_list:
-        if char == " ":
-            last_left_space_index += 1
-        # Word has started
-        else:
-            break
-    return last_left_space_index
-
+            segment_rows = _layout_segment_rows(
+                item[TEXT_KEY], segment_width, segment_height, y_1 - 1, resize
+            )
 
-def _clean_page_text_arr(text_arr: list[list[str]]) -> str:
-    """Take in a 2D array of a page, with char text lines, and convert it to one page string."""
-    # Remove as much left white space as possible without changing relative positions
-    num_left_spaces = min(_num_left_white_spaces(text_line) for text_line in text_arr)
+            # The segment box overwrites anything underneath it, including with blanks
+            visible_width = min(segment_width, canvas_width - x_0)
+            for row_offset, segment_row in enumerate(segment_rows):
+                row_index = y_0 + row_offset
+                if row_index >= canvas_height or visible_width <= 0:
+                    break
+                row_intervals = _write_to_sparse_row(
+                    sparse_page.get(row_index, []),
+                    x_0,
+                    segment_row[:visible_width],
+                )
+                if row_intervals:
+                    sparse_page[row_index] = row_intervals
+                else:
+                    sparse_page.pop(row_index, None)
+
+    return sparse_pages
+
+
+def _render_sparse_row(row_intervals: SparseRowType, start_col: int) -> str:
+    """Render the text intervals of a row into a line starting at start_col."""
+    line_parts = []
+    current_col = start_col
+    for interval_start, interval_text in row_intervals:
+        line_parts.append(" " * (interval_start - current_col))
+        line_parts.append(interval_text)
+        current_col = interval_start + len(interval_text)
+    return "".join(line_parts)
+
+
+def _clean_sparse_page(sparse_page: SparsePageType) -> str:
+    """Convert the sparse text rows of a page to one page string.
+
+    Consecutive blank rows collapse into a single blank line, and as much left white space as
+    possible is removed without changing relative positions.
+    """
+    num_left_spaces = min(
+        (row_intervals[0][0] for row_intervals in sparse_page.values()), default=0
+    )
 
     page_line_texts_list = []
-    previous_is_blank = False
-    for text_line in text_arr:
-        # Put all chars in that line together
-        line_text = "".join(text_line[num_left_spaces:]).rstrip()
-        # Remove multiple consecutive blank lines and keep only one
-        line_not_blank = _non_blank_line(line_text)
-        if line_not_blank or not previous_is_blank:
-            page_line_texts_list.append(line_text)
-
-        # Update previous line is blank
-        if line_not_blank:
-            previous_is_blank = False
-        else:
-            previous_is_blank = True
+    previous_row_index = -1
+    for row_index, row_intervals in sorted(sparse_page.items()):
+        # Keep one blank line for any gap between occupied rows
+        if row_index > previous_row_index + 1:
+            page_line_texts_list.append(EMPTY_STRING)
+        page_line_texts_list.append(_render_sparse_row(row_intervals, num_left_spaces))
+        previous_row_index = row_index
 
     # Combine all lines with a new line character
     page_lines_str = "\n".join(page_line_texts_list).rstrip()
@@ -239,7 +389,7 @@ def _clean_page_text_arr(text_arr: list[list[str]]) -> str:
 
 
 def convert_output_to_str_formatted(
-    serialized_document: dict[str, Any],
+    serialized_document: SerializedDocumentType,
     page_width: int = 300,
     page_height: int = 100,
     resize: bool = True,
@@ -247,10 +397,12 @@ def convert_output_to_str_formatted(
     """Convert entire Extract output into a string per page that visually looks like the original.
 
     The output will contain spaces and newlines to make the printed output resemble the page
-    layout.
+    layout. If the output contains PDF page information, each page is rotated upright and gets a
+    canvas proportional to its size, where the largest page width and height in the document
+    map to page_width and page_height.
 
     Args:
-        serialized_document: a serialized document
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
         page_width: the max number of characters in a printed line
         page_height: the max lines in a printed document representation
         resize: if the given page_width and page_height would cut off any segment,
@@ -283,13 +435,19 @@ def convert_output_to_str_formatted(
 
             Valerie
     """
-    document_items = _convert_output_to_texts_with_locs(serialized_document)
-    page_text_arrays = {}
+    parsed_serialized_document = load_output_to_pydantic(
+        serialized_document, lazy_text_node_data=True
+    )
+    document_items = _convert_output_to_texts_with_locs(parsed_serialized_document)
+    sparse_pages: dict[int, SparsePageType] = {}
 
     for _ in range(MAX_RETRIES):
         try:
-            page_text_arrays = _convert_segments_to_dict(
-                document_items, page_width, page_height, resize
+            page_canvas_sizes = _get_page_canvas_sizes(
+                parsed_serialized_document.pdf_pages, page_width, page_height
+            )
+            sparse_pages = _convert_segments_to_dict(
+                document_items, page_width, page_height, resize, page_canvas_sizes
             )
         except PageTooShortException:
             logger.info(
@@ -313,8 +471,8 @@ def convert_output_to_str_formatted(
         )
 
     converted_pages = []
-    for _, text_arr in sorted(page_text_arrays.items()):
-        page_lines_str = _clean_page_text_arr(text_arr)
+    for _, sparse_page in sorted(sparse_pages.items()):
+        page_lines_str = _clean_sparse_page(sparse_page)
         converted_pages.append(page_lines_str)
 
     return converted_pages
@@ -0,0 +1,360 @@
+# Copyright 2024-present Kensho Technologies, LLC.
+"""SQLite store of the items, table cells, locations and relations of many documents.
+
+Documents are converted once and their rows are inserted with executemany in batches, inside a
+single transaction per call. The database uses write-ahead logging, so readers in other processes
+are not blocked while documents are added, and indexes on the document, page, category and table
+columns, so questions across documents are indexed queries instead of conversions of the JSON.
+"""
+
+import os
+import sqlite3
+from typing import Any, Iterable, Mapping, Sequence
+
+from .constants import (
+    CATEGORY_KEY,
+    CONTENT_ID_KEY,
+    EMPTY_STRING,
+    LOCATIONS_KEY,
+    TEXT_KEY,
+    AnnotationType,
+)
+from .convert_output import _get_item_relations, _iter_document_items
+from .extract_output_models import LocationModel, SerializedDocumentType
+from .html_output import _build_cell_uid_to_annotation_mapping
+from .output_to_tables import _build_table_uid_to_cells_mapping
+from .utils import _get_document_index, load_output_to_pydantic
+
+# Number of rows of a table held before they are inserted with executemany
+DEFAULT_BATCH_SIZE = 10_000
+
+CORPUS_TABLE_NAMES = ("documents", "items", "table_cells", "locations", "relations")
+
+CORPUS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_id TEXT PRIMARY KEY,
+    num_items INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    document_id TEXT NOT NULL,
+    item_index INTEGER NOT NULL,
+    content_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    text TEXT NOT NULL,
+    page_number INTEGER,
+    PRIMARY KEY (document_id, item_index)
+);
+CREATE TABLE IF NOT EXISTS table_cells (
+    document_id TEXT NOT NULL,
+    table_uid TEXT NOT NULL,
+    cell_uid TEXT NOT NULL,
+    row_index INTEGER NOT NULL,
+    col_index INTEGER NOT NULL,
+    row_span INTEGER NOT NULL,
+    col_span INTEGER NOT NULL,
+    is_column_header INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS locations (
+    document_id TEXT NOT NULL,
+    content_id TEXT NOT NULL,
+    location_index INTEGER NOT NULL,
+    page_number INTEGER NOT NULL,
+    x REAL NOT NULL,
+    y REAL NOT NULL,
+    width REAL NOT NULL,
+    height REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS relations (
+    document_id TEXT NOT NULL,
+    relation_type TEXT NOT NULL,
+    source_content_id TEXT NOT NULL,
+    target_content_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_content_id ON items (document_id, content_id);
+CREATE INDEX IF NOT EXISTS items_page_number ON items (document_id, page_number);
+CREATE INDEX IF NOT EXISTS items_category ON items (category, document_id);
+CREATE INDEX IF NOT EXISTS table_cells_table_uid
+    ON table_cells (document_id, table_uid, row_index, col_index);
+CREATE INDEX IF NOT EXISTS locations_content_id ON locations (document_id, content_id);
+CREATE INDEX IF NOT EXISTS locations_page_number ON locations (document_id, page_number);
+CREATE INDEX IF NOT EXISTS relations_source ON relations (document_id, source_content_id);
+CREATE INDEX IF NOT EXISTS relations_target ON relations (document_id, target_content_id);
+"""
+
+_INSERT_STATEMENTS = {
+    "documents": "INSERT INTO documents VALUES (?, ?)",
+    "items": "INSERT INTO items VALUES (?, ?, ?, ?, ?, ?)",
+    "table_cells": "INSERT INTO table_cells VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    "locations": "INSERT INTO locations VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+    "relations": "INSERT INTO relations VALUES (?, ?, ?, ?)",
+}
+
+
+def _get_location_rows(
+    document_id: str,
+    content_id: str,
+    locations: Sequence[LocationModel] | None,
+) -> list[tuple[Any, ...]]:
+    """Get the locations rows of a content node."""
+    if not locations:
+        return []
+    return [
+        (
+            document_id,
+            content_id,
+            location_index,
+            location.page_number,
+            location.x,
+            location.y,
+            location.width,
+            location.height,
+        )
+        for location_index, location in enumerate(locations)
+    ]
+
+
+class CorpusStore:
+    """SQLite database of the items, table cells, locations and relations of many documents.
+
+    Use as a context manager, or call close once done. Query the tables with the connection:
+        documents(document_id, num_items)
+        items(document_id, item_index, content_id, category, text, page_number)
+        table_cells(document_id, table_uid, cell_uid, row_index, col_index, row_span, col_span,
+            is_column_header, text)
+        locations(document_id, content_id, location_index, page_number, x, y, width, height)
+        relations(document_id, relation_type, source_content_id, target_content_id)
+    Locations are stored for items and table cells, and the page number of an item is the page
+    of its first location.
+    """
+
+    def __init__(
+        self,
+        database_path: str | os.PathLike[str],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        """Open the database, creating it and its tables if needed, in write-ahead log mode."""
+        self.database_path = os.fspath(database_path)
+        self.batch_size = batch_size
+        # Transactions are started explicitly, so a call adds all its documents or none
+        self.connection = sqlite3.connect(self.database_path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(CORPUS_SCHEMA)
+        self._rows: dict[str, list[tuple[Any, ...]]] = {
+            table_name: [] for table_name in CORPUS_TABLE_NAMES
+        }
+        # Ids of the documents which may have rows held in the batches
+        self._held_document_ids: set[str] = set()
+
+    def __enter__(self) -> "CorpusStore":
+        """Start using the store."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close the database."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self.connection.close()
+
+    def _add_rows(self, table_name: str, rows: Iterable[tuple[Any, ...]]) -> None:
+        """Hold rows of a table, inserting them once the batch is full."""
+        table_rows = self._rows[table_name]
+        table_rows.extend(rows)
+        if len(table_rows) >= self.batch_size:
+            self._insert_rows(table_name)
+
+    def _insert_rows(self, table_name: str) -> None:
+        """Insert the held rows of a table."""
+        table_rows = self._rows[table_name]
+        if table_rows:
+            self.connection.executemany(_INSERT_STATEMENTS[table_name], table_rows)
+            table_rows.clear()
+        if not any(self._rows.values()):
+            self._held_document_ids.clear()
+
+    def _add_document_rows(
+        self, document_id: str, serialized_document: SerializedDocumentType
+    ) -> int:
+        """Hold the rows of a document, replacing its rows already in the database."""
+        if document_id in self._held_document_ids:
+            # Insert the held rows of the document, so they are replaced as well
+            for table_name in CORPUS_TABLE_NAMES:
+                self._insert_rows(table_name)
+        for table_name in CORPUS_TABLE_NAMES:
+            self.connection.execute(
+                f"DELETE FROM {table_name} WHERE document_id = ?", (document_id,)
+            )
+        self._held_document_ids.add(document_id)
+        parsed_serialized_document = load_output_to_pydantic(
+            serialized_document, lazy_text_node_data=True
+        )
+
+        num_items = 0
+        for item_index, item in enumerate(
+            _iter_document_items(parsed_serialized_document, return_locations=True)
+        ):
+            content_id = item[CONTENT_ID_KEY]
+            locations = item[LOCATIONS_KEY]
+            self._add_rows(
+                "items",
+                [
+                    (
+                        document_id,
+                        item_index,
+                        content_id,
+                        item[CATEGORY_KEY],
+                        item[TEXT_KEY],
+                        locations[0].page_number if locations else None,
+                    )
+                ],
+            )
+            self._add_rows(
+                "locations", _get_location_rows(document_id, content_id, locations)
+            )
+            num_items += 1
+
+        cell_uid_to_annotation = _get_document_index(
+            parsed_serialized_document, _build_cell_uid_to_annotation_mapping
+        )
+        table_uid_to_cells = _get_document_index(
+            parsed_serialized_document, _build_table_uid_to_cells_mapping
+        )
+        for table_uid, table_cells in table_uid_to_cells.items():
+            for cell in table_cells:
+                annotation = cell_uid_to_annotation.get(cell.uid)
+                if annotation is None:
+                    continue
+                if (
+                    annotation.type
+                    == AnnotationType.FIGURE_EXTRACTED_TABLE_STRUCTURE.value
+                ):
+                    cell_text = annotation.data.value or EMPTY_STRING
+                else:
+                    cell_text = (cell.content or EMPTY_STRING).strip()
+                row_index, col_index = annotation.data.index
+                row_span, col_span = annotation.data.span
+                self._add_rows(
+                    "table_cells",
+                    [
+                        (
+                            document_id,
+                            table_uid,
+                            cell.uid,
+                            row_index,
+                            col_index,
+                            row_span,
+                            col_span,
+                            annotation.data.is_column_header,
+                            cell_text,
+                        )
+                    ],
+                )
+                self._add_rows(
+                    "locations",
+                    _get_location_rows(document_id, cell.uid, cell.locations),
+                )
+
+        self._add_rows(
+            "relations",
+            [
+                (
+                    document_id,
+                    relation["relation_type"],
+                    relation["source_content_id"],
+                    relation["target_content_id"],
+                )
+                for relation in _get_item_relations(
+                    parsed_serialized_document.annotations
+                )
+            ],
+        )
+        self._add_rows("documents", [(document_id, num_items)])
+        return num_items
+
+    def add_documents(
+        self,
+        serialized_documents: (
+            Mapping[str, SerializedDocumentType]
+            | Iterable[tuple[str, SerializedDocumentType]]
+        ),
+    ) -> int:
+        """Add documents to the store in a single transaction.
+
+        Args:
+            serialized_documents: serialized documents, or the ExtractOutputModels loaded from
+                them, keyed by document id, as a mapping or pairs of document id and document.
+                Documents already in the store are replaced.
+
+        Returns:
+            the number of items added
+        """
+        documents: Iterable[tuple[str, SerializedDocumentType]] = (
+            serialized_documents.items()
+            if isinstance(serialized_documents, Mapping)
+            else serialized_documents
+        )
+        num_items = 0
+        self.connection.execute("BEGIN")
+        try:
+            for document_id, serialized_document in documents:
+                num_items += self._add_document_rows(document_id, serialized_document)
+            for table_name in CORPUS_TABLE_NAMES:
+                self._insert_rows(table_name)
+        except BaseException:
+            for table_rows in self._rows.values():
+                table_rows.clear()
+            self._held_document_ids.clear()
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+        return num_items
+
+    def add_document(
+        self, serialized_document: SerializedDocumentType, document_id: str
+    ) -> int:
+        """Add a document to the store, replacing the document with the same id.
+
+        Args:
+            serialized_document: a serialized document, or the ExtractOutputModel loaded from it
+            document_id: the id of the document in the store
+
+        Returns:
+            the number of items added
+        """
+        return self.add_documents([(document_id, serialized_document)])
+
+    def get_document_ids(self) -> list[str]:
+        """Get the ids of the documents in the store, in sorted order."""
+        return [
+            document_id
+            for (document_id,) in self.connection.execute(
+                "SELECT document_id FROM documents ORDER BY document_id"
+            )
+        ]
+
+
+def load_documents_to_sqlite(
+    serialized_documents: (
+        Mapping[str, SerializedDocumentType]
+        | Iterable[tuple[str, SerializedDocumentType]]
+    ),
+    database_path: str | os.PathLike[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """Bulk-load the items, table cells, locations and relations of documents into SQLite.
+
+    Args:
+        serialized_documents: serialized documents, or the ExtractOutputModels loaded from them,
+            keyed by document id, as a mapping or pairs of document id and document. Documents
+            already in the database are replaced.
+        database_path: the path of the SQLite database, created if needed
+        batch_size: the number of rows of a table inserted at once with executemany
+
+    Returns:
+        the number of items added
+    """
+    with CorpusStore(database_path, batch_size) as corpus_store:
+        return corpus_store.add_documents(serialized_documents)
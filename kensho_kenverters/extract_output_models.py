@@ -1,16 +1,50 @@
 # Copyright 2024-present Kensho Technologies, LLC.
 """Pydantic models for the output JSON."""
 
-from dataclasses import dataclass
-from typing import Annotated, Any, Literal, NamedTuple, TypeAlias, Union
-
-import pandas as pd
-from pydantic import BaseModel, Field  # pylint: disable=no-name-in-module
+from array import array
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Annotated,
+    Any,
+    Iterator,
+    Literal,
+    NamedTuple,
+    Self,
+    Sequence,
+    TypeAlias,
+    Union,
+    overload,
+)
+
+import numpy as np
+import numpy.typing as npt
+from pydantic import (  # pylint: disable=no-name-in-module
+    BaseModel,
+    Field,
+    PrivateAttr,
+    SerializerFunctionWrapHandler,
+    ValidationInfo,
+    ValidatorFunctionWrapHandler,
+    field_serializer,
+    field_validator,
+    model_validator,
+)
+from pydantic_core import to_json
+
+if TYPE_CHECKING:
+    # Only imported by the functions building DataFrames, so the other paths run without it
+    import pandas as pd
 
 # Location types are either dictionaries of bbox coordinates and page numbers
 # or None if locations are not returned in the Extract output.
 LocationType: TypeAlias = dict[str, float | int] | None
 
+# Validation context key to keep the text node data raw until it is read
+LAZY_TEXT_NODE_DATA_CONTEXT_KEY = "lazy_text_node_data"
+# Validation context key to store locations and character offsets in float32 arrays
+COMPACT_LOCATIONS_CONTEXT_KEY = "compact_locations"
+
 
 class Cell(BaseModel):
     index: tuple[int, int]
@@ -30,7 +64,7 @@ TableCategoryType: TypeAlias = Literal[
 class Table(NamedTuple):
     """Converted table types consisting of the table as a pandas DataFrame and its location(s)."""
 
-    df: pd.DataFrame
+    df: "pd.DataFrame"
     table_type: TableCategoryType
     locations: list[LocationType] | None = None
     cells: list[Cell] | None = None
@@ -46,6 +80,140 @@ class LocationModel(BaseModel):
     page_number: int
 
 
+class CompactLocations(Sequence[LocationModel]):
+    """Locations stored as rows of a float32 array and viewed as LocationModel objects on demand.
+
+    The rows [start, end) of the array hold the height, width, x, y and page number of each
+    location. The locations of a compact document share a single array, keyed by the order of
+    the nodes and annotations in the document.
+    """
+
+    __slots__ = ("_array", "_start", "_end")
+
+    def __init__(
+        self,
+        location_array: npt.NDArray[np.float32],
+        start: int = 0,
+        end: int | None = None,
+    ) -> None:
+        """Store the rows [start, end) of the array, or all its rows if end is None."""
+        self._array = location_array
+        self._start = start
+        self._end = len(location_array) if end is None else end
+
+    @classmethod
+    def from_locations(cls, locations: Sequence[LocationModel]) -> "CompactLocations":
+        """Store validated locations in a new array."""
+        location_array = np.array(
+            [
+                (
+                    location.height,
+                    location.width,
+                    location.x,
+                    location.y,
+                    location.page_number,
+                )
+                for location in locations
+            ],
+            dtype=np.float32,
+        ).reshape(-1, 5)
+        return cls(location_array)
+
+    @property
+    def array(self) -> npt.NDArray[np.float32]:
+        """Get the (N, 5) float32 array view of the locations."""
+        start, end = self._start, self._end
+        return self._array[start:end]
+
+    def __len__(self) -> int:
+        """Get the number of locations."""
+        return self._end - self._start
+
+    @overload
+    def __getitem__(self, index: int) -> LocationModel:  # noqa: D105
+        pass
+
+    @overload
+    def __getitem__(self, index: slice) -> list[LocationModel]:  # noqa: D105
+        pass
+
+    def __getitem__(self, index: int | slice) -> LocationModel | list[LocationModel]:
+        """Create the LocationModel views of a location or a slice of locations."""
+        if isinstance(index, slice):
+            return list(self)[index]
+        row_index = range(self._start, self._end)[index]
+        return _location_row_to_model(self._array[row_index])
+
+    def __iter__(self) -> Iterator[LocationModel]:
+        """Create the LocationModel views of the locations one at a time."""
+        for row in self.array:
+            yield _location_row_to_model(row)
+
+    def __eq__(self, other: object) -> bool:
+        """Compare the locations with another sequence of locations."""
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        """Represent the locations as a list of LocationModel."""
+        return f"CompactLocations({list(self)!r})"
+
+
+def _location_row_to_model(row: npt.NDArray[np.float32]) -> LocationModel:
+    """Create a LocationModel from a compact location row, without validating it again.
+
+    Values are read back from their shortest float32 representation, so values with up to 7
+    significant digits are the same as in the original output.
+    """
+    height, width, x, y, page_number = (float(str(value)) for value in row)
+    return LocationModel.model_construct(
+        height=height, width=width, x=x, y=y, page_number=int(page_number)
+    )
+
+
+def _share_location_arrays(compact_locations_list: list[CompactLocations]) -> None:
+    """Move the rows of many compact locations into a single shared array."""
+    if not compact_locations_list:
+        return
+    shared_array = np.concatenate(
+        [compact_locations.array for compact_locations in compact_locations_list]
+    )
+    start = 0
+    for compact_locations in compact_locations_list:
+        end = start + len(compact_locations)
+        compact_locations._array = shared_array
+        compact_locations._start = start
+        compact_locations._end = end
+        start = end
+
+
+def _is_compact(info: ValidationInfo[Any]) -> bool:
+    """Check if the COMPACT_LOCATIONS_CONTEXT_KEY validation context is set."""
+    return info.context is not None and bool(
+        info.context.get(COMPACT_LOCATIONS_CONTEXT_KEY)
+    )
+
+
+def _validate_locations(
+    value: Any, handler: ValidatorFunctionWrapHandler, info: ValidationInfo[Any]
+) -> Sequence[LocationModel] | None:
+    """Validate locations, and store them compactly if the compact context is set."""
+    locations: Sequence[LocationModel] | None = handler(value)
+    if locations is None or not _is_compact(info):
+        return locations
+    return CompactLocations.from_locations(locations)
+
+
+def _serialize_locations(
+    value: Sequence[LocationModel] | None, handler: SerializerFunctionWrapHandler
+) -> Any:
+    """Serialize compact locations as a list of locations."""
+    if isinstance(value, CompactLocations):
+        return handler(list(value))
+    return handler(value)
+
+
 class AnnotationDataModel(BaseModel):
     """Pydantic object for an annotation table cell's index and span."""
 
@@ -62,7 +230,14 @@ class TableStructureAnnotationModel(BaseModel):
     content_uids: list[str]
     data: AnnotationDataModel
     type: Literal["table_structure", "figure_extracted_table_structure"]
-    locations: list[LocationModel] | None = None
+    locations: Sequence[LocationModel] | None = None
+
+    _validate_locations = field_validator("locations", mode="wrap")(
+        staticmethod(_validate_locations)
+    )
+    _serialize_locations = field_serializer("locations", mode="wrap")(
+        staticmethod(_serialize_locations)
+    )
 
 
 class RelationAnnotationDataModel(BaseModel):
@@ -84,8 +259,165 @@ class TextNodeDataModel(BaseModel):
     """Pydantic object for the structured output character offsets and their text boxes."""
 
     texts: list[str] | None
-    text_locations: list[LocationModel | None] | None
-    character_offsets: list[list[float] | None] | None
+    text_locations: Sequence[LocationModel | None] | None
+    character_offsets: list[Sequence[float] | None] | None
+
+    @field_validator("text_locations", mode="wrap")
+    @classmethod
+    def _validate_text_locations(
+        cls,
+        value: Any,
+        handler: ValidatorFunctionWrapHandler,
+        info: ValidationInfo[Any],
+    ) -> Sequence[LocationModel | None] | None:
+        """Validate text locations, and store them compactly if compact and none are missing."""
+        text_locations: Sequence[LocationModel | None] | None = handler(value)
+        if (
+            text_locations is None
+            or not _is_compact(info)
+            or any(location is None for location in text_locations)
+        ):
+            return text_locations
+        return CompactLocations.from_locations(
+            [location for location in text_locations if location is not None]
+        )
+
+    @field_serializer("text_locations", mode="wrap")
+    def _serialize_text_locations(
+        self,
+        value: Sequence[LocationModel | None] | None,
+        handler: SerializerFunctionWrapHandler,
+    ) -> Any:
+        """Serialize compact text locations as a list of locations."""
+        if isinstance(value, CompactLocations):
+            return handler(list(value))
+        return handler(value)
+
+    @field_validator("character_offsets", mode="wrap")
+    @classmethod
+    def _validate_character_offsets(
+        cls,
+        value: Any,
+        handler: ValidatorFunctionWrapHandler,
+        info: ValidationInfo[Any],
+    ) -> list[Sequence[float] | None] | None:
+        """Validate character offsets, and store them as float32 arrays if compact."""
+        character_offsets: list[Sequence[float] | None] | None = handler(value)
+        if character_offsets is None or not _is_compact(info):
+            return character_offsets
+        return [
+            None if offsets is None else array("f", offsets)
+            for offsets in character_offsets
+        ]
+
+    @field_serializer("character_offsets", mode="wrap")
+    def _serialize_character_offsets(
+        self,
+        value: list[Sequence[float] | None] | None,
+        handler: SerializerFunctionWrapHandler,
+    ) -> Any:
+        """Serialize float32 character offset arrays as lists, as in the original output."""
+        if value is None:
+            return handler(value)
+        return handler(
+            [
+                (
+                    offsets
+                    if offsets is None or isinstance(offsets, list)
+                    else [float(str(offset)) for offset in np.asarray(offsets)]
+                )
+                for offsets in value
+            ]
+        )
+
+
+class LazyTextNodeDataModel(TextNodeDataModel):
+    """Text node data kept as raw data until one of its fields is read.
+
+    The character offsets hold one float per character, so validating them dominates the load
+    time of outputs with character offsets. The raw data is validated the first time a field is
+    read, which raises the same ValidationError as an eager load would. The raw data is either
+    the deserialized JSON, or the JSON itself as bytes or a memoryview.
+    """
+
+    _raw_data: Any = PrivateAttr(None)
+    _context: dict[str, Any] | None = PrivateAttr(None)
+
+    @classmethod
+    def from_raw_data(
+        cls, raw_data: Any, context: dict[str, Any] | None = None
+    ) -> "LazyTextNodeDataModel":
+        """Wrap raw text node data without validating it.
+
+        The validation context of the document is kept to validate the raw data with it. The
+        model attributes are set directly, as model_construct is slow for the many text nodes of
+        large documents.
+        """
+        lazy_text_node_data = cls.__new__(cls)
+        object.__setattr__(lazy_text_node_data, "__dict__", {})
+        object.__setattr__(lazy_text_node_data, "__pydantic_fields_set__", set())
+        object.__setattr__(lazy_text_node_data, "__pydantic_extra__", None)
+        object.__setattr__(
+            lazy_text_node_data,
+            "__pydantic_private__",
+            {"_raw_data": raw_data, "_context": context},
+        )
+        return lazy_text_node_data
+
+    @property
+    def is_parsed(self) -> bool:
+        """Whether the raw data was validated."""
+        return self._raw_data is None
+
+    def parse(self) -> None:
+        """Validate the raw data and set the fields, if not done already.
+
+        Threads reading fields at the same time may both validate the raw data, but the fields are
+        set before the raw data is cleared, so no thread sees neither.
+        """
+        # Read once, as another thread may clear it
+        raw_data = self._raw_data
+        if raw_data is None:
+            return
+        if isinstance(raw_data, (bytes, memoryview)):
+            parsed = TextNodeDataModel.model_validate_json(
+                bytes(raw_data), context=self._context
+            )
+        else:
+            parsed = TextNodeDataModel.model_validate(raw_data, context=self._context)
+        if self._raw_data is not None:
+            self.__dict__.update(parsed.__dict__)
+            self._raw_data = None
+
+    def get_raw_json(self) -> bytes | None:
+        """Get the raw data as JSON without validating it, or None if it was validated."""
+        raw_data = self._raw_data
+        if raw_data is None:
+            return None
+        if isinstance(raw_data, (bytes, memoryview)):
+            return bytes(raw_data)
+        return to_json(raw_data)
+
+    def __getattr__(self, name: str) -> Any:
+        """Validate the raw data on the first read of a field."""
+        if name in TextNodeDataModel.model_fields:
+            self.parse()
+            return self.__dict__[name]
+        return super().__getattr__(name)  # type: ignore[misc]
+
+    def __eq__(self, other: object) -> bool:
+        """Compare the fields with another text node data, lazy or not."""
+        if not isinstance(other, TextNodeDataModel):
+            return NotImplemented
+        self.parse()
+        if isinstance(other, LazyTextNodeDataModel):
+            other.parse()
+        return self.__dict__ == other.__dict__
+
+    def __repr_args__(self) -> Any:
+        """Validate the raw data before representing the fields."""
+        self.parse()
+        return super().__repr_args__()
 
 
 class ContentModel(BaseModel):
@@ -95,9 +427,42 @@ class ContentModel(BaseModel):
     type: str
     content: str | None
     children: list["ContentModel"]
-    locations: list[LocationModel] | None = None
+    locations: Sequence[LocationModel] | None = None
     text_node_data: TextNodeDataModel | None = None
 
+    _validate_locations = field_validator("locations", mode="wrap")(
+        staticmethod(_validate_locations)
+    )
+    _serialize_locations = field_serializer("locations", mode="wrap")(
+        staticmethod(_serialize_locations)
+    )
+
+    @field_validator("text_node_data", mode="wrap")
+    @classmethod
+    def _validate_text_node_data(
+        cls,
+        value: Any,
+        handler: ValidatorFunctionWrapHandler,
+        info: ValidationInfo[Any],
+    ) -> TextNodeDataModel | None:
+        """Keep the text node data raw if the LAZY_TEXT_NODE_DATA_CONTEXT_KEY context is set."""
+        if (
+            isinstance(value, dict)
+            and info.context is not None
+            and info.context.get(LAZY_TEXT_NODE_DATA_CONTEXT_KEY)
+        ):
+            return LazyTextNodeDataModel.from_raw_data(value, info.context)
+        return handler(value)  # type: ignore[no-any-return]
+
+    @field_serializer("text_node_data", mode="wrap")
+    def _serialize_text_node_data(
+        self, value: TextNodeDataModel | None, handler: SerializerFunctionWrapHandler
+    ) -> Any:
+        """Validate lazy text node data before serializing it."""
+        if isinstance(value, LazyTextNodeDataModel):
+            value.parse()
+        return handler(value)
+
 
 class PDFPageModel(BaseModel):
     """Pydantic object for the PDF page information."""
@@ -120,6 +485,49 @@ class ExtractOutputModel(BaseModel):
     content_tree: ContentModel
     pdf_pages: list[PDFPageModel] | None = None
 
+    @model_validator(mode="after")
+    def _share_compact_location_arrays(self, info: ValidationInfo[Any]) -> Self:
+        """Move the compact locations into one array if the compact context is set."""
+        if _is_compact(info):
+            self.share_location_arrays()
+        return self
+
+    def share_location_arrays(self) -> None:
+        """Move the compact locations of all nodes, text runs and annotations into one array."""
+        compact_locations_list = []
+        content_stack = [self.content_tree]
+        while content_stack:
+            content = content_stack.pop()
+            if isinstance(content.locations, CompactLocations):
+                compact_locations_list.append(content.locations)
+            text_node_data = content.text_node_data
+            if (
+                text_node_data is not None
+                and not (
+                    isinstance(text_node_data, LazyTextNodeDataModel)
+                    and not text_node_data.is_parsed
+                )
+                and isinstance(text_node_data.text_locations, CompactLocations)
+            ):
+                compact_locations_list.append(text_node_data.text_locations)
+            content_stack.extend(reversed(content.children))
+        for annotation in self.annotations:
+            if isinstance(annotation, TableStructureAnnotationModel) and isinstance(
+                annotation.locations, CompactLocations
+            ):
+                compact_locations_list.append(annotation.locations)
+        _share_location_arrays(compact_locations_list)
+
+
+class ExtractOutputWrapperModel(BaseModel):
+    """Pydantic object for an Extract response wrapping the output in its "output" key."""
+
+    output: ExtractOutputModel
+
+
+# Converters take either the serialized document or the already loaded model
+SerializedDocumentType: TypeAlias = dict[str, Any] | ExtractOutputModel
+
 
 @dataclass
 class ConvertOutputResult:
@@ -129,6 +537,83 @@ class ConvertOutputResult:
     relations: list[dict[str, str]] | None
 
 
+@dataclass
+class SectionNode:
+    """A section in the section tree of a document.
+
+    The section spans the items item_list[start_index:end_index] of the document, starting with
+    its heading item and including the items of all its subsections.
+    """
+
+    heading_level: int
+    heading_index: int | None
+    start_index: int
+    end_index: int
+    children: list["SectionNode"] = field(default_factory=list)
+
+
+@dataclass
+class SectionTreeResult:
+    """Result of extract_section_tree."""
+
+    item_list: list[dict[str, Any]]
+    root: SectionNode
+
+
+@dataclass
+class Chunk:
+    """A chunk of document text packed within a size budget, with its provenance."""
+
+    text: str
+    content_ids: list[str]
+    page_numbers: list[int]
+    locations: list[LocationType]
+
+
+class OffsetSpan(NamedTuple):
+    """Character range of an item in a converted text, with the item's content id and locations.
+
+    The item index is the index of the item in convert_output_to_items_list_and_relations.
+    """
+
+    start: int
+    end: int
+    content_id: str
+    item_index: int
+    locations: list[LocationModel] | None
+
+
+@dataclass
+class TextWithOffsets:
+    """Converted text with the spans of its items, sorted by start offset."""
+
+    text: str
+    offset_spans: list[OffsetSpan]
+
+
+@dataclass
+class MultiOutputResult:
+    """Result of convert_output_multi, with None for the output formats not requested."""
+
+    text: str | None = None
+    markdown: str | None = None
+    text_by_page: list[str] | None = None
+    markdown_by_page: list[str] | None = None
+
+
+class TextSearchHit(NamedTuple):
+    """Item or table cell of an indexed document containing a searched phrase.
+
+    The bounding box is the (x, y, width, height) of the locations of the item or table cell on
+    its first page, and None with the page number if it has no locations.
+    """
+
+    document_id: str
+    content_uid: str
+    page_number: int | None
+    bounding_box: tuple[float, float, float, float] | None
+
+
 class TableGridAndStructure(NamedTuple):
     """Objects consisting of table category type, string grid and structure annotations."""
 
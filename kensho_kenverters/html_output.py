@@ -0,0 +1,213 @@
+# Copyright 2024-present Kensho Technologies, LLC.
+"""Functions to write the output as HTML to a stream, one item at a time.
+
+Titles and headings are written as h1 to h5 elements and other texts as paragraphs, with the HTML
+renderer. Tables are written from their table structure annotations rather than their grids, so
+merged cells keep their rowspan and colspan. Items are grouped in a section per page, and the
+stream is flushed at the end of every page, so viewers can render the first pages while the rest
+of the document is converted.
+"""
+
+import html
+import io
+from typing import Any, Sequence, TextIO
+
+from .constants import (
+    CATEGORY_KEY,
+    CONTENT_ID_KEY,
+    EMPTY_STRING,
+    LOCATIONS_KEY,
+    TABLE_CONTENT_CATEGORIES,
+    TEXT_KEY,
+    AnnotationType,
+)
+from .convert_output import _iter_document_items
+from .extract_output_models import (
+    AnnotationDataModel,
+    ContentModel,
+    ExtractOutputModel,
+    SerializedDocumentType,
+    TableStructureAnnotationModel,
+)
+from .output_to_tables import _build_table_uid_to_cells_mapping
+from .renderers import HTML_RENDERER
+from .utils import _get_document_index, load_output_to_pydantic
+
+HTML_DOCUMENT_START = (
+    '<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n</head>\n<body>\n'
+)
+HTML_DOCUMENT_END = "</body>\n</html>\n"
+
+_TABLE_ITEM_CATEGORIES = {category.lower() for category in TABLE_CONTENT_CATEGORIES}
+
+
+def _build_cell_uid_to_annotation_mapping(
+    parsed_serialized_document: ExtractOutputModel,
+) -> dict[str, TableStructureAnnotationModel]:
+    """Get the table structure annotation of every table cell uid of a parsed document."""
+    return {
+        uid: annotation
+        for annotation in parsed_serialized_document.annotations
+        if isinstance(annotation, TableStructureAnnotationModel)
+        for uid in annotation.content_uids
+    }
+
+
+def _write_table_html(
+    stream: TextIO,
+    table_cells: Sequence[ContentModel],
+    cell_uid_to_annotation: dict[str, TableStructureAnnotationModel],
+) -> None:
+    """Write a table with a cell element per table cell, spanning its merged rows and columns.
+
+    Column header cells are written as th elements. Tables without column header annotations
+    use their first row as header, as in markdown.
+    """
+    index_to_cell: dict[tuple[int, int], tuple[AnnotationDataModel, str]] = {}
+    for cell in table_cells:
+        annotation = cell_uid_to_annotation.get(cell.uid)
+        if annotation is None:
+            continue
+        if annotation.type == AnnotationType.FIGURE_EXTRACTED_TABLE_STRUCTURE.value:
+            cell_text = annotation.data.value or EMPTY_STRING
+        elif isinstance(cell.content, str):
+            cell_text = cell.content.strip()
+        else:
+            raise ValueError(
+                "Cell content is not a string. Cannot construct a table of strings"
+            )
+        index_to_cell[annotation.data.index] = (annotation.data, cell_text)
+
+    n_rows = 0
+    n_cols = 0
+    for (row, col), (data, _) in index_to_cell.items():
+        n_rows = max(n_rows, row + data.span[0])
+        n_cols = max(n_cols, col + data.span[1])
+    has_column_headers = any(
+        data.is_column_header for data, _ in index_to_cell.values()
+    )
+
+    stream.write("<table>\n")
+    # Positions covered by merged cells starting in an earlier row or column
+    covered_indexes: set[tuple[int, int]] = set()
+    for row in range(n_rows):
+        # Rows covered by the cells above are kept, so the spans stay aligned
+        row_parts = ["<tr>"]
+        for col in range(n_cols):
+            indexed_cell = index_to_cell.get((row, col))
+            if indexed_cell is None:
+                if (row, col) not in covered_indexes:
+                    row_parts.append("<td></td>")
+                continue
+            data, cell_text = indexed_cell
+            is_header = data.is_column_header if has_column_headers else row == 0
+            cell_tag = "th" if is_header else "td"
+            row_span, col_span = data.span
+            attributes = ""
+            if row_span > 1:
+                attributes += f' rowspan="{row_span}"'
+            if col_span > 1:
+                attributes += f' colspan="{col_span}"'
+            if row_span > 1 or col_span > 1:
+                covered_indexes.update(
+                    (row + row_offset, col + col_offset)
+                    for row_offset in range(row_span)
+                    for col_offset in range(col_span)
+                )
+            row_parts.append(
+                f"<{cell_tag}{attributes}>{html.escape(cell_text)}</{cell_tag}>"
+            )
+        row_parts.append("</tr>\n")
+        stream.write("".join(row_parts))
+    stream.write("</table>\n")
+
+
+def _get_item_page_number(item: dict[str, Any]) -> int | None:
+    """Get the page number of the first location of an item, if it has locations."""
+    locations = item[LOCATIONS_KEY]
+    if not locations:
+        return None
+    return locations[0].page_number  # type: ignore[no-any-return]
+
+
+def write_output_html(
+    serialized_document: SerializedDocumentType,
+    stream: TextIO,
+    full_document: bool = True,
+) -> None:
+    """Write Extract output to a text stream as HTML, one item at a time.
+
+    Args:
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
+        stream: the text stream to write to. It is flushed at the end of every page.
+        full_document: if True, write a complete HTML document, otherwise only the elements of
+            its body
+
+    Example Output:
+        <section data-page-number="0">
+        <h1>Random Title for the First Page</h1>
+        <p>This page is about things.</p>
+        <table>
+        <tr><th colspan="2">Revenue</th></tr>
+        <tr><td>Q1</td><td>Q2</td></tr>
+        </table>
+        </section>
+    """
+    parsed_serialized_document = load_output_to_pydantic(
+        serialized_document, lazy_text_node_data=True
+    )
+    table_uid_to_cells = _get_document_index(
+        parsed_serialized_document, _build_table_uid_to_cells_mapping
+    )
+    cell_uid_to_annotation = _get_document_index(
+        parsed_serialized_document, _build_cell_uid_to_annotation_mapping
+    )
+
+    if full_document:
+        stream.write(HTML_DOCUMENT_START)
+    current_page_number: int | None = None
+    for item in _iter_document_items(parsed_serialized_document, return_locations=True):
+        # Some types like figures don't have content
+        if not item[TEXT_KEY]:
+            continue
+        page_number = _get_item_page_number(item)
+        # Items without locations stay in the current page
+        if page_number is not None and page_number != current_page_number:
+            if current_page_number is not None:
+                stream.write("</section>\n")
+                stream.flush()
+            stream.write(f'<section data-page-number="{page_number}">\n')
+            current_page_number = page_number
+        if item[CATEGORY_KEY] in _TABLE_ITEM_CATEGORIES:
+            _write_table_html(
+                stream,
+                table_uid_to_cells[item[CONTENT_ID_KEY]],
+                cell_uid_to_annotation,
+            )
+        else:
+            stream.write(HTML_RENDERER.render_item(item))
+            stream.write("\n")
+    if current_page_number is not None:
+        stream.write("</section>\n")
+    if full_document:
+        stream.write(HTML_DOCUMENT_END)
+    stream.flush()
+
+
+def convert_output_to_html(
+    serialized_document: SerializedDocumentType,
+    full_document: bool = True,
+) -> str:
+    """Convert entire Extract output into an HTML string.
+
+    Args:
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
+        full_document: if True, return a complete HTML document, otherwise only the elements of
+            its body
+
+    Returns:
+        the HTML written by write_output_html
+    """
+    stream = io.StringIO()
+    write_output_html(serialized_document, stream, full_document)
+    return stream.getvalue()
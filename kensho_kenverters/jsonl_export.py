@@ -0,0 +1,153 @@
+# Copyright 2024-present Kensho Technologies, LLC.
+"""Export the items of many documents as JSON lines, one item per line.
+
+Items are serialized with orjson when it is installed, and pydantic_core otherwise, which are
+both several times faster than json.dumps. Locations are passed to the serializer as their field
+dictionaries instead of being dumped one model at a time, and encoded lines are written to the
+stream in large blocks.
+"""
+
+import os
+from typing import IO, Any, Callable, Iterable, Mapping
+
+from pydantic_core import to_json
+
+from .constants import LOCATIONS_KEY
+from .convert_output import _iter_document_items
+from .extract_output_models import LocationModel, SerializedDocumentType
+from .utils import load_output_to_pydantic
+
+try:
+    import orjson
+
+    _HAS_ORJSON = True
+except ImportError:
+    _HAS_ORJSON = False
+
+# Key of the document id added to every line when documents are given ids
+DOCUMENT_ID_KEY = "document_id"
+# Encoded lines are held until they reach this size, in bytes, then written at once
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+
+def _get_encoder() -> Callable[[Any], bytes]:
+    """Get the fastest installed JSON encoder."""
+    if _HAS_ORJSON:
+        encode: Callable[[Any], bytes] = orjson.dumps
+        return encode
+    return to_json
+
+
+def _get_location_dicts(
+    locations: Iterable[LocationModel] | None,
+) -> list[dict[str, Any]] | None:
+    """Get the field dictionaries of locations, which every encoder serializes natively."""
+    if locations is None:
+        return None
+    return [location.__dict__ for location in locations]
+
+
+class JsonlItemWriter:
+    """Write the items of documents to a binary stream as JSON lines, through a buffer.
+
+    Use as a context manager, or call flush once done, to write the last buffered lines.
+    """
+
+    def __init__(
+        self, stream: IO[bytes], buffer_size: int = DEFAULT_BUFFER_SIZE
+    ) -> None:
+        """Write to the stream in blocks of about buffer_size bytes."""
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self._encode = _get_encoder()
+        self._lines: list[bytes] = []
+        self._buffered_size = 0
+
+    def __enter__(self) -> "JsonlItemWriter":
+        """Start writing."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Write the buffered lines."""
+        self.flush()
+
+    def write_document(
+        self,
+        serialized_document: SerializedDocumentType,
+        document_id: str | None = None,
+    ) -> int:
+        """Write a line per item of a document, in reading order.
+
+        Args:
+            serialized_document: a serialized document, or the ExtractOutputModel loaded from it
+            document_id: if given, added to every line as "document_id", so lines of many
+                documents in the same stream can be told apart
+
+        Returns:
+            the number of lines written
+        """
+        parsed_serialized_document = load_output_to_pydantic(
+            serialized_document, lazy_text_node_data=True
+        )
+        encode = self._encode
+        lines = self._lines
+        num_lines = 0
+        for item in _iter_document_items(
+            parsed_serialized_document, return_locations=True
+        ):
+            item[LOCATIONS_KEY] = _get_location_dicts(item[LOCATIONS_KEY])
+            if document_id is not None:
+                item = {DOCUMENT_ID_KEY: document_id, **item}
+            line = encode(item) + b"\n"
+            lines.append(line)
+            self._buffered_size += len(line)
+            num_lines += 1
+            if self._buffered_size >= self.buffer_size:
+                self.flush()
+        return num_lines
+
+    def flush(self) -> None:
+        """Write the buffered lines to the stream."""
+        if self._lines:
+            self.stream.write(b"".join(self._lines))
+            self._lines.clear()
+            self._buffered_size = 0
+        self.stream.flush()
+
+
+def export_items_to_jsonl(
+    serialized_documents: (
+        Iterable[SerializedDocumentType] | Mapping[str, SerializedDocumentType]
+    ),
+    output: str | os.PathLike[str] | IO[bytes],
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+) -> int:
+    r"""Export the items of many documents to a JSON lines file, one item per line.
+
+    Args:
+        serialized_documents: serialized documents, or the ExtractOutputModels loaded from them.
+            If given as a mapping, its keys are added to the lines of each document as
+            "document_id".
+        output: the path of the file to write, or a binary stream to write to
+        buffer_size: the size, in bytes, of the blocks written to the output
+
+    Returns:
+        the number of lines written
+
+    Example Output:
+        {"document_id":"a","content_id":"1","category":"text","text":"2019","locations":[...]}\n
+        {"document_id":"a","content_id":"5","category":"table","table":[["Q1","Q2"]],...}\n
+    """
+    if isinstance(output, (str, os.PathLike)):
+        with open(output, "wb") as f:
+            return export_items_to_jsonl(serialized_documents, f, buffer_size)
+    documents: Iterable[tuple[str | None, SerializedDocumentType]] = (
+        serialized_documents.items()
+        if isinstance(serialized_documents, Mapping)
+        else ((None, document) for document in serialized_documents)
+    )
+    num_lines = 0
+    with JsonlItemWriter(output, buffer_size) as writer:
+        for document_id, serialized_document in documents:
+            num_lines += writer.write_document(serialized_document, document_id)
+    return num_lines
@@ -0,0 +1,318 @@
+# Copyright 2024-present Kensho Technologies, LLC.
+"""Functions to split the output into size-budgeted chunks for retrieval."""
+
+from collections import defaultdict
+from typing import Any, Iterable, Iterator
+
+from .constants import (
+    CATEGORY_KEY,
+    CHARACTERS_PER_TOKEN,
+    CONTENT_ID_KEY,
+    FIGURE_EXTRACTED_TABLE_KEY,
+    LOCATIONS_KEY,
+    SECTION_HEADING_LEVELS,
+    TABLE_KEY,
+    TEXT_KEY,
+    ChunkBudgetUnitType,
+    TableType,
+)
+from .convert_output import _get_markdown_text, _iter_document_items, table_to_markdown
+from .extract_output_models import (
+    Chunk,
+    ExtractOutputModel,
+    LocationModel,
+    LocationType,
+    SerializedDocumentType,
+    TableStructureAnnotationModel,
+)
+from .output_to_tables import (
+    get_table_uid_to_annotations_mapping,
+    get_table_uid_to_cells_mapping,
+)
+from .utils import load_output_to_pydantic
+
+
+class _ChunkBuilder:
+    """Accumulate item texts and their provenance until the chunk is full."""
+
+    def __init__(self, max_chars: int) -> None:
+        self.max_chars = max_chars
+        self._texts: list[str] = []
+        self._num_chars = 0
+        self._content_ids: list[str] = []
+        self._locations: list[LocationType] = []
+
+    def fits(self, text: str) -> bool:
+        """Check if the text fits in the chunk, counting the newline delimiter."""
+        if not self._texts:
+            return len(text) <= self.max_chars
+        return self._num_chars + 1 + len(text) <= self.max_chars
+
+    def add(self, text: str, content_id: str, locations: list[LocationType]) -> None:
+        """Add a text and its provenance to the chunk."""
+        self._num_chars += len(text) + (1 if self._texts else 0)
+        self._texts.append(text)
+        if not self._content_ids or self._content_ids[-1] != content_id:
+            self._content_ids.append(content_id)
+        self._locations.extend(locations)
+
+    def flush(self) -> Chunk | None:
+        """Return the current chunk if it is not empty and start a new one."""
+        if not self._texts:
+            return None
+        page_numbers = sorted(
+            {
+                int(location["page_number"])
+                for location in self._locations
+                if location is not None
+            }
+        )
+        chunk = Chunk(
+            text="\n".join(self._texts),
+            content_ids=self._content_ids,
+            page_numbers=page_numbers,
+            locations=self._locations,
+        )
+        self._texts = []
+        self._num_chars = 0
+        self._content_ids = []
+        self._locations = []
+        return chunk
+
+
+def _merge_locations_by_page(
+    locations: Iterable[LocationModel],
+) -> list[LocationType]:
+    """Merge locations into one bounding box per page."""
+    page_to_bounds: dict[int, list[float]] = {}
+    for location in locations:
+        x_1 = location.x + location.width
+        y_1 = location.y + location.height
+        bounds = page_to_bounds.get(location.page_number)
+        if bounds is None:
+            page_to_bounds[location.page_number] = [location.x, location.y, x_1, y_1]
+        else:
+            bounds[0] = min(bounds[0], location.x)
+            bounds[1] = min(bounds[1], location.y)
+            bounds[2] = max(bounds[2], x_1)
+            bounds[3] = max(bounds[3], y_1)
+    return [
+        LocationModel(
+            height=y_1 - y_0, width=x_1 - x_0, x=x_0, y=y_0, page_number=page_number
+        ).model_dump()
+        for page_number, (x_0, y_0, x_1, y_1) in sorted(page_to_bounds.items())
+    ]
+
+
+def _get_table_uid_to_row_locations_mapping(
+    parsed_serialized_document: ExtractOutputModel,
+) -> dict[str, dict[int, list[LocationModel]]]:
+    """Get table uids to a mapping of row index to the locations of the cells in that row."""
+    table_uid_to_cells_mapping = get_table_uid_to_cells_mapping(
+        parsed_serialized_document.content_tree
+    )
+    table_cell_annotations = [
+        annotation
+        for annotation in parsed_serialized_document.annotations
+        if isinstance(annotation, TableStructureAnnotationModel)
+    ]
+    table_uid_to_annotations = get_table_uid_to_annotations_mapping(
+        table_uid_to_cells_mapping, table_cell_annotations
+    )
+    table_uid_to_row_locations: dict[str, dict[int, list[LocationModel]]] = {}
+    for table_uid, annotations in table_uid_to_annotations.items():
+        row_to_locations: dict[int, list[LocationModel]] = defaultdict(list)
+        for annotation in annotations:
+            if annotation.locations is None:
+                continue
+            row_index = annotation.data.index[0]
+            # Spanning cells belong to every row they span
+            for row_span_index in range(annotation.data.span[0]):
+                row_to_locations[row_index + row_span_index].extend(
+                    annotation.locations
+                )
+        table_uid_to_row_locations[table_uid] = dict(row_to_locations)
+    return table_uid_to_row_locations
+
+
+def _split_table_rows(table: TableType, max_chars: int) -> list[tuple[int, int]]:
+    """Split the body rows of a table into (start, end) row ranges that fit in max_chars.
+
+    Every range is rendered with the header row repeated, so the header size counts toward each
+    range. A range always contains at least one row, even if that row alone is too long.
+    """
+    row_line_lengths = [
+        len("| " + " | ".join(str(x) for x in row) + " |") for row in table
+    ]
+    # Leading and trailing newlines, header row and its delimiter row
+    header_length = 2 + 2 * row_line_lengths[0] + 1
+    row_ranges = []
+    start_row_index = 1
+    current_length = header_length
+    for row_index in range(1, len(table)):
+        row_length = row_line_lengths[row_index] + 1
+        if row_index > start_row_index and current_length + row_length > max_chars:
+            row_ranges.append((start_row_index, row_index))
+            start_row_index = row_index
+            current_length = header_length
+        current_length += row_length
+    row_ranges.append((start_row_index, len(table)))
+    return row_ranges
+
+
+def _split_text(text: str, max_chars: int) -> list[str]:
+    """Split a text on white space into pieces of at most max_chars characters.
+
+    Words longer than max_chars are split in the middle.
+    """
+    pieces = []
+    current_words: list[str] = []
+    current_length = 0
+    for word in text.split():
+        while len(word) > max_chars:
+            if current_words:
+                pieces.append(" ".join(current_words))
+                current_words, current_length = [], 0
+            pieces.append(word[:max_chars])
+            word = word[max_chars:]
+        if current_words and current_length + 1 + len(word) > max_chars:
+            pieces.append(" ".join(current_words))
+            current_words, current_length = [], 0
+        current_length += len(word) + (1 if current_words else 0)
+        current_words.append(word)
+    if current_words:
+        pieces.append(" ".join(current_words))
+    return pieces
+
+
+def _get_item_locations(item: dict[str, Any]) -> list[LocationType]:
+    """Get the locations of an item as location dictionaries."""
+    locations = item.get(LOCATIONS_KEY)
+    if locations is None:
+        return []
+    return [LocationModel.model_dump(location) for location in locations]
+
+
+def _iter_item_pieces(
+    item: dict[str, Any],
+    item_text: str,
+    max_chars: int,
+    table_uid_to_row_locations: dict[str, dict[int, list[LocationModel]]],
+) -> Iterator[tuple[str, list[LocationType]]]:
+    """Yield an item's text in pieces that fit in max_chars, with the locations of each piece."""
+    item_locations = _get_item_locations(item)
+    if len(item_text) <= max_chars:
+        yield item_text, item_locations
+        return
+
+    table = item.get(TABLE_KEY, item.get(FIGURE_EXTRACTED_TABLE_KEY))
+    if table is None:
+        for text_piece in _split_text(item_text, max_chars):
+            yield text_piece, item_locations
+        return
+
+    row_to_locations = table_uid_to_row_locations.get(item[CONTENT_ID_KEY], {})
+    for start_row_index, end_row_index in _split_table_rows(table, max_chars):
+        table_piece = [table[0]] + table[start_row_index:end_row_index]
+        body_row_locations = [
+            location
+            for row_index in range(start_row_index, end_row_index)
+            for location in row_to_locations.get(row_index, [])
+        ]
+        # Keep the repeated header row in its own box, so the box of the body rows does not
+        # cover the rows of the previous pieces
+        piece_locations = _merge_locations_by_page(
+            row_to_locations.get(0, [])
+        ) + _merge_locations_by_page(body_row_locations)
+        yield table_to_markdown(table_piece), piece_locations or item_locations
+
+
+def _generate_chunks(
+    parsed_serialized_document: ExtractOutputModel,
+    max_chars: int,
+    use_markdown: bool,
+) -> Iterator[Chunk]:
+    """Pack the document items into chunks of at most max_chars characters."""
+    table_uid_to_row_locations = _get_table_uid_to_row_locations_mapping(
+        parsed_serialized_document
+    )
+    chunk_builder = _ChunkBuilder(max_chars)
+    for item in _iter_document_items(parsed_serialized_document, return_locations=True):
+        # Some types like figures don't have content
+        if not item[TEXT_KEY]:
+            continue
+        # Never let a chunk cross into a new section
+        if item[CATEGORY_KEY] in SECTION_HEADING_LEVELS:
+            chunk = chunk_builder.flush()
+            if chunk is not None:
+                yield chunk
+        item_text = _get_markdown_text(item) if use_markdown else item[TEXT_KEY]
+        for text_piece, piece_locations in _iter_item_pieces(
+            item, item_text, max_chars, table_uid_to_row_locations
+        ):
+            if not chunk_builder.fits(text_piece):
+                chunk = chunk_builder.flush()
+                if chunk is not None:
+                    yield chunk
+            chunk_builder.add(text_piece, item[CONTENT_ID_KEY], piece_locations)
+    chunk = chunk_builder.flush()
+    if chunk is not None:
+        yield chunk
+
+
+def generate_chunks_from_output(
+    serialized_document: SerializedDocumentType,
+    max_chunk_size: int = 2000,
+    budget_unit: ChunkBudgetUnitType = "characters",
+    use_markdown: bool = True,
+) -> Iterator[Chunk]:
+    r"""Split the output into chunks of text within a size budget, for retrieval indexes.
+
+    Items are packed into chunks in reading order. A chunk never crosses a section boundary:
+    every title or H1-H5 heading starts a new chunk. Items that do not fit in an empty chunk are
+    split: tables by row with the header row repeated in every piece, and texts on white space.
+    Chunks are generated one at a time, so they never all sit in memory.
+
+    Args:
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
+        max_chunk_size: the maximum size of a chunk, in budget_unit. A single table row
+            longer than the budget is kept whole.
+        budget_unit: "characters" to count characters, or "tokens" to count approximate tokens
+            of CHARACTERS_PER_TOKEN characters each
+        use_markdown: if True, prefix titles with # as in convert_output_to_markdown.
+            If False, use the plain text as in convert_output_to_str.
+
+    Returns:
+        a generator of Chunk dataclasses with the chunk text, the content ids of its items,
+            its page numbers and its locations. Locations of table pieces are the bounding boxes
+            of their header row and of their other rows on each page.
+
+    Example Output:
+        [
+            Chunk(
+                text='# ESTIMATE for Kensho\n\n| Kensho Revenue in millions $ | Q1 |\n...',
+                content_ids=['5', '6'],
+                page_numbers=[0],
+                locations=[
+                    {'height': 0.01188, 'width': 0.2, 'x': 0.4, 'y': 0.38, 'page_number': 0},
+                    {'height': 0.09188, 'width': 0.66072, 'x': 0.16008, 'y': 0.40464,
+                     'page_number': 0},
+                ],
+            ),
+            ...
+        ]
+    """
+    if max_chunk_size <= 0:
+        raise ValueError(f"max_chunk_size must be positive. Found {max_chunk_size}")
+    if budget_unit == "characters":
+        max_chars = max_chunk_size
+    elif budget_unit == "tokens":
+        max_chars = max_chunk_size * CHARACTERS_PER_TOKEN
+    else:
+        raise ValueError(
+            f"budget_unit must be 'characters' or 'tokens'. Found {budget_unit}"
+        )
+    parsed_serialized_document = load_output_to_pydantic(
+        serialized_document, lazy_text_node_data=True
+    )
+    return _generate_chunks(parsed_serialized_document, max_chars, use_markdown)
@@ -0,0 +1,156 @@
+# Copyright 2024-present Kensho Technologies, LLC.
+"""Functions to convert the items of the output into a single pandas DataFrame.
+
+The columns are filled in one pass over the items and built into the DataFrame at once, so queries
+over the items, such as the headings on a range of pages wider than half the page, are vectorized
+filters and groupings instead of loops over item dictionaries.
+"""
+
+import math
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from .constants import (
+    CATEGORY_KEY,
+    CONTENT_ID_KEY,
+    LOCATIONS_KEY,
+    TABLE_CONTENT_CATEGORIES,
+    TEXT_KEY,
+)
+from .convert_output import _iter_document_items
+from .extract_output_models import (
+    ContentModel,
+    ExtractOutputModel,
+    SerializedDocumentType,
+)
+from .utils import _get_document_index, load_output_to_pydantic
+
+ITEMS_DF_COLUMNS = [
+    "content_id",
+    "category",
+    "text",
+    "parent_content_id",
+    "depth",
+    "page_number",
+    "last_page_number",
+    "x",
+    "y",
+    "width",
+    "height",
+    "table_uid",
+]
+
+_TABLE_ITEM_CATEGORIES = {category.lower() for category in TABLE_CONTENT_CATEGORIES}
+
+
+def _build_content_uid_to_parent_mapping(
+    parsed_serialized_document: ExtractOutputModel,
+) -> dict[str, tuple[str | None, int]]:
+    """Get the parent uid and the depth in the content tree of every content uid."""
+    content_uid_to_parent: dict[str, tuple[str | None, int]] = {}
+    stack: list[tuple[ContentModel, str | None, int]] = [
+        (parsed_serialized_document.content_tree, None, 0)
+    ]
+    while stack:
+        content, parent_uid, depth = stack.pop()
+        content_uid_to_parent.setdefault(content.uid, (parent_uid, depth))
+        stack.extend((child, content.uid, depth + 1) for child in content.children)
+    return content_uid_to_parent
+
+
+def convert_output_to_items_df(
+    serialized_document: SerializedDocumentType,
+) -> pd.DataFrame:
+    """Convert Extract output into a DataFrame with a row per item, in reading order.
+
+    Args:
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
+
+    Returns:
+        a DataFrame indexed like the item list of convert_output_to_items_list_and_relations,
+            with columns:
+                content_id: the uid of the item
+                category: the lowercase category of the item, as a categorical column
+                text: the text of the item, with markdown-style tables
+                parent_content_id: the uid of the parent of the item in the content tree
+                depth: the depth of the item in the content tree, 1 for children of the root
+                page_number: the page of the first location of the item
+                last_page_number: the page of the last location of the item
+                x, y, width, height: the bounding box of the locations of the item on its
+                    first page
+                table_uid: the uid of the table for tables, the key of the table in
+                    build_table_grids, and None for other items
+            Location columns are missing values for items without locations.
+
+    Example Output:
+          content_id category                      text parent_content_id  depth  page_number ...
+        0          1     text                      2019                 0      1            0 ...
+        1          3    title  Generated Toy File Title                 0      1            0 ...
+    """
+    parsed_serialized_document = load_output_to_pydantic(
+        serialized_document, lazy_text_node_data=True
+    )
+    content_uid_to_parent = _get_document_index(
+        parsed_serialized_document, _build_content_uid_to_parent_mapping
+    )
+
+    content_ids: list[str] = []
+    categories: list[str] = []
+    texts: list[str] = []
+    parent_content_ids: list[str | None] = []
+    depths: list[int] = []
+    page_numbers: list[Any] = []
+    last_page_numbers: list[Any] = []
+    bounding_boxes: list[tuple[float, float, float, float]] = []
+    table_uids: list[str | None] = []
+    for item in _iter_document_items(parsed_serialized_document, return_locations=True):
+        content_id = item[CONTENT_ID_KEY]
+        category = item[CATEGORY_KEY]
+        parent_content_id, depth = content_uid_to_parent[content_id]
+        content_ids.append(content_id)
+        categories.append(category)
+        texts.append(item[TEXT_KEY])
+        parent_content_ids.append(parent_content_id)
+        depths.append(depth)
+        table_uids.append(content_id if category in _TABLE_ITEM_CATEGORIES else None)
+
+        locations = item[LOCATIONS_KEY]
+        if not locations:
+            page_numbers.append(pd.NA)
+            last_page_numbers.append(pd.NA)
+            bounding_boxes.append((math.nan, math.nan, math.nan, math.nan))
+            continue
+        page_number = locations[0].page_number
+        page_numbers.append(page_number)
+        last_page_numbers.append(locations[-1].page_number)
+        x_min = y_min = math.inf
+        x_max = y_max = -math.inf
+        for location in locations:
+            if location.page_number != page_number:
+                continue
+            x_min = min(x_min, location.x)
+            y_min = min(y_min, location.y)
+            x_max = max(x_max, location.x + location.width)
+            y_max = max(y_max, location.y + location.height)
+        bounding_boxes.append((x_min, y_min, x_max - x_min, y_max - y_min))
+
+    bounding_box_array = np.array(bounding_boxes, dtype=np.float64).reshape(-1, 4)
+    return pd.DataFrame(
+        {
+            "content_id": content_ids,
+            "category": pd.Categorical(categories),
+            "text": texts,
+            "parent_content_id": parent_content_ids,
+            "depth": np.array(depths, dtype=np.int64),
+            "page_number": pd.array(page_numbers, dtype="Int64"),
+            "last_page_number": pd.array(last_page_numbers, dtype="Int64"),
+            "x": bounding_box_array[:, 0],
+            "y": bounding_box_array[:, 1],
+            "width": bounding_box_array[:, 2],
+            "height": bounding_box_array[:, 3],
+            "table_uid": table_uids,
+        },
+        columns=ITEMS_DF_COLUMNS,
+    )
@@ -3,17 +3,69 @@
 
 from typing import Any
 
-from .constants import CATEGORY_KEY, ContentCategory
-from .convert_output import convert_output_to_items_list_and_relations
+from .constants import (
+    CATEGORY_KEY,
+    DOCUMENT_SECTION_LEVEL,
+    SECTION_HEADING_LEVELS,
+    ContentCategory,
+)
+from .convert_output import (
+    _convert_parsed_output_to_items_list_and_relations,
+    convert_output_to_items_list_and_relations,
+)
+from .extract_output_models import (
+    SectionNode,
+    SectionTreeResult,
+    SerializedDocumentType,
+)
+from .utils import load_output_to_pydantic
+
+
+class _SectionTreeBuilder:
+    """Build the section tree incrementally from items given in reading order."""
+
+    def __init__(self) -> None:
+        self.root = SectionNode(
+            heading_level=DOCUMENT_SECTION_LEVEL,
+            heading_index=None,
+            start_index=0,
+            end_index=0,
+        )
+        # Currently open sections, from the root to the innermost section
+        self._open_sections = [self.root]
+
+    def add_item(self, item_index: int, item: dict[str, Any]) -> None:
+        """Add the next item, opening a new section if it is a heading."""
+        heading_level = SECTION_HEADING_LEVELS.get(item[CATEGORY_KEY])
+        if heading_level is None:
+            return
+        # A heading closes all open sections at the same or a deeper level
+        while self._open_sections[-1].heading_level >= heading_level:
+            self._open_sections.pop().end_index = item_index
+        section = SectionNode(
+            heading_level=heading_level,
+            heading_index=item_index,
+            start_index=item_index,
+            end_index=item_index,
+        )
+        self._open_sections[-1].children.append(section)
+        self._open_sections.append(section)
+
+    def finish(self, num_items: int) -> SectionNode:
+        """Close all open sections at the end of the document and return the root."""
+        for section in self._open_sections:
+            section.end_index = num_items
+        self._open_sections = [self.root]
+        return self.root
 
 
 def extract_organized_sections(
-    serialized_document: dict[str, Any],
+    serialized_document: SerializedDocumentType,
 ) -> list[list[dict[str, Any]]]:
     r"""Return a version of the output organized into sections split on titles.
 
     Args:
-        serialized_document: a serialized document
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
     Returns:
         a list of sections, each of which is a list of items within that section in dictionary
             form describing their category and text value
@@ -57,3 +109,48 @@ def extract_organized_sections(
     if current_paragraph:
         paragraphs.append(current_paragraph)
     return paragraphs
+
+
+def extract_section_tree(
+    serialized_document: SerializedDocumentType,
+    return_locations: bool = False,
+) -> SectionTreeResult:
+    """Return the items of the document with a tree of sections nested by heading level.
+
+    Headings nest as TITLE > H1 > H2 > H3 > H4 > H5. The tree is built in the same traversal
+    that produces the items, and every section only stores item index ranges, so the tree costs
+    memory proportional to the number of headings.
+
+    Args:
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
+        return_locations: whether to return item locations in the item list
+
+    Returns:
+        A SectionTreeResult dataclass with:
+            item_list: the items of the document, as in convert_output_to_items_list_and_relations
+            root: a SectionNode spanning the whole document. Items before the first heading
+                belong directly to the root. Each section spans
+                item_list[section.start_index:section.end_index], starting with its heading at
+                section.heading_index.
+
+    Example Output:
+        SectionTreeResult(
+            item_list=[
+                {'content_id': '1', 'category': 'title', 'text': 'Annual Report'},
+                {'content_id': '2', 'category': 'h1', 'text': 'Overview'},
+                {'content_id': '3', 'category': 'text', 'text': 'We did well.'},
+            ],
+            root=SectionNode(heading_level=-1, heading_index=None, start_index=0, end_index=3,
+                children=[SectionNode(heading_level=0, heading_index=0, start_index=0,
+                    end_index=3, children=[SectionNode(heading_level=1, heading_index=1,
+                        start_index=1, end_index=3, children=[])])])
+        )
+    """
+    section_tree_builder = _SectionTreeBuilder()
+    item_list = _convert_parsed_output_to_items_list_and_relations(
+        load_output_to_pydantic(serialized_document, lazy_text_node_data=True),
+        return_locations=return_locations,
+        on_segment=section_tree_builder.add_item,
+    ).item_list
+    root = section_tree_builder.finish(len(item_list))
+    return SectionTreeResult(item_list=item_list, root=root)
@@ -3,9 +3,7 @@
 
 import typing
 from collections import defaultdict
-from typing import Any, Sequence
-
-import pandas as pd
+from typing import TYPE_CHECKING, Iterator, Sequence
 
 from .constants import (
     EMPTY_STRING,
@@ -17,8 +15,10 @@ from .constants import (
 from .extract_output_models import (
     Cell,
     ContentModel,
+    ExtractOutputModel,
     LocationModel,
     LocationType,
+    SerializedDocumentType,
     Table,
     TableCategoryType,
     TableGridAndStructure,
@@ -29,7 +29,10 @@ from .tables_utils import (
     duplicate_spanning_annotations,
     get_table_shape,
 )
-from .utils import load_output_to_pydantic
+from .utils import _get_document_index, load_output_to_pydantic
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def get_table_uid_to_cells_mapping(
@@ -73,6 +76,20 @@ def _get_table_uid_to_types_mapping(
     return table_uid_to_types
 
 
+def _build_table_uid_to_cells_mapping(
+    parsed_serialized_document: ExtractOutputModel,
+) -> dict[str, list[ContentModel]]:
+    """Get the table uids to cells mapping of a parsed document."""
+    return get_table_uid_to_cells_mapping(parsed_serialized_document.content_tree)
+
+
+def _build_table_uid_to_types_mapping(
+    parsed_serialized_document: ExtractOutputModel,
+) -> dict[str, TableCategoryType]:
+    """Get the table uids to table types mapping of a parsed document."""
+    return _get_table_uid_to_types_mapping(parsed_serialized_document.content_tree)
+
+
 def _get_table_uid_to_locations_mapping(
     content: ContentModel,
 ) -> dict[str, list[LocationType]]:
@@ -257,13 +274,13 @@ def convert_uid_grid_to_content_grid(
 
 
 def build_table_grids(
-    serialized_document: dict[str, Any],
+    serialized_document: SerializedDocumentType,
     duplicate_merged_cells_content_flag: bool = True,
 ) -> dict[str, TableGridAndStructure]:
     """Convert serialized tables to objects consisting of table category type, string grid and structure annotations.
 
     Args:
-        serialized_document: a serialized document
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
         duplicate_merged_cells_content_flag: If True, duplicate cell content for merged cells
         in 2D grid of strings. If False, only fill the first cell (top left) of the merged area,
         other cells are empty in 2D grid of strings.
@@ -285,12 +302,41 @@ def build_table_grids(
             locations=[LocationModel(height=0.015, width=0.04, x=0.72, y=0.19, page_number=0), ...])
         }
     """  # noqa: E501
-    parsed_serialized_document = load_output_to_pydantic(serialized_document)
+    return dict(
+        iter_table_grids(serialized_document, duplicate_merged_cells_content_flag)
+    )
+
+
+def iter_table_grids(
+    serialized_document: SerializedDocumentType,
+    duplicate_merged_cells_content_flag: bool = True,
+    include_figure_extracted_table: bool = True,
+) -> Iterator[tuple[str, TableGridAndStructure]]:
+    """Build the grids of the tables of a document as build_table_grids, one table at a time.
+
+    Args:
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
+        duplicate_merged_cells_content_flag: If True, duplicate cell content for merged cells
+        in 2D grid of strings. If False, only fill the first cell (top left) of the merged area,
+        other cells are empty in 2D grid of strings.
+        include_figure_extracted_table: if False, skip the figure extracted tables without
+            building their grids
+
+    Returns:
+        an iterator of the table UID and the TableGridAndStructure of every table, in the order
+            of build_table_grids. Every grid is built when it is reached.
+    """
+    parsed_serialized_document = load_output_to_pydantic(
+        serialized_document, lazy_text_node_data=True
+    )
     annotations = parsed_serialized_document.annotations
-    content = parsed_serialized_document.content_tree
 
-    table_uid_to_cells_mapping = get_table_uid_to_cells_mapping(content)
-    table_uid_to_type_mapping = _get_table_uid_to_types_mapping(content)
+    table_uid_to_cells_mapping = _get_document_index(
+        parsed_serialized_document, _build_table_uid_to_cells_mapping
+    )
+    table_uid_to_type_mapping = _get_document_index(
+        parsed_serialized_document, _build_table_uid_to_types_mapping
+    )
 
     table_cell_annotations: list[TableStructureAnnotationModel] = [
         annotation
@@ -306,7 +352,6 @@ def build_table_grids(
         table_uid_to_cells_mapping, table_cell_annotations
     )
 
-    tables_grid_and_structure = {}
     for table_uid, cell_annotations in table_uid_to_cell_annotations.items():
         if table_uid_to_type_mapping[table_uid] in (
             ContentCategory.TABLE.value,
@@ -318,31 +363,31 @@ def build_table_grids(
             )
             cell_contents = table_uid_to_cells_mapping[table_uid]
             content_grid = convert_uid_grid_to_content_grid(uids_grid, cell_contents)
-        else:
+        elif include_figure_extracted_table:
             content_grid = (
                 build_content_grid_from_figure_extracted_table_cell_annotations(
                     cell_annotations
                 )
             )
-        tables_grid_and_structure[table_uid] = TableGridAndStructure(
+        else:
+            continue
+        yield table_uid, TableGridAndStructure(
             table_category_type=table_uid_to_type_mapping[table_uid],
             table_string_grid=content_grid,
             table_structure_annotations=table_uid_to_cell_annotations[table_uid],
         )
 
-    return tables_grid_and_structure
-
 
 def extract_pd_dfs_from_output(
-    serialized_document: dict[str, Any],
+    serialized_document: SerializedDocumentType,
     duplicate_merged_cells_content_flag: bool = True,
     use_first_row_as_header: bool = True,
     include_figure_extracted_table: bool = False,
-) -> list[pd.DataFrame]:
+) -> list["pd.DataFrame"]:
     """Extract Extract output's tables and convert them to a list of pandas DataFrames.
 
     Args:
-        serialized_document: a serialized document
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
         duplicate_merged_cells_content_flag: if True, duplicate cell content for merged cells.
             If False, only fill the first cell (top left) of the merged area, other cells are
             empty.
@@ -382,7 +427,7 @@ def extract_pd_dfs_from_output(
 
 
 def extract_pd_dfs_with_locs_and_table_structure_from_output(
-    serialized_document: dict[str, Any],
+    serialized_document: SerializedDocumentType,
     duplicate_merged_cells_content_flag: bool = True,
     use_first_row_as_header: bool = True,
     include_figure_extracted_table: bool = False,
@@ -390,7 +435,7 @@ def extract_pd_dfs_with_locs_and_table_structure_from_output(
     """Extract tables and convert them to a list of pd DataFrames, table locations and structures.
 
     Args:
-        serialized_document: a serialized document
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
         duplicate_merged_cells_content_flag: if True, duplicate cell content for merged cells.
             If False, only fill the first cell (top left) of the merged area, other cells are
             empty.
@@ -415,13 +460,15 @@ def extract_pd_dfs_with_locs_and_table_structure_from_output(
             is_column_header=True, is_projected_row_header=False), ...]
         )]
     """
+    parsed_serialized_document = load_output_to_pydantic(
+        serialized_document, lazy_text_node_data=True
+    )
     # Get dfs
     table_id_to_grid_and_structure = build_table_grids(
-        serialized_document, duplicate_merged_cells_content_flag
+        parsed_serialized_document, duplicate_merged_cells_content_flag
     )
 
     # Get locations
-    parsed_serialized_document = load_output_to_pydantic(serialized_document)
     table_uid_to_locs_mapping = _get_table_uid_to_locations_mapping(
         parsed_serialized_document.content_tree
     )
@@ -0,0 +1,191 @@
+# Copyright 2024-present Kensho Technologies, LLC.
+"""Item renderers dispatching on the item category, and a registry of named output formats.
+
+A renderer maps the lowercase category of every item to a handler returning the rendered text of
+the item. The handlers are compiled into a dictionary when the renderer is built, so rendering an
+item is a single dictionary lookup and call, whatever the number of categories with a handler.
+"""
+
+import html
+from typing import Any, Callable, Iterable, Mapping
+
+from .constants import (
+    CATEGORY_KEY,
+    ELEMENT_TITLE_CONTENT_CATEGORIES,
+    FIGURE_EXTRACTED_TABLE_KEY,
+    TABLE_KEY,
+    TEXT_KEY,
+    ContentCategory,
+    TableType,
+)
+
+# Renders an item dictionary, as yielded by the converters, to text
+ItemHandlerType = Callable[[dict[str, Any]], str]
+
+
+def _get_item_text(item: dict[str, Any]) -> str:
+    """Get the text of an item as it is."""
+    return item[TEXT_KEY]  # type: ignore[no-any-return]
+
+
+class ItemRenderer:
+    """Render items with a handler per item category, and a default handler for the others."""
+
+    def __init__(
+        self,
+        handlers: Mapping[str, ItemHandlerType] | None = None,
+        default_handler: ItemHandlerType = _get_item_text,
+        separator: str = "\n",
+    ) -> None:
+        """Build the dispatch table of the handlers, keyed by case-insensitive category."""
+        self.default_handler = default_handler
+        self.separator = separator
+        self._handlers = {
+            category.lower(): handler for category, handler in (handlers or {}).items()
+        }
+
+    @property
+    def handlers(self) -> dict[str, ItemHandlerType]:
+        """Get a copy of the handlers, keyed by lowercase category."""
+        return dict(self._handlers)
+
+    def with_handlers(
+        self,
+        handlers: Mapping[str, ItemHandlerType],
+        default_handler: ItemHandlerType | None = None,
+    ) -> "ItemRenderer":
+        """Get a new renderer with the handlers added to or replacing the handlers of this one."""
+        return ItemRenderer(
+            {**self._handlers, **handlers},
+            default_handler or self.default_handler,
+            self.separator,
+        )
+
+    def render_item(self, item: dict[str, Any]) -> str:
+        """Render an item with the handler of its category."""
+        return self._handlers.get(item[CATEGORY_KEY], self.default_handler)(item)
+
+    def render(self, items: Iterable[dict[str, Any]]) -> str:
+        """Render the items with content, joined by the separator."""
+        handlers = self._handlers
+        default_handler = self.default_handler
+        # Some types like figures don't have content
+        return self.separator.join(
+            handlers.get(item[CATEGORY_KEY], default_handler)(item)
+            for item in items
+            if item[TEXT_KEY]
+        )
+
+
+def _prefix_handler(prefix: str) -> ItemHandlerType:
+    """Get a handler prefixing the item text."""
+
+    def handler(item: dict[str, Any]) -> str:
+        return prefix + item[TEXT_KEY]  # type: ignore[no-any-return]
+
+    return handler
+
+
+def _html_tag_handler(tag: str) -> ItemHandlerType:
+    """Get a handler wrapping the escaped item text in an HTML element."""
+    start_tag = f"<{tag}>"
+    end_tag = f"</{tag}>"
+
+    def handler(item: dict[str, Any]) -> str:
+        return start_tag + html.escape(item[TEXT_KEY]) + end_tag  # type: ignore[no-any-return]
+
+    return handler
+
+
+def table_to_html(table: TableType) -> str:
+    """Convert 2D grid table to an HTML table, with the first row as header."""
+    lines = ["<table>"]
+    for row_index, row in enumerate(table):
+        cell_tag = "th" if row_index == 0 else "td"
+        cells = "".join(
+            f"<{cell_tag}>{html.escape(str(cell))}</{cell_tag}>" for cell in row
+        )
+        lines.append(f"<tr>{cells}</tr>")
+    lines.append("</table>")
+    return "\n".join(lines)
+
+
+def _html_table_handler(item: dict[str, Any]) -> str:
+    """Render a table item from its grid."""
+    return table_to_html(item[TABLE_KEY])
+
+
+def _html_figure_extracted_table_handler(item: dict[str, Any]) -> str:
+    """Render a figure extracted table item from its grid."""
+    return table_to_html(item[FIGURE_EXTRACTED_TABLE_KEY])
+
+
+def _get_heading_handlers(
+    get_handler: Callable[[int], ItemHandlerType],
+) -> dict[str, ItemHandlerType]:
+    """Get the handlers of the title and heading categories from a handler per heading level."""
+    handlers = {
+        ContentCategory.TITLE.value: get_handler(1),
+        ContentCategory.H1.value: get_handler(1),
+        ContentCategory.H2.value: get_handler(2),
+        ContentCategory.H3.value: get_handler(3),
+        ContentCategory.H4.value: get_handler(4),
+        ContentCategory.H5.value: get_handler(5),
+    }
+    # Figure titles and table titles are rendered as H3
+    for category in ELEMENT_TITLE_CONTENT_CATEGORIES:
+        handlers[category] = get_handler(3)
+    return handlers
+
+
+TEXT_RENDERER = ItemRenderer()
+MARKDOWN_RENDERER = ItemRenderer(
+    _get_heading_handlers(lambda level: _prefix_handler("#" * level + " "))
+)
+HTML_RENDERER = ItemRenderer(
+    {
+        **_get_heading_handlers(lambda level: _html_tag_handler(f"h{level}")),
+        ContentCategory.TABLE.value: _html_table_handler,
+        ContentCategory.TABLE_OF_CONTENTS.value: _html_table_handler,
+        ContentCategory.FIGURE_EXTRACTED_TABLE.value: _html_figure_extracted_table_handler,
+    },
+    default_handler=_html_tag_handler("p"),
+)
+
+_RENDERERS: dict[str, ItemRenderer] = {
+    "text": TEXT_RENDERER,
+    "markdown": MARKDOWN_RENDERER,
+    "html": HTML_RENDERER,
+}
+
+
+def register_renderer(
+    name: str, renderer: ItemRenderer, overwrite: bool = False
+) -> None:
+    """Register a renderer as a named output format.
+
+    Args:
+        name: the name of the output format
+        renderer: the renderer of the output format
+        overwrite: whether to replace a renderer already registered with the name
+
+    Raises:
+        ValueError: if a renderer is already registered with the name and overwrite is False
+    """
+    if name in _RENDERERS and not overwrite:
+        raise ValueError(f"A renderer is already registered as {name}")
+    _RENDERERS[name] = renderer
+
+
+def get_renderer(name: str) -> ItemRenderer:
+    """Get the renderer registered as a named output format.
+
+    Raises:
+        ValueError: if no renderer is registered with the name
+    """
+    try:
+        return _RENDERERS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown renderer {name}, expected one of {sorted(_RENDERERS)}"
+        ) from None
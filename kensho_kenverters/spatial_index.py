@@ -0,0 +1,306 @@
+# Copyright 2024-present Kensho Technologies, LLC.
+"""Per-page spatial index of the boxes of the content nodes and table cells of the output.
+
+Locations are fractions of the page, so each page is split into a uniform grid of buckets, sized
+to the number of boxes on the page, and every box is listed in the buckets it overlaps. The bucket
+lists are flattened into contiguous arrays, with a row of buckets of a page next to each other,
+so a query reads one slice per grid row it covers and only checks the boxes in those buckets,
+instead of every location of the document.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from .character_index import _iter_content_nodes
+from .extract_output_models import (
+    LocationModel,
+    SerializedDocumentType,
+    TableStructureAnnotationModel,
+)
+from .utils import load_output_to_pydantic
+
+# Average number of boxes per bucket the grid of each page is sized for
+BOXES_PER_BUCKET = 2
+# Maximum number of buckets along each side of a page grid
+MAX_GRID_SIZE = 256
+
+
+@dataclass(frozen=True)
+class SpatialIndex:
+    """Spatial index of the boxes of the content nodes and table cells of a document.
+
+    Boxes are sorted by page, and the buckets of each page are in row major order.
+
+    Attributes:
+        content_uids: content uid of each indexed node, in the order of the content tree, then of
+            each table cell boxed by its annotation
+        page_number_to_page_index: page number to page index, for pages with boxes
+        page_grid_sizes: number of buckets along each side of the grid of each page
+        page_bucket_starts: index of the first bucket of each page in bucket_starts
+        bucket_starts: index of the first box of each bucket in bucket_box_indices, with one
+            extra end value
+        bucket_box_indices: the boxes of each bucket, in order of box index
+        box_content_indices: index in content_uids of each box
+        box_x_starts: left edge of each box
+        box_y_starts: top edge of each box
+        box_x_ends: right edge of each box
+        box_y_ends: bottom edge of each box
+    """
+
+    content_uids: list[str]
+    page_number_to_page_index: dict[int, int]
+    page_grid_sizes: npt.NDArray[np.int64]
+    page_bucket_starts: npt.NDArray[np.int64]
+    bucket_starts: npt.NDArray[np.int64]
+    bucket_box_indices: npt.NDArray[np.int64]
+    box_content_indices: npt.NDArray[np.int64]
+    box_x_starts: npt.NDArray[np.float64]
+    box_y_starts: npt.NDArray[np.float64]
+    box_x_ends: npt.NDArray[np.float64]
+    box_y_ends: npt.NDArray[np.float64]
+
+    def query_rectangle(
+        self,
+        page_number: int,
+        x: float,
+        y: float,
+        width: float,
+        height: float,
+        contained: bool = False,
+    ) -> list[str]:
+        """Find the content nodes and table cells with a box in a rectangle of a page.
+
+        Args:
+            page_number: the page of the rectangle
+            x: the left edge of the rectangle, as a fraction of the page width
+            y: the top edge of the rectangle, as a fraction of the page height
+            width: the width of the rectangle, as a fraction of the page width
+            height: the height of the rectangle, as a fraction of the page height
+            contained: if True, only find boxes inside the rectangle. If False, find boxes
+                overlapping the rectangle, including boxes touching its edges.
+
+        Returns:
+            the content uids of the nodes and table cells found, in the order of content_uids.
+                Nodes containing other nodes are found along with them if they have locations.
+        """
+        page_index = self.page_number_to_page_index.get(page_number)
+        if page_index is None:
+            return []
+        grid_size = int(self.page_grid_sizes[page_index])
+        page_bucket_start = int(self.page_bucket_starts[page_index])
+        x_end = x + width
+        y_end = y + height
+        first_col, last_col = _get_bucket_range(x, x_end, grid_size)
+        first_row, last_row = _get_bucket_range(y, y_end, grid_size)
+        bucket_starts = self.bucket_starts
+        candidate_slices = []
+        for row in range(first_row, last_row + 1):
+            # The buckets of a row are next to each other
+            row_bucket_start = page_bucket_start + row * grid_size
+            slice_start = bucket_starts[row_bucket_start + first_col]
+            slice_end = bucket_starts[row_bucket_start + last_col + 1]
+            candidate_slices.append(self.bucket_box_indices[slice_start:slice_end])
+        candidates = np.unique(np.concatenate(candidate_slices))
+        box_x_starts = self.box_x_starts[candidates]
+        box_y_starts = self.box_y_starts[candidates]
+        box_x_ends = self.box_x_ends[candidates]
+        box_y_ends = self.box_y_ends[candidates]
+        if contained:
+            is_found = (
+                (box_x_starts >= x)
+                & (box_y_starts >= y)
+                & (box_x_ends <= x_end)
+                & (box_y_ends <= y_end)
+            )
+        else:
+            is_found = (
+                (box_x_starts <= x_end)
+                & (box_y_starts <= y_end)
+                & (box_x_ends >= x)
+                & (box_y_ends >= y)
+            )
+        content_indices = np.unique(self.box_content_indices[candidates[is_found]])
+        return [self.content_uids[content_index] for content_index in content_indices]
+
+    def query_point(self, page_number: int, x: float, y: float) -> list[str]:
+        """Find the content nodes and table cells with a box containing a point of a page.
+
+        Args:
+            page_number: the page of the point
+            x: the horizontal position of the point, as a fraction of the page width
+            y: the vertical position of the point, as a fraction of the page height
+
+        Returns:
+            the content uids of the nodes and table cells found, in the order of content_uids
+        """
+        return self.query_rectangle(page_number, x, y, 0.0, 0.0)
+
+
+def _get_bucket_range(start: float, end: float, grid_size: int) -> tuple[int, int]:
+    """Get the first and last buckets along a side of a page grid overlapped by an interval."""
+    first_bucket = min(max(math.floor(start * grid_size), 0), grid_size - 1)
+    last_bucket = min(max(math.floor(end * grid_size), 0), grid_size - 1)
+    return first_bucket, max(first_bucket, last_bucket)
+
+
+def _get_page_grid_buckets(
+    grid_size: int,
+    x_starts: npt.NDArray[np.float64],
+    y_starts: npt.NDArray[np.float64],
+    x_ends: npt.NDArray[np.float64],
+    y_ends: npt.NDArray[np.float64],
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """Get the buckets of a page grid overlapped by each box, as bucket and box index pairs."""
+    first_cols = np.clip(np.floor(x_starts * grid_size), 0, grid_size - 1).astype(
+        np.int64
+    )
+    first_rows = np.clip(np.floor(y_starts * grid_size), 0, grid_size - 1).astype(
+        np.int64
+    )
+    num_cols = (
+        np.clip(np.floor(x_ends * grid_size), first_cols, grid_size - 1).astype(
+            np.int64
+        )
+        - first_cols
+        + 1
+    )
+    num_rows = (
+        np.clip(np.floor(y_ends * grid_size), first_rows, grid_size - 1).astype(
+            np.int64
+        )
+        - first_rows
+        + 1
+    )
+    # One pair per box and bucket it overlaps
+    num_buckets = num_cols * num_rows
+    pair_boxes = np.repeat(np.arange(len(x_starts), dtype=np.int64), num_buckets)
+    pair_offsets = np.arange(int(num_buckets.sum()), dtype=np.int64) - np.repeat(
+        np.cumsum(num_buckets) - num_buckets, num_buckets
+    )
+    pair_rows = first_rows[pair_boxes] + pair_offsets // num_cols[pair_boxes]
+    pair_cols = first_cols[pair_boxes] + pair_offsets % num_cols[pair_boxes]
+    return pair_rows * grid_size + pair_cols, pair_boxes
+
+
+def build_spatial_index(serialized_document: SerializedDocumentType) -> SpatialIndex:
+    """Build the per-page spatial index of the boxes of the content nodes and table cells.
+
+    Every location of a content node is a box of the node. Table cells without locations of their
+    own, such as figure extracted table cells, are boxed by the locations of their table
+    structure annotation.
+
+    Args:
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
+
+    Returns:
+        a SpatialIndex answering "which nodes lie in this rectangle of page N" with
+            query_rectangle, and "which nodes contain this point" with query_point
+
+    Example:
+        spatial_index = build_spatial_index(serialized_document)
+        spatial_index.query_rectangle(0, 0.1, 0.1, 0.3, 0.05, contained=True)
+        ['2', '3']
+    """
+    parsed_serialized_document = load_output_to_pydantic(
+        serialized_document, lazy_text_node_data=True
+    )
+
+    content_uids: list[str] = []
+    box_content_indices: list[int] = []
+    box_page_numbers: list[int] = []
+    boxes: list[tuple[float, float, float, float]] = []
+
+    def add_boxes(content_uid: str, locations: Sequence[LocationModel]) -> None:
+        content_index = len(content_uids)
+        content_uids.append(content_uid)
+        for location in locations:
+            box_content_indices.append(content_index)
+            box_page_numbers.append(location.page_number)
+            boxes.append(
+                (
+                    location.x,
+                    location.y,
+                    location.x + location.width,
+                    location.y + location.height,
+                )
+            )
+
+    for content in _iter_content_nodes(parsed_serialized_document.content_tree):
+        if content.locations:
+            add_boxes(content.uid, content.locations)
+    boxed_uids = set(content_uids)
+    for annotation in parsed_serialized_document.annotations:
+        if (
+            isinstance(annotation, TableStructureAnnotationModel)
+            and annotation.locations
+            and annotation.content_uids[0] not in boxed_uids
+        ):
+            add_boxes(annotation.content_uids[0], annotation.locations)
+
+    # Boxes sorted by page, in document order within each page
+    page_numbers_arr = np.array(box_page_numbers, dtype=np.int64)
+    box_order = np.argsort(page_numbers_arr, kind="stable")
+    page_numbers_arr = page_numbers_arr[box_order]
+    boxes_arr = np.array(boxes, dtype=np.float64).reshape(-1, 4)[box_order]
+    box_content_indices_arr = np.array(box_content_indices, dtype=np.int64)[box_order]
+    page_numbers, page_box_starts = np.unique(page_numbers_arr, return_index=True)
+    page_box_ends = np.append(page_box_starts[1:], len(page_numbers_arr))
+
+    page_grid_sizes = []
+    page_bucket_starts = []
+    bucket_counts = []
+    bucket_box_indices = []
+    num_buckets = 0
+    for page_box_start, page_box_end in zip(page_box_starts, page_box_ends):
+        grid_size = min(
+            max(
+                math.ceil(
+                    math.sqrt((page_box_end - page_box_start) / BOXES_PER_BUCKET)
+                ),
+                1,
+            ),
+            MAX_GRID_SIZE,
+        )
+        page_boxes = boxes_arr[page_box_start:page_box_end]
+        pair_buckets, pair_boxes = _get_page_grid_buckets(
+            grid_size,
+            page_boxes[:, 0],
+            page_boxes[:, 1],
+            page_boxes[:, 2],
+            page_boxes[:, 3],
+        )
+        # Stable sort, so the boxes of each bucket stay in order
+        pair_order = np.argsort(pair_buckets, kind="stable")
+        bucket_box_indices.append(pair_boxes[pair_order] + page_box_start)
+        bucket_counts.append(np.bincount(pair_buckets, minlength=grid_size**2))
+        page_grid_sizes.append(grid_size)
+        page_bucket_starts.append(num_buckets)
+        num_buckets += grid_size**2
+
+    bucket_starts = np.zeros(num_buckets + 1, dtype=np.int64)
+    if bucket_counts:
+        np.cumsum(np.concatenate(bucket_counts), out=bucket_starts[1:])
+    return SpatialIndex(
+        content_uids=content_uids,
+        page_number_to_page_index={
+            int(page_number): page_index
+            for page_index, page_number in enumerate(page_numbers)
+        },
+        page_grid_sizes=np.array(page_grid_sizes, dtype=np.int64),
+        page_bucket_starts=np.array(page_bucket_starts, dtype=np.int64),
+        bucket_starts=bucket_starts,
+        bucket_box_indices=(
+            np.concatenate(bucket_box_indices).astype(np.int64)
+            if bucket_box_indices
+            else np.zeros(0, dtype=np.int64)
+        ),
+        box_content_indices=box_content_indices_arr,
+        box_x_starts=boxes_arr[:, 0].copy(),
+        box_y_starts=boxes_arr[:, 1].copy(),
+        box_x_ends=boxes_arr[:, 2].copy(),
+        box_y_ends=boxes_arr[:, 3].copy(),
+    )
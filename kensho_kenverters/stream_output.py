@@ -0,0 +1,291 @@
+# Copyright 2024-present Kensho Technologies, LLC.
+"""Functions to convert Extract output JSON files incrementally, one top level node at a time.
+
+Giant outputs do not fit in memory once loaded with json.load and pydantic. These functions read
+the file with a pull parser instead: the annotations are read one at a time, then every child of
+the DOCUMENT root is loaded, converted and dropped before the next one is read.
+"""
+
+import json
+import os
+import re
+from functools import cache
+from typing import Any, Iterator, TextIO
+
+from pydantic import TypeAdapter
+
+from .constants import (
+    ANNOTATIONS_KEY,
+    CHILDREN_KEY,
+    CONTENT_TREE_KEY,
+    CONTENT_TYPE_KEY,
+    DOCUMENT_CATEGORY_KEY,
+    OUTPUT_KEY,
+    TEXT_KEY,
+)
+from .convert_output import _get_markdown_text, _TableCellStructure
+from .extract_output_models import (
+    LAZY_TEXT_NODE_DATA_CONTEXT_KEY,
+    AnnotationModel,
+    ContentModel,
+)
+
+# Size of the reads from the file. Values longer than this are read in doubling reads.
+STREAM_CHUNK_SIZE = 1 << 16
+
+_NON_WHITE_SPACE_PATTERN = re.compile(r"\S")
+# Text at the end of the buffer that may be the rest of a number cut by the read
+_NUMBER_TAIL_PATTERN = re.compile(r"[0-9+\-.eE]*\Z")
+
+
+class _JsonPullReader:
+    """Pull parser reading a JSON document from a text stream one value at a time.
+
+    Objects and arrays can be walked key by key and element by element, so only the values that
+    are read at once are held in memory.
+    """
+
+    def __init__(self, stream: TextIO, chunk_size: int = STREAM_CHUNK_SIZE) -> None:
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._position = 0
+        self._is_exhausted = False
+        self._decoder = json.JSONDecoder()
+
+    def _read_more(self) -> bool:
+        """Drop the consumed text and read more, at least doubling the unconsumed text.
+
+        Returns:
+            False if the stream is exhausted
+        """
+        if self._is_exhausted:
+            return False
+        start = self._position
+        unconsumed = self._buffer[start:]
+        chunk = self._stream.read(max(self._chunk_size, len(unconsumed)))
+        if not chunk:
+            self._is_exhausted = True
+            return False
+        self._buffer = unconsumed + chunk
+        self._position = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip white space and get the next character, or an empty string at the end."""
+        while True:
+            match = _NON_WHITE_SPACE_PATTERN.search(self._buffer, self._position)
+            if match is not None:
+                self._position = match.start()
+                return self._buffer[self._position]
+            self._position = len(self._buffer)
+            if not self._read_more():
+                return ""
+
+    def _expect(self, expected_chars: str) -> str:
+        """Consume the next character, which must be one of expected_chars."""
+        char = self.peek()
+        if not char or char not in expected_chars:
+            raise ValueError(
+                f"Expected one of {expected_chars!r} in the JSON. Found {char!r}"
+            )
+        self._position += 1
+        return char
+
+    def read_value(self) -> Any:
+        """Decode the next value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                if self._read_more():
+                    continue
+                raise
+            # Numbers and literals at the end of the buffer may continue in the next read
+            if (
+                _NUMBER_TAIL_PATTERN.match(self._buffer, end) is not None
+                and self._read_more()
+            ):
+                continue
+            self._position = end
+            return value
+
+    def iter_object(self) -> Iterator[str]:
+        """Yield the keys of the next object. Read or skip each value before the next key."""
+        self._expect("{")
+        if self.peek() == "}":
+            self._position += 1
+            return
+        while True:
+            key = self.read_value()
+            if not isinstance(key, str):
+                raise ValueError(f"Expected a string key in the JSON. Found {key!r}")
+            self._expect(":")
+            yield key
+            if self._expect(",}") == "}":
+                return
+
+    def iter_array(self) -> Iterator[None]:
+        """Yield once per element of the next array. Read or skip each element before the next."""
+        self._expect("[")
+        if self.peek() == "]":
+            self._position += 1
+            return
+        while True:
+            yield None
+            if self._expect(",]") == "]":
+                return
+
+    def skip_value(self, streamed_depth: int = 2) -> None:
+        """Skip the next value.
+
+        Objects and arrays are walked key by key and element by element down to streamed_depth
+        levels, and the values below are decoded whole and dropped. The default skips a content
+        tree one child of the root at a time.
+        """
+        char = self.peek()
+        if streamed_depth > 0 and char == "{":
+            for _ in self.iter_object():
+                self.skip_value(streamed_depth - 1)
+        elif streamed_depth > 0 and char == "[":
+            for _ in self.iter_array():
+                self.skip_value(streamed_depth - 1)
+        else:
+            self.read_value()
+
+
+@cache
+def _get_annotation_type_adapter() -> TypeAdapter[AnnotationModel]:
+    """Get the type adapter validating a single annotation."""
+    return TypeAdapter(AnnotationModel)
+
+
+def _iter_output_keys(reader: _JsonPullReader) -> Iterator[str]:
+    """Yield the keys of the output, descending into the "output" key of Extract responses."""
+    for key in reader.iter_object():
+        if key == OUTPUT_KEY and reader.peek() == "{":
+            yield from reader.iter_object()
+        else:
+            yield key
+
+
+def _read_table_cell_structure(reader: _JsonPullReader) -> _TableCellStructure:
+    """Read the table cell structure from the annotations array, one annotation at a time."""
+    table_cell_structure = _TableCellStructure()
+    annotation_type_adapter = _get_annotation_type_adapter()
+    for _ in reader.iter_array():
+        table_cell_structure.add_annotation(
+            annotation_type_adapter.validate_python(reader.read_value())
+        )
+    return table_cell_structure
+
+
+def _iter_content_tree_items(
+    reader: _JsonPullReader,
+    table_cell_structure: _TableCellStructure,
+    return_locations: bool,
+) -> Iterator[dict[str, Any]]:
+    """Yield the items of the content tree, loading one child of the root at a time."""
+    visited: set[str] = set()
+    for key in reader.iter_object():
+        if key == CONTENT_TYPE_KEY:
+            root_type = reader.read_value()
+            if root_type != DOCUMENT_CATEGORY_KEY:
+                raise ValueError(
+                    f"The content tree root must be a {DOCUMENT_CATEGORY_KEY} node to stream it. "
+                    f"Found {root_type}"
+                )
+        elif key == CHILDREN_KEY:
+            for _ in reader.iter_array():
+                child = ContentModel.model_validate(
+                    reader.read_value(),
+                    context={LAZY_TEXT_NODE_DATA_CONTEXT_KEY: True},
+                )
+                yield from table_cell_structure.iter_content_items(
+                    child, return_locations, visited
+                )
+        else:
+            # The DOCUMENT root is just a head node
+            reader.skip_value()
+
+
+def iter_items_from_json_file(
+    file_path: str | os.PathLike[str],
+    return_locations: bool = False,
+) -> Iterator[dict[str, Any]]:
+    """Convert an Extract output JSON file into items, reading it incrementally.
+
+    The annotations are read one at a time, keeping only the table cell structure. Then the
+    children of the DOCUMENT root are loaded and converted one at a time, so memory is bounded by
+    the largest child instead of the whole output. If the content tree comes before the
+    annotations in the file, the file is read twice.
+
+    Args:
+        file_path: the path of the JSON file, with either the output itself or an Extract response
+            with the output in its "output" key
+        return_locations: whether to return item locations
+
+    Returns:
+        a generator of the same items as convert_output_to_items_list_and_relations, in reading
+            order
+    """
+    table_cell_structure = None
+    with open(file_path, "r", encoding="utf-8") as f:
+        reader = _JsonPullReader(f)
+        for key in _iter_output_keys(reader):
+            if key == ANNOTATIONS_KEY:
+                table_cell_structure = _read_table_cell_structure(reader)
+            elif key == CONTENT_TREE_KEY and table_cell_structure is not None:
+                yield from _iter_content_tree_items(
+                    reader, table_cell_structure, return_locations
+                )
+                return
+            else:
+                reader.skip_value()
+    if table_cell_structure is None:
+        raise ValueError(f'No "{ANNOTATIONS_KEY}" found in the output')
+
+    # The content tree came before the annotations, so read the file again
+    with open(file_path, "r", encoding="utf-8") as f:
+        reader = _JsonPullReader(f)
+        for key in _iter_output_keys(reader):
+            if key == CONTENT_TREE_KEY:
+                yield from _iter_content_tree_items(
+                    reader, table_cell_structure, return_locations
+                )
+                return
+            reader.skip_value()
+    raise ValueError(f'No "{CONTENT_TREE_KEY}" found in the output')
+
+
+def convert_json_file_to_str(file_path: str | os.PathLike[str]) -> str:
+    """Convert an Extract output JSON file into a single string, reading it incrementally.
+
+    Args:
+        file_path: the path of the JSON file
+
+    Returns:
+        the same string as convert_output_to_str
+    """
+    return "\n".join(
+        item[TEXT_KEY]
+        for item in iter_items_from_json_file(file_path)
+        if item[TEXT_KEY]
+    )
+
+
+def convert_json_file_to_markdown(file_path: str | os.PathLike[str]) -> str:
+    """Convert an Extract output JSON file into a single markdown string, reading it incrementally.
+
+    Args:
+        file_path: the path of the JSON file
+
+    Returns:
+        the same string as convert_output_to_markdown
+    """
+    return "\n".join(
+        _get_markdown_text(item)
+        for item in iter_items_from_json_file(file_path)
+        if item[TEXT_KEY]
+    )
@@ -0,0 +1,116 @@
+# Copyright 2024-present Kensho Technologies, LLC.
+"""Functions to export the tables in the output to CSV or TSV without pandas.
+
+The table grids are written row by row with the standard library csv writer, one table at a
+time, so workers that only need table files neither import pandas nor build DataFrames.
+"""
+
+import csv
+import io
+import os
+from typing import Iterator, TextIO
+
+from .constants import TableFileFormatType, TableType
+from .extract_output_models import SerializedDocumentType
+from .output_to_tables import iter_table_grids
+
+_TABLE_FILE_DELIMITERS: dict[str, str] = {"csv": ",", "tsv": "\t"}
+
+
+def _get_delimiter(table_format: TableFileFormatType) -> str:
+    """Get the delimiter of a table file format."""
+    try:
+        return _TABLE_FILE_DELIMITERS[table_format]
+    except KeyError:
+        raise ValueError(
+            f"Unknown table format {table_format}, "
+            f"expected one of {sorted(_TABLE_FILE_DELIMITERS)}"
+        ) from None
+
+
+def write_table_grid(
+    table_grid: TableType,
+    stream: TextIO,
+    table_format: TableFileFormatType = "csv",
+) -> None:
+    """Write a 2D grid table to a text stream as CSV or TSV.
+
+    Args:
+        table_grid: 2D list of strings making up the table
+        stream: the text stream to write to. Files should be opened with newline="".
+        table_format: "csv" for comma separated values, or "tsv" for tab separated values
+    """
+    writer = csv.writer(
+        stream, delimiter=_get_delimiter(table_format), lineterminator="\n"
+    )
+    writer.writerows(table_grid)
+
+
+def iter_table_texts(
+    serialized_document: SerializedDocumentType,
+    table_format: TableFileFormatType = "csv",
+    duplicate_merged_cells_content_flag: bool = True,
+    include_figure_extracted_table: bool = False,
+) -> Iterator[tuple[str, str]]:
+    """Yield the tables of Extract output as CSV or TSV text, one table at a time.
+
+    Args:
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
+        table_format: "csv" for comma separated values, or "tsv" for tab separated values
+        duplicate_merged_cells_content_flag: if True, duplicate cell content for merged cells.
+            If False, only fill the first cell (top left) of the merged area, other cells are
+            empty.
+        include_figure_extracted_table: if True, also yield the figure extracted tables
+
+    Returns:
+        an iterator of the table uid and the table text of every table, in the order of
+            extract_pd_dfs_from_output. With the first row as header, the text is the same as
+            DataFrame.to_csv(index=False) of its DataFrame.
+    """
+    # Check the format before building the grids
+    _get_delimiter(table_format)
+    for table_uid, table_grid_structure in iter_table_grids(
+        serialized_document,
+        duplicate_merged_cells_content_flag,
+        include_figure_extracted_table,
+    ):
+        stream = io.StringIO()
+        write_table_grid(table_grid_structure.table_string_grid, stream, table_format)
+        yield table_uid, stream.getvalue()
+
+
+def export_tables_to_files(
+    serialized_document: SerializedDocumentType,
+    output_directory: str | os.PathLike[str],
+    table_format: TableFileFormatType = "csv",
+    duplicate_merged_cells_content_flag: bool = True,
+    include_figure_extracted_table: bool = False,
+) -> list[str]:
+    """Write every table of Extract output to its own CSV or TSV file.
+
+    Args:
+        serialized_document: a serialized document, or the ExtractOutputModel loaded from it
+        output_directory: the directory to write the files to, created if needed
+        table_format: "csv" for comma separated values, or "tsv" for tab separated values
+        duplicate_merged_cells_content_flag: if True, duplicate cell content for merged cells.
+            If False, only fill the first cell (top left) of the merged area, other cells are
+            empty.
+        include_figure_extracted_table: if True, also write the figure extracted tables
+
+    Returns:
+        the paths of the files written, named table_<table uid>.<table format>, in the order of
+            extract_pd_dfs_from_output
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    file_paths = []
+    for table_uid, table_text in iter_table_texts(
+        serialized_document,
+        table_format,
+        duplicate_merged_cells_content_flag,
+        include_figure_extracted_table,
+    ):
+        file_path = os.path.join(output_directory, f"table_{table_uid}.{table_format}")
+        with open(file_path, "w", encoding="utf-8", newline="") as f:
+            f.write(table_text)
+        file_paths.append(file_path)
+    return file_paths
@@ -1,13 +1,14 @@
 # Copyright 2024-present Kensho Technologies, LLC.
 """Helper functions for formatting tables."""
 
-from typing import Sequence
-
-import pandas as pd
+from typing import TYPE_CHECKING, Sequence
 
 from .constants import AnnotationType
 from .extract_output_models import AnnotationDataModel, TableStructureAnnotationModel
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 def _create_empty_annotation(row: int, col: int) -> TableStructureAnnotationModel:
     """Create an empty annotation."""
@@ -138,7 +139,7 @@ def get_table_shape(
 
 def convert_table_to_pd_df(
     table_grid: list[list[str]], use_first_row_as_header: bool = True
-) -> pd.DataFrame:
+) -> "pd.DataFrame":
     """Convert a 2D list of strings to a pandas DataFrame.
 
     Use the first row as a header if use_first_row_as_header set to True.
@@ -151,6 +152,9 @@ def convert_table_to_pd_df(
     Returns:
         pandas DataFrame representing the table
     """
+    # Imported here so the paths that do not build DataFrames run without pandas
+    import pandas as pd
+
     # Make first row the header
     if use_first_row_as_header and len(table_grid) > 1:
         table_df = pd.DataFrame(table_grid[1:], columns=table_grid[0])
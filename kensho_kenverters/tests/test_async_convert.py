@@ -0,0 +1,205 @@
+import asyncio
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, AsyncIterator, ClassVar
+from unittest import IsolatedAsyncioTestCase
+
+from ..async_convert import AsyncConverter
+from ..convert_output import (
+    convert_output_to_items_list_and_relations,
+    convert_output_to_markdown,
+    convert_output_to_str,
+)
+from ..output_to_tables import build_table_grids, extract_pd_dfs_from_output
+
+OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output.json"
+)
+
+
+async def _iter_chunks(data: bytes, chunk_size: int) -> AsyncIterator[bytes]:
+    for start in range(0, len(data), chunk_size):
+        end = start + chunk_size
+        await asyncio.sleep(0)
+        yield data[start:end]
+
+
+class TestAsyncConvert(IsolatedAsyncioTestCase):
+    extract_output: ClassVar[dict[str, Any]]
+    extract_output_bytes: ClassVar[bytes]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(OUTPUT_FILE_PATH, "rb") as f:
+            cls.extract_output_bytes = f.read()
+        cls.extract_output = json.loads(cls.extract_output_bytes)
+
+    async def test_async_converter(self) -> None:
+        expected_markdown = convert_output_to_markdown(self.extract_output)
+        with ThreadPoolExecutor(2) as executor:
+            async_converter = AsyncConverter(executor)
+            serialized_documents: list[dict[str, Any] | bytes | pathlib.Path] = [
+                self.extract_output,
+                self.extract_output_bytes,
+                pathlib.Path(OUTPUT_FILE_PATH),
+            ]
+            for serialized_document in serialized_documents:
+                self.assertEqual(
+                    await async_converter.convert_output_to_markdown(
+                        serialized_document
+                    ),
+                    expected_markdown,
+                )
+            self.assertEqual(
+                await async_converter.convert_output_to_markdown(
+                    _iter_chunks(self.extract_output_bytes, 1000)
+                ),
+                expected_markdown,
+            )
+            self.assertEqual(
+                await async_converter.convert_output_to_str(self.extract_output),
+                convert_output_to_str(self.extract_output),
+            )
+            self.assertEqual(
+                await async_converter.convert_output_to_items_list_and_relations(
+                    self.extract_output, return_locations=True
+                ),
+                convert_output_to_items_list_and_relations(
+                    self.extract_output, return_locations=True
+                ),
+            )
+            self.assertEqual(
+                await async_converter.build_table_grids(self.extract_output),
+                build_table_grids(self.extract_output),
+            )
+            dfs = await async_converter.extract_pd_dfs_from_output(self.extract_output)
+            expected_dfs = extract_pd_dfs_from_output(self.extract_output)
+            self.assertEqual(len(dfs), len(expected_dfs))
+            for df, expected_df in zip(dfs, expected_dfs):
+                self.assertTrue(df.equals(expected_df))
+
+    async def test_async_converter_max_concurrency(self) -> None:
+        lock = threading.Lock()
+        num_in_flight = 0
+        max_in_flight = 0
+
+        def slow_convert_output_to_str(serialized_document: dict[str, Any]) -> str:
+            nonlocal num_in_flight, max_in_flight
+            with lock:
+                num_in_flight += 1
+                max_in_flight = max(max_in_flight, num_in_flight)
+            time.sleep(0.02)
+            with lock:
+                num_in_flight -= 1
+            return convert_output_to_str(serialized_document)
+
+        with ThreadPoolExecutor(8) as executor:
+            async_converter = AsyncConverter(executor, max_concurrency=2)
+            results = await asyncio.gather(
+                *[
+                    async_converter.convert(
+                        slow_convert_output_to_str, self.extract_output
+                    )
+                    for _ in range(8)
+                ]
+            )
+        self.assertEqual(results, [convert_output_to_str(self.extract_output)] * 8)
+        self.assertEqual(max_in_flight, 2)
+
+    async def test_async_converter_event_loops(self) -> None:
+        expected_text = convert_output_to_str(self.extract_output)
+        with ThreadPoolExecutor(2) as executor:
+            async_converter = AsyncConverter(executor, max_concurrency=1)
+
+            async def convert_concurrently() -> list[str]:
+                return list(
+                    await asyncio.gather(
+                        async_converter.convert_output_to_str(self.extract_output),
+                        async_converter.convert_output_to_str(self.extract_output),
+                    )
+                )
+
+            # The same converter used in this event loop and then in two others
+            self.assertEqual(await convert_concurrently(), [expected_text] * 2)
+            for _ in range(2):
+                results = await asyncio.to_thread(asyncio.run, convert_concurrently())
+                self.assertEqual(results, [expected_text] * 2)
+
+    async def test_async_iterable_documents(self) -> None:
+        conversion_started = threading.Event()
+        release_conversion = threading.Event()
+        num_chunks_read = 0
+
+        def blocking_convert_output_to_str(serialized_document: dict[str, Any]) -> str:
+            conversion_started.set()
+            release_conversion.wait()
+            return convert_output_to_str(serialized_document)
+
+        async def iter_counted_chunks() -> AsyncIterator[bytes]:
+            nonlocal num_chunks_read
+            async for chunk in _iter_chunks(self.extract_output_bytes, 1000):
+                num_chunks_read += 1
+                yield chunk
+
+        with ThreadPoolExecutor(2) as executor:
+            async_converter = AsyncConverter(executor, max_concurrency=1)
+            blocking_task = asyncio.create_task(
+                async_converter.convert(
+                    blocking_convert_output_to_str, self.extract_output
+                )
+            )
+            try:
+                await asyncio.to_thread(conversion_started.wait)
+                task = asyncio.create_task(
+                    async_converter.convert_output_to_str(iter_counted_chunks())
+                )
+                await asyncio.sleep(0.05)
+                # Chunks are only read once the semaphore is acquired
+                self.assertEqual(num_chunks_read, 0)
+            finally:
+                release_conversion.set()
+            await blocking_task
+            self.assertEqual(await task, convert_output_to_str(self.extract_output))
+            self.assertGreater(num_chunks_read, 0)
+
+            async_converter = AsyncConverter(
+                executor, max_document_size=len(self.extract_output_bytes) - 1
+            )
+            with self.assertRaises(ValueError):
+                await async_converter.convert_output_to_str(
+                    _iter_chunks(self.extract_output_bytes, 1000)
+                )
+
+    async def test_async_converter_process_executor(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = pathlib.Path(directory) / "output.json"
+            file_path.write_bytes(self.extract_output_bytes)
+            with ProcessPoolExecutor(1) as executor:
+                async_converter = AsyncConverter(executor)
+                self.assertEqual(
+                    await async_converter.convert_output_to_markdown(file_path),
+                    convert_output_to_markdown(self.extract_output),
+                )
+
+    async def test_no_pandas_import(self) -> None:
+        code = (
+            "import asyncio, pathlib, sys\n"
+            "from concurrent.futures import ThreadPoolExecutor\n"
+            "from kensho_kenverters.async_convert import AsyncConverter\n"
+            "async def main():\n"
+            "    with ThreadPoolExecutor(1) as executor:\n"
+            "        converter = AsyncConverter(executor)\n"
+            "        await converter.convert_output_to_markdown(\n"
+            f"            pathlib.Path({OUTPUT_FILE_PATH!r})\n"
+            "        )\n"
+            "asyncio.run(main())\n"
+            "assert 'pandas' not in sys.modules\n"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,172 @@
+import json
+import mmap
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Any, ClassVar
+from unittest import TestCase
+from unittest.mock import patch
+
+from ..binary_output import load_output_from_binary, save_output_to_binary
+from ..convert_output import (
+    convert_output_to_items_list_and_relations,
+    convert_output_to_markdown,
+)
+from ..extract_output_models import CompactLocations, LazyTextNodeDataModel
+from ..output_to_tables import build_table_grids
+from ..utils import load_output_to_pydantic
+
+OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output.json"
+)
+OUTPUT_CHAR_OFFSETS_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_char_offsets.json"
+)
+OUTPUT_ITEM_RELATIONS_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_item_relations.json"
+)
+
+
+class TestBinaryOutput(TestCase):
+    serialized_documents: ClassVar[list[dict[str, Any]]]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.serialized_documents = []
+        for file_path in [
+            OUTPUT_FILE_PATH,
+            OUTPUT_CHAR_OFFSETS_FILE_PATH,
+            OUTPUT_ITEM_RELATIONS_FILE_PATH,
+        ]:
+            with open(file_path, "r") as f:
+                cls.serialized_documents.append(json.load(f))
+
+    def test_binary_round_trip(self) -> None:
+        for serialized_document in self.serialized_documents:
+            with tempfile.TemporaryDirectory() as directory:
+                file_path = os.path.join(directory, "output.bin")
+                save_output_to_binary(serialized_document, file_path)
+                loaded_document = load_output_from_binary(file_path)
+
+                # Locations are viewed in the mapped file and text node data is lazy
+                self.assertIsInstance(
+                    loaded_document.content_tree.children[0].locations,
+                    CompactLocations,
+                )
+                text_node_data = loaded_document.content_tree.children[0].text_node_data
+                if text_node_data is not None:
+                    self.assertIsInstance(text_node_data, LazyTextNodeDataModel)
+
+                self.assertEqual(
+                    loaded_document,
+                    load_output_to_pydantic(
+                        serialized_document, compact_locations=True
+                    ),
+                )
+                self.assertEqual(
+                    convert_output_to_markdown(loaded_document),
+                    convert_output_to_markdown(serialized_document),
+                )
+                self.assertEqual(
+                    convert_output_to_items_list_and_relations(
+                        loaded_document, return_locations=True
+                    ),
+                    convert_output_to_items_list_and_relations(
+                        serialized_document, return_locations=True
+                    ),
+                )
+                self.assertEqual(
+                    build_table_grids(loaded_document),
+                    build_table_grids(serialized_document),
+                )
+
+                # A loaded document can be saved again
+                other_file_path = os.path.join(directory, "other_output.bin")
+                save_output_to_binary(loaded_document, other_file_path)
+                self.assertEqual(
+                    load_output_from_binary(other_file_path), loaded_document
+                )
+
+    def test_mapping_closed(self) -> None:
+        mappings: list[mmap.mmap] = []
+        open_mapping = mmap.mmap
+
+        def open_tracked_mapping(*args: Any, **kwargs: Any) -> mmap.mmap:
+            mapping = open_mapping(*args, **kwargs)
+            mappings.append(mapping)
+            return mapping
+
+        serialized_document = self.serialized_documents[2]
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "output.bin")
+            save_output_to_binary(serialized_document, file_path)
+            with patch("mmap.mmap", open_tracked_mapping):
+                loaded_document = load_output_from_binary(file_path)
+            self.assertEqual(len(mappings), 1)
+            self.assertTrue(mappings[0].closed)
+            os.remove(file_path)
+        # The document does not need the file anymore
+        self.assertEqual(
+            convert_output_to_items_list_and_relations(
+                loaded_document, return_locations=True
+            ),
+            convert_output_to_items_list_and_relations(
+                serialized_document, return_locations=True
+            ),
+        )
+
+    def test_save_over_loaded_file(self) -> None:
+        # Run in another process, as reading a truncated mapping kills the process
+        code = (
+            "import json, os, sys\n"
+            "from kensho_kenverters.binary_output import (\n"
+            "    load_output_from_binary, save_output_to_binary\n"
+            ")\n"
+            "from kensho_kenverters.convert_output import (\n"
+            "    convert_output_to_items_list_and_relations, convert_output_to_markdown\n"
+            ")\n"
+            "file_path, first_path, second_path = sys.argv[1:]\n"
+            "with open(first_path) as f:\n"
+            "    first_document = json.load(f)\n"
+            "with open(second_path) as f:\n"
+            "    second_document = json.load(f)\n"
+            "save_output_to_binary(first_document, file_path)\n"
+            "loaded_document = load_output_from_binary(file_path)\n"
+            "def get_locations(document):\n"
+            "    return [\n"
+            "        list(item['locations'] or [])\n"
+            "        for item in convert_output_to_items_list_and_relations(\n"
+            "            document, return_locations=True\n"
+            "        ).item_list\n"
+            "    ]\n"
+            "locations = get_locations(loaded_document)\n"
+            "# Saved again while loaded, from the loaded document and another one\n"
+            "save_output_to_binary(loaded_document, file_path)\n"
+            "save_output_to_binary(second_document, file_path)\n"
+            "assert get_locations(loaded_document) == locations\n"
+            "assert convert_output_to_markdown(\n"
+            "    load_output_from_binary(file_path)\n"
+            ") == convert_output_to_markdown(second_document)\n"
+            "assert os.listdir(os.path.dirname(file_path)) == ['output.bin']\n"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            subprocess.run(
+                [
+                    sys.executable,
+                    "-c",
+                    code,
+                    os.path.join(directory, "output.bin"),
+                    OUTPUT_ITEM_RELATIONS_FILE_PATH,
+                    OUTPUT_FILE_PATH,
+                ],
+                check=True,
+            )
+
+    def test_load_output_from_binary_errors(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "output.json")
+            with open(file_path, "w") as f:
+                json.dump(self.serialized_documents[0], f)
+            with self.assertRaises(ValueError):
+                load_output_from_binary(file_path)
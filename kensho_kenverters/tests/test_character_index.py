@@ -0,0 +1,98 @@
+import json
+import os
+from typing import Any, ClassVar
+from unittest import TestCase
+
+from ..character_index import (
+    _align_content_to_text,
+    _get_relative_char_offsets,
+    build_character_index,
+)
+
+OUTPUT_CHAR_OFFSETS_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_char_offsets.json"
+)
+OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output.json"
+)
+
+
+class TestCharacterIndex(TestCase):
+    extract_output_char_offsets: ClassVar[dict[str, Any]]
+    extract_output: ClassVar[dict[str, Any]]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(OUTPUT_CHAR_OFFSETS_FILE_PATH, "r") as f:
+            cls.extract_output_char_offsets = json.load(f)
+        with open(OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output = json.load(f)
+
+    def test_get_character_locations(self) -> None:
+        character_index = build_character_index(self.extract_output_char_offsets)
+        # Content "2019" has the text run " 2019" with offsets
+        # [0.0, 0.11093, 0.33311, 0.55563, 0.77781] in a box of width 0.05043 at x=0.20001
+        (location,) = character_index.get_character_locations("1", 1, 3)
+        self.assertAlmostEqual(location.x, 0.20001 + 0.33311 * 0.05043)
+        self.assertAlmostEqual(location.width, (0.77781 - 0.33311) * 0.05043)
+        self.assertAlmostEqual(location.y, 0.0137)
+        self.assertAlmostEqual(location.height, 0.01425)
+        self.assertEqual(location.page_number, 0)
+        # The last character ends at the end of the box
+        (location,) = character_index.get_character_locations("1", 0, 4)
+        self.assertAlmostEqual(location.x + location.width, 0.20001 + 0.05043)
+        # Out of bounds ranges are clipped
+        self.assertEqual(
+            character_index.get_character_locations("1", 0, 100), [location]
+        )
+        self.assertEqual(character_index.get_character_locations("1", 2, 2), [])
+
+    def test_get_character_locations_multiple_lines(self) -> None:
+        character_index = build_character_index(self.extract_output_char_offsets)
+        # "...computer systems use" ends the first line of content 4
+        content_start = 100
+        locations = character_index.get_character_locations(
+            "4", content_start, content_start + 30
+        )
+        self.assertEqual(len(locations), 2)
+        first_line, second_line = locations
+        self.assertAlmostEqual(first_line.y, 0.10141)
+        self.assertAlmostEqual(first_line.x + first_line.width, 0.1 + 0.79729)
+        self.assertAlmostEqual(second_line.y, 0.11567)
+        self.assertAlmostEqual(second_line.x, 0.1)
+
+    def test_get_character_boxes(self) -> None:
+        character_index = build_character_index(self.extract_output_char_offsets)
+        character_boxes = character_index.get_character_boxes(
+            ["1", "4", "1", "2"], [0, 100, 2, 0], [4, 130, 2, 4]
+        )
+        self.assertEqual(character_boxes.query_indices.tolist(), [0, 1, 1, 3])
+        self.assertEqual(character_boxes.page_numbers.tolist(), [0, 0, 0, 0])
+        # The batch query returns the rows of the single queries in query order
+        expected_locations = [
+            location
+            for uid, start, end in [("1", 0, 4), ("4", 100, 130), ("2", 0, 4)]
+            for location in character_index.get_character_locations(uid, start, end)
+        ]
+        for row_index, location in enumerate(expected_locations):
+            self.assertAlmostEqual(character_boxes.x[row_index], location.x)
+            self.assertAlmostEqual(character_boxes.y[row_index], location.y)
+            self.assertAlmostEqual(character_boxes.width[row_index], location.width)
+        with self.assertRaises(KeyError):
+            character_index.get_character_boxes(["not a uid"], [0], [1])
+
+    def test_build_character_index_no_text_node_data(self) -> None:
+        character_index = build_character_index(self.extract_output)
+        self.assertEqual(character_index.uid_to_node_index, {})
+        self.assertEqual(len(character_index.char_x_starts), 0)
+
+    def test_align_content_to_text(self) -> None:
+        self.assertEqual(_align_content_to_text("2019", " 2019"), [1, 2, 3, 4])
+        self.assertEqual(_align_content_to_text("a b", "a\nb"), [0, 1, 2])
+        self.assertEqual(_align_content_to_text("a b", "ab"), [0, 1, 1])
+        self.assertEqual(_align_content_to_text("ab", ""), [-1, -1])
+
+    def test_get_relative_char_offsets(self) -> None:
+        self.assertEqual(_get_relative_char_offsets("abcd", None), [0, 0.25, 0.5, 0.75])
+        self.assertEqual(_get_relative_char_offsets("abc", [0.0, 0.5]), [0.0, 0.5, 1.0])
+        self.assertEqual(_get_relative_char_offsets("ab", [0.0, 0.5, 0.8]), [0.0, 0.5])
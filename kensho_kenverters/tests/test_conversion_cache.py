@@ -0,0 +1,293 @@
+import copy
+import json
+import os
+import pathlib
+import pickle
+import tempfile
+import time
+from functools import partial
+from typing import Any, Callable, ClassVar
+from unittest import TestCase
+from unittest.mock import patch
+
+from ..conversion_cache import (
+    CACHE_FILE_SUFFIX,
+    TEMPORARY_FILE_MAX_AGE,
+    TEMPORARY_FILE_SUFFIX,
+    ConversionCache,
+    _hash_document,
+)
+from ..convert_output import convert_output_to_markdown, convert_output_to_str_by_page
+from ..extract_output_models import ExtractOutputModel
+from ..output_to_tables import build_table_grids
+from ..utils import load_output_to_pydantic
+
+OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output.json"
+)
+
+_num_conversions = 0
+
+
+def _counting_convert_output_to_markdown(
+    serialized_document: dict[str, Any] | ExtractOutputModel,
+) -> str:
+    global _num_conversions  # pylint: disable=global-statement
+    _num_conversions += 1
+    return convert_output_to_markdown(serialized_document)
+
+
+def _get_nested_converter() -> Callable[[dict[str, Any]], str]:
+    def convert_output_to_markdown(serialized_document: dict[str, Any]) -> str:
+        return ""
+
+    return convert_output_to_markdown
+
+
+def _list_cache_files(directory: str) -> list[str]:
+    return sorted(
+        file_name
+        for file_name in os.listdir(directory)
+        if file_name.endswith(CACHE_FILE_SUFFIX)
+    )
+
+
+class TestConversionCache(TestCase):
+    extract_output: ClassVar[dict[str, Any]]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output = json.load(f)
+
+    def test_convert(self) -> None:
+        global _num_conversions  # pylint: disable=global-statement
+        _num_conversions = 0
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ConversionCache(directory)
+            expected_markdown = convert_output_to_markdown(self.extract_output)
+            for _ in range(2):
+                self.assertEqual(
+                    cache.convert(
+                        _counting_convert_output_to_markdown, self.extract_output
+                    ),
+                    expected_markdown,
+                )
+            self.assertEqual(_num_conversions, 1)
+
+            # A new cache on the same directory, as in another process, reads the result
+            other_cache = ConversionCache(directory)
+            self.assertEqual(
+                other_cache.convert(
+                    _counting_convert_output_to_markdown, self.extract_output
+                ),
+                expected_markdown,
+            )
+            self.assertEqual(_num_conversions, 1)
+
+            # Changed documents and other converters are cached separately
+            changed_output = json.loads(json.dumps(self.extract_output))
+            changed_output["content_tree"]["children"][0]["content"] = "Changed"
+            self.assertEqual(
+                cache.convert(_counting_convert_output_to_markdown, changed_output),
+                convert_output_to_markdown(changed_output),
+            )
+            self.assertEqual(_num_conversions, 2)
+            self.assertEqual(
+                cache.convert(convert_output_to_str_by_page, self.extract_output),
+                convert_output_to_str_by_page(self.extract_output),
+            )
+            self.assertEqual(len(_list_cache_files(directory)), 3)
+
+            # Options are part of the key
+            for duplicate_merged_cells_content_flag in [True, False, True]:
+                self.assertEqual(
+                    cache.convert(
+                        build_table_grids,
+                        self.extract_output,
+                        duplicate_merged_cells_content_flag=duplicate_merged_cells_content_flag,
+                    ),
+                    build_table_grids(
+                        self.extract_output,
+                        duplicate_merged_cells_content_flag=duplicate_merged_cells_content_flag,
+                    ),
+                )
+            self.assertEqual(len(_list_cache_files(directory)), 5)
+
+            cache.clear()
+            self.assertEqual(_list_cache_files(directory), [])
+
+    def test_convert_from_json(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ConversionCache(os.path.join(directory, "cache"))
+            json_file_path = pathlib.Path(directory) / "output.json"
+            with open(json_file_path, "w") as f:
+                json.dump(self.extract_output, f)
+            expected_markdown = convert_output_to_markdown(self.extract_output)
+            serialized_documents: list[pathlib.Path | bytes] = [
+                json_file_path,
+                json_file_path.read_bytes(),
+            ]
+            for serialized_document in serialized_documents:
+                for _ in range(2):
+                    self.assertEqual(
+                        cache.convert(convert_output_to_markdown, serialized_document),
+                        expected_markdown,
+                    )
+            # The file and its bytes share their key
+            self.assertEqual(len(_list_cache_files(cache.directory)), 1)
+
+            # Loaded documents would have to be serialized to be hashed
+            with self.assertRaises(TypeError):
+                cache.convert(
+                    convert_output_to_markdown,
+                    load_output_to_pydantic(self.extract_output),  # type: ignore[arg-type]
+                )
+
+    def test_cache_hits_skip_loading(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ConversionCache(directory)
+            expected_markdown = convert_output_to_markdown(self.extract_output)
+            serialized_documents: list[dict[str, Any] | bytes] = [
+                self.extract_output,
+                json.dumps(self.extract_output).encode("utf-8"),
+            ]
+            for serialized_document in serialized_documents:
+                cache.convert(convert_output_to_markdown, serialized_document)
+            # Cached results are read without loading or converting the document
+            with patch.object(
+                ExtractOutputModel,
+                "model_validate",
+                side_effect=AssertionError("Document loaded"),
+            ), patch(
+                "kensho_kenverters.conversion_cache.load_output_from_json",
+                side_effect=AssertionError("Document loaded"),
+            ):
+                for serialized_document in serialized_documents:
+                    self.assertEqual(
+                        cache.convert(convert_output_to_markdown, serialized_document),
+                        expected_markdown,
+                    )
+
+    def test_hash_document(self) -> None:
+        document_hash = _hash_document(self.extract_output)
+        self.assertEqual(
+            _hash_document(copy.deepcopy(self.extract_output)), document_hash
+        )
+        changed_output = copy.deepcopy(self.extract_output)
+        changed_output["content_tree"]["children"][0]["content"] = "Changed"
+        self.assertNotEqual(_hash_document(changed_output), document_hash)
+        with self.assertRaises(TypeError):
+            _hash_document(load_output_to_pydantic(self.extract_output))  # type: ignore[arg-type]
+
+    def test_get_key(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ConversionCache(directory)
+            document_hash = _hash_document(self.extract_output)
+            # Converters without a name identifying them are rejected
+            unnamed_converters: list[Callable[..., Any]] = [
+                lambda serialized_document: "",
+                partial(build_table_grids, duplicate_merged_cells_content_flag=False),
+                _get_nested_converter(),
+            ]
+            for converter in unnamed_converters:
+                with self.assertRaises(ValueError):
+                    cache.get_key(converter, document_hash, {})
+                with self.assertRaises(ValueError):
+                    cache.convert(converter, self.extract_output)
+
+            # Options are keyed by their values, whatever their order
+            self.assertEqual(
+                cache.get_key(
+                    build_table_grids,
+                    document_hash,
+                    {"duplicate_merged_cells_content_flag": False, "other": [1, "a"]},
+                ),
+                cache.get_key(
+                    build_table_grids,
+                    document_hash,
+                    {"other": [1, "a"], "duplicate_merged_cells_content_flag": False},
+                ),
+            )
+            with self.assertRaises(ValueError):
+                cache.get_key(build_table_grids, document_hash, {"option": object()})
+
+    def test_unreadable_files(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ConversionCache(directory)
+            expected_markdown = convert_output_to_markdown(self.extract_output)
+            cache.convert(convert_output_to_markdown, self.extract_output)
+            (file_name,) = _list_cache_files(directory)
+            file_path = os.path.join(directory, file_name)
+            unreadable_contents = [
+                b"",
+                b"not a pickle",
+                # A result of a class which no longer exists
+                pickle.dumps(ExtractOutputModel).replace(
+                    b"ExtractOutputModel", b"RemovedOutputModel"
+                ),
+            ]
+            for unreadable_content in unreadable_contents:
+                with open(file_path, "wb") as f:
+                    f.write(unreadable_content)
+                with self.assertLogs(
+                    "kensho_kenverters.conversion_cache", level="WARNING"
+                ):
+                    self.assertEqual(
+                        cache._read(file_name[: -len(CACHE_FILE_SUFFIX)]), (False, None)
+                    )
+                self.assertFalse(os.path.exists(file_path))
+                # Converted and cached again
+                self.assertEqual(
+                    cache.convert(convert_output_to_markdown, self.extract_output),
+                    expected_markdown,
+                )
+                self.assertEqual(_list_cache_files(directory), [file_name])
+
+    def test_remove_temporary_files(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ConversionCache(directory)
+            old_time = time.time() - TEMPORARY_FILE_MAX_AGE - 100
+            temporary_file_paths = []
+            for file_name in ["old", "new"]:
+                file_path = os.path.join(directory, file_name + TEMPORARY_FILE_SUFFIX)
+                with open(file_path, "wb") as f:
+                    f.write(b"partial result")
+                temporary_file_paths.append(file_path)
+            os.utime(temporary_file_paths[0], (old_time, old_time))
+
+            # Writers may still be writing recent temporary files
+            cache.convert(convert_output_to_markdown, self.extract_output)
+            self.assertFalse(os.path.exists(temporary_file_paths[0]))
+            self.assertTrue(os.path.exists(temporary_file_paths[1]))
+            os.utime(temporary_file_paths[1], (old_time, old_time))
+            cache.clear()
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_evict(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ConversionCache(directory)
+            cache.convert(convert_output_to_markdown, self.extract_output)
+            cache.convert(convert_output_to_str_by_page, self.extract_output)
+            cache_files = _list_cache_files(directory)
+            self.assertEqual(len(cache_files), 2)
+            markdown_file_name = (
+                cache.get_key(
+                    convert_output_to_markdown, _hash_document(self.extract_output), {}
+                )
+                + CACHE_FILE_SUFFIX
+            )
+            self.assertIn(markdown_file_name, cache_files)
+
+            # Reading a result marks it as recently used
+            old_time = time.time() - 100
+            for file_name in cache_files:
+                os.utime(os.path.join(directory, file_name), (old_time, old_time))
+            cache.convert(convert_output_to_markdown, self.extract_output)
+
+            # Only the most recently used result fits
+            cache.max_size = os.path.getsize(
+                os.path.join(directory, markdown_file_name)
+            )
+            cache.evict()
+            self.assertEqual(_list_cache_files(directory), [markdown_file_name])
@@ -0,0 +1,254 @@
+import http.client
+import json
+import os
+import socket
+import threading
+import urllib.error
+import urllib.request
+from typing import Any, ClassVar
+from unittest import TestCase
+
+from pydantic_core import to_json
+
+from ..conversion_server import _WARM_UP_OUTPUT, ConversionServer
+from ..convert_output import (
+    convert_output_to_items_list_and_relations,
+    convert_output_to_markdown,
+    convert_output_to_str_by_page,
+)
+from ..output_to_tables import build_table_grids
+from ..utils import _get_json_type_adapter
+
+OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output.json"
+)
+OUTPUT_ITEM_RELATIONS_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_item_relations.json"
+)
+
+
+def _is_worker_warmed_up() -> bool:
+    """Check in a worker process whether it already parsed an output."""
+    return _get_json_type_adapter.cache_info().currsize > 0
+
+
+class TestConversionServer(TestCase):
+    server: ClassVar[ConversionServer]
+    server_thread: ClassVar[threading.Thread]
+    url: ClassVar[str]
+    extract_output: ClassVar[dict[str, Any]]
+    extract_output_bytes: ClassVar[bytes]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(OUTPUT_FILE_PATH, "rb") as f:
+            cls.extract_output_bytes = f.read()
+        cls.extract_output = json.loads(cls.extract_output_bytes)
+        cls.server = ConversionServer(port=0, max_workers=1)
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever)
+        cls.server_thread.start()
+        host, port = cls.server.server_address[:2]
+        cls.url = f"http://{host!s}:{port}"
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+        cls.server_thread.join()
+        cls.server.server_close()
+
+    def _post(self, path: str, body: bytes) -> tuple[int, dict[str, str], bytes]:
+        request = urllib.request.Request(self.url + path, data=body, method="POST")
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, dict(response.headers), response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, dict(e.headers), e.read()
+
+    def _get_metrics(self) -> dict[str, Any]:
+        with urllib.request.urlopen(self.url + "/metrics") as response:
+            metrics: dict[str, Any] = json.loads(response.read())
+        return metrics
+
+    def _post_with_headers(
+        self, path: str, body: bytes, headers: dict[str, str]
+    ) -> tuple[int, bytes]:
+        """Post a request with exactly these headers, unlike urllib."""
+        host, port = self.server.server_address[:2]
+        connection = http.client.HTTPConnection(str(host), port)
+        try:
+            connection.putrequest("POST", path)
+            for header, value in headers.items():
+                connection.putheader(header, value)
+            connection.endheaders(body)
+            response = connection.getresponse()
+            return response.status, response.read()
+        finally:
+            connection.close()
+
+    def test_conversion_endpoints(self) -> None:
+        status, headers, body = self._post("/markdown", self.extract_output_bytes)
+        self.assertEqual(status, 200)
+        self.assertTrue(headers["Content-Type"].startswith("text/markdown"))
+        self.assertEqual(
+            body.decode("utf-8"), convert_output_to_markdown(self.extract_output)
+        )
+
+        # Extract responses wrapping the output are accepted
+        wrapped_output = json.dumps({"output": self.extract_output}).encode("utf-8")
+        status, _, body = self._post("/text_by_page", wrapped_output)
+        self.assertEqual(status, 200)
+        self.assertEqual(
+            json.loads(body), convert_output_to_str_by_page(self.extract_output)
+        )
+
+        status, _, body = self._post(
+            "/tables?duplicate_merged_cells_content_flag=false",
+            self.extract_output_bytes,
+        )
+        self.assertEqual(status, 200)
+        table_grids = build_table_grids(
+            self.extract_output, duplicate_merged_cells_content_flag=False
+        )
+        self.assertEqual(
+            {
+                table_uid: table_grid["table_string_grid"]
+                for table_uid, table_grid in json.loads(body).items()
+            },
+            {
+                table_uid: table_grid.table_string_grid
+                for table_uid, table_grid in table_grids.items()
+            },
+        )
+
+    def test_large_response(self) -> None:
+        with open(OUTPUT_ITEM_RELATIONS_FILE_PATH, "rb") as f:
+            extract_output_bytes = f.read()
+        status, headers, body = self._post(
+            "/items?return_locations=true&return_relations=1", extract_output_bytes
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(int(headers["Content-Length"]), len(body))
+        result = convert_output_to_items_list_and_relations(
+            json.loads(extract_output_bytes),
+            return_locations=True,
+            return_relations=True,
+        )
+        # Item locations are LocationModel objects, serialized as dictionaries
+        self.assertEqual(json.loads(body), json.loads(to_json(result)))
+
+    def test_warm_up_output(self) -> None:
+        for path in [
+            "/markdown",
+            "/text_by_page",
+            "/items?return_locations=1",
+            "/tables",
+        ]:
+            self.assertEqual(self._post(path, _WARM_UP_OUTPUT)[0], 200)
+
+    def test_errors(self) -> None:
+        self.assertEqual(self._post("/unknown", self.extract_output_bytes)[0], 404)
+        self.assertEqual(self._post("/markdown", b"not json")[0], 400)
+        self.assertEqual(self._post("/markdown", b'{"annotations": []}')[0], 400)
+        self.assertEqual(
+            self._post("/markdown?return_locations=true", self.extract_output_bytes)[0],
+            400,
+        )
+        self.assertEqual(
+            self._post("/items?return_locations=maybe", self.extract_output_bytes)[0],
+            400,
+        )
+
+    def test_invalid_content_length(self) -> None:
+        self.assertEqual(
+            self._post_with_headers("/markdown", b"", {})[0],
+            411,
+        )
+        for content_length in ["abc", "-1", "1.5"]:
+            status, body = self._post_with_headers(
+                "/markdown", b"{}", {"Content-Length": content_length}
+            )
+            self.assertEqual(status, 400)
+            self.assertIn(b"Content-Length", body)
+        self.assertEqual(self._get_metrics()["in_flight"], 0)
+
+    def test_conversion_failure(self) -> None:
+        # A table cell without its table structure annotation
+        extract_output = json.loads(self.extract_output_bytes)
+        extract_output["annotations"] = extract_output["annotations"][1:]
+        status, _, body = self._post(
+            "/markdown", json.dumps(extract_output).encode("utf-8")
+        )
+        self.assertEqual(status, 500)
+        self.assertIn(b"KeyError", body)
+        metrics = self._get_metrics()
+        self.assertEqual(metrics["in_flight"], 0)
+        self.assertGreaterEqual(
+            metrics["endpoints"]["/markdown"]["status_counts"]["500"], 1
+        )
+        # The server keeps converting
+        self.assertEqual(self._post("/markdown", self.extract_output_bytes)[0], 200)
+
+    def test_broken_worker_pool(self) -> None:
+        executor = self.server.executor
+        # Workers are forked from this process, so they must warm up themselves
+        _get_json_type_adapter.cache_clear()
+        # A worker exiting breaks the pool
+        executor.submit(os._exit, 1).exception()
+        status, headers, _ = self._post("/text", self.extract_output_bytes)
+        self.assertEqual(status, 503)
+        self.assertIn("Retry-After", headers)
+        self.assertIsNot(self.server.executor, executor)
+        # Workers of the replacement pool are warmed up as well
+        self.assertTrue(self.server.executor.submit(_is_worker_warmed_up).result())
+        self.assertEqual(self._post("/text", self.extract_output_bytes)[0], 200)
+        self.assertEqual(self._get_metrics()["in_flight"], 0)
+
+    def test_backpressure_and_metrics(self) -> None:
+        # Take every request slot, as if the worker and the pending queue were full
+        num_slots = 0
+        while self.server.request_slots.acquire(blocking=False):
+            num_slots += 1
+        try:
+            status, headers, _ = self._post("/text", self.extract_output_bytes)
+        finally:
+            for _ in range(num_slots):
+                self.server.request_slots.release()
+        self.assertEqual(num_slots, 3)
+        self.assertEqual(status, 503)
+        self.assertIn("Retry-After", headers)
+        self.assertEqual(self._post("/text", self.extract_output_bytes)[0], 200)
+
+        metrics = self._get_metrics()
+        text_metrics = metrics["endpoints"]["/text"]
+        self.assertEqual(text_metrics["status_counts"]["503"], 1)
+        self.assertGreaterEqual(text_metrics["status_counts"]["200"], 1)
+        self.assertLessEqual(text_metrics["latency_p50"], text_metrics["latency_max"])
+        self.assertEqual(metrics["in_flight"], 0)
+
+        with urllib.request.urlopen(self.url + "/health") as response:
+            self.assertEqual(response.read(), b"ok")
+
+    def test_slow_clients(self) -> None:
+        request_timeout = self.server.request_timeout
+        self.server.request_timeout = 1
+        host, port = self.server.server_address[:2]
+        # More stalled clients than request slots, each having sent part of its body
+        slow_clients = []
+        try:
+            for _ in range(4):
+                slow_client = socket.create_connection((str(host), port))
+                slow_client.sendall(
+                    b"POST /markdown HTTP/1.1\r\nContent-Length: 100\r\n\r\n{"
+                )
+                slow_clients.append(slow_client)
+            # Stalled clients do not take request slots
+            status, _, _ = self._post("/text", self.extract_output_bytes)
+            self.assertEqual(status, 200)
+            for slow_client in slow_clients:
+                response = slow_client.makefile("rb").readline()
+                self.assertIn(b" 408 ", response)
+        finally:
+            self.server.request_timeout = request_timeout
+            for slow_client in slow_clients:
+                slow_client.close()
+        self.assertEqual(self._get_metrics()["in_flight"], 0)
@@ -5,14 +5,18 @@ from unittest import TestCase
 
 from ..convert_output import (
     _construct_table_from_cells,
+    convert_output_multi,
     convert_output_to_items_list_and_relations,
     convert_output_to_markdown,
     convert_output_to_markdown_by_page,
+    convert_output_to_markdown_with_offsets,
     convert_output_to_str,
     convert_output_to_str_by_page,
+    convert_output_to_str_with_offsets,
+    get_offset_spans_in_range,
     table_to_markdown,
 )
-from ..extract_output_models import ContentModel, LocationModel
+from ..extract_output_models import ContentModel, LocationModel, MultiOutputResult
 
 OUTPUT_FILE_PATH = os.path.join(
     os.path.dirname(__file__), "data", "extract_output.json"
@@ -4483,3 +4487,109 @@ class TestMarkdownConversion(TestCase):
             self.assertIn(relation["relation_type"], {"support"})
         # Count should still be 36 (only the "support" relations)
         self.assertEqual(36, len(result.relations))
+
+    def test_convert_output_to_str_with_offsets(self) -> None:
+        for extract_output in (
+            self.extract_output,
+            self.extract_output_hierarchical_v2,
+            self.extract_output_no_locs,
+        ):
+            text_with_offsets = convert_output_to_str_with_offsets(extract_output)
+            self.assertEqual(
+                text_with_offsets.text, convert_output_to_str(extract_output)
+            )
+            items = convert_output_to_items_list_and_relations(
+                extract_output, return_locations=True
+            ).item_list
+            previous_end = -1
+            for offset_span in text_with_offsets.offset_spans:
+                item = items[offset_span.item_index]
+                self.assertEqual(offset_span.content_id, item["content_id"])
+                self.assertEqual(offset_span.locations, item["locations"])
+                start, end = offset_span.start, offset_span.end
+                self.assertEqual(text_with_offsets.text[start:end], item["text"])
+                self.assertGreater(offset_span.start, previous_end)
+                previous_end = offset_span.end
+
+    def test_convert_output_to_markdown_with_offsets(self) -> None:
+        text_with_offsets = convert_output_to_markdown_with_offsets(
+            self.extract_output_hierarchical_v2
+        )
+        self.assertEqual(
+            text_with_offsets.text,
+            convert_output_to_markdown(self.extract_output_hierarchical_v2),
+        )
+        title_span = text_with_offsets.offset_spans[1]
+        start, end = title_span.start, title_span.end
+        self.assertEqual(
+            text_with_offsets.text[start:end], "# Generated Toy File Title"
+        )
+
+    def test_get_offset_spans_in_range(self) -> None:
+        text_with_offsets = convert_output_to_str_with_offsets(self.extract_output)
+        text = text_with_offsets.text
+        offset_spans = text_with_offsets.offset_spans
+        # "2019\ntest noise string at top\nGenerated Toy File Title\n..."
+        self.assertEqual(
+            [span.content_id for span in get_offset_spans_in_range(offset_spans, 0, 2)],
+            ["1"],
+        )
+        # A range over the delimiter between two items
+        self.assertEqual(
+            [span.content_id for span in get_offset_spans_in_range(offset_spans, 2, 7)],
+            ["1", "2"],
+        )
+        # A range only covering a delimiter
+        self.assertEqual(get_offset_spans_in_range(offset_spans, 4, 5), [])
+        quote_start = text.index("Valerie is awesome")
+        quote_spans = get_offset_spans_in_range(
+            offset_spans, quote_start, quote_start + len("Valerie is awesome")
+        )
+        self.assertEqual([span.content_id for span in quote_spans], ["4"])
+        self.assertEqual(
+            [
+                span.content_id
+                for span in get_offset_spans_in_range(offset_spans, 0, 1000000)
+            ],
+            [span.content_id for span in offset_spans],
+        )
+
+    def test_convert_output_multi(self) -> None:
+        extract_outputs = [
+            self.extract_output,
+            self.extract_output_hierarchical_v2,
+            self.extract_output_figure_extraction,
+            self.extract_output_multi_page,
+            self.extract_output_no_locs,
+        ]
+        for extract_output in extract_outputs:
+            result = convert_output_multi(
+                extract_output, ["text", "markdown", "text_by_page", "markdown_by_page"]
+            )
+            self.assertEqual(result.text, convert_output_to_str(extract_output))
+            self.assertEqual(
+                result.markdown, convert_output_to_markdown(extract_output)
+            )
+            self.assertEqual(
+                result.text_by_page, convert_output_to_str_by_page(extract_output)
+            )
+            self.assertEqual(
+                result.markdown_by_page,
+                convert_output_to_markdown_by_page(extract_output),
+            )
+
+        # Formats not requested are None
+        self.assertEqual(
+            convert_output_multi(self.extract_output_multi_page, ["markdown_by_page"]),
+            MultiOutputResult(
+                markdown_by_page=convert_output_to_markdown_by_page(
+                    self.extract_output_multi_page
+                )
+            ),
+        )
+        self.assertEqual(
+            convert_output_multi(self.extract_output, []), MultiOutputResult()
+        )
+
+        with self.assertRaises(ValueError):
+            convert_output_multi(self.extract_output, ["html"])  # type: ignore[list-item]
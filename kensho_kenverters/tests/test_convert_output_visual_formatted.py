@@ -1,9 +1,17 @@
+import copy
 import json
 import os
 from typing import Any, ClassVar
 from unittest import TestCase
 
-from ..convert_output_visual_formatted import convert_output_to_str_formatted
+from ..convert_output_visual_formatted import (
+    _clean_sparse_page,
+    _get_page_canvas_sizes,
+    _rotate_location,
+    _write_to_sparse_row,
+    convert_output_to_str_formatted,
+)
+from ..extract_output_models import LocationModel, PDFPageModel
 
 OUTPUT_FILE_PATH = os.path.join(
     os.path.dirname(__file__), "data", "extract_output.json"
@@ -46,3 +54,84 @@ class TestVisuallyFormattedText(TestCase):
         with open(EXPECTED_RESIZED_TXT_FILE_PATH, "r") as f:
             expected_converted_text = f.read()
         self.assertEqual(converted_text[0], expected_converted_text)
+
+    def test_convert_output_to_str_formatted_same_size_pdf_pages(self) -> None:
+        # A single upright page uses the full canvas, so the output is unchanged
+        extract_output = copy.deepcopy(self.extract_output)
+        extract_output["pdf_pages"] = [
+            {"height": 841.89, "width": 595.276, "required_ccw_rotation": 0}
+        ]
+        converted_text = convert_output_to_str_formatted(extract_output)
+        self.assertEqual(converted_text[0], self.expected_converted_text)
+
+    def test_convert_output_to_str_formatted_rotated_page(self) -> None:
+        extract_output = copy.deepcopy(self.extract_output)
+        extract_output["pdf_pages"] = [
+            {"height": 841.89, "width": 595.276, "required_ccw_rotation": 180}
+        ]
+        converted_text = convert_output_to_str_formatted(extract_output)
+        self.assertNotEqual(converted_text[0], self.expected_converted_text)
+        # Rotating upside down reverses the order of the lines
+        lines = [line for line in converted_text[0].split("\n") if line.strip()]
+        self.assertIn("Generated Toy File Title", lines[-3])
+        self.assertIn("test noise string at top", lines[-2])
+
+    def test_get_page_canvas_sizes(self) -> None:
+        pdf_pages = [
+            PDFPageModel(height=800, width=600, required_ccw_rotation=0),
+            PDFPageModel(height=600, width=800, required_ccw_rotation=0),
+            PDFPageModel(height=800, width=600, required_ccw_rotation=90),
+        ]
+        canvas_sizes = _get_page_canvas_sizes(pdf_pages, 400, 100)
+        self.assertEqual(canvas_sizes, {0: (300, 100), 1: (400, 75), 2: (400, 75)})
+        self.assertEqual(_get_page_canvas_sizes(None, 400, 100), {})
+
+    def test_rotate_location(self) -> None:
+        location = LocationModel(height=0.1, width=0.2, x=0.1, y=0.3, page_number=2)
+        self.assertEqual(_rotate_location(location, 0), location)
+        expected_rotations = {
+            90: (0.2, 0.1, 0.3, 0.7),
+            180: (0.1, 0.2, 0.7, 0.6),
+            270: (0.2, 0.1, 0.6, 0.1),
+        }
+        for rotation, expected in expected_rotations.items():
+            rotated = _rotate_location(location, rotation)
+            actual = (rotated.height, rotated.width, rotated.x, rotated.y)
+            for actual_value, expected_value in zip(actual, expected):
+                self.assertAlmostEqual(actual_value, expected_value)
+            self.assertEqual(rotated.page_number, 2)
+        # Rotating all the way around returns the original location
+        rotated = location
+        for _ in range(4):
+            rotated = _rotate_location(rotated, 90)
+        self.assertAlmostEqual(rotated.x, location.x)
+        self.assertAlmostEqual(rotated.y, location.y)
+        with self.assertRaises(ValueError):
+            _rotate_location(location, 45)
+
+    def test_write_to_sparse_row(self) -> None:
+        row = _write_to_sparse_row([], 4, "  ab cd  ")
+        self.assertEqual(row, [(6, "ab cd")])
+        # Writing blanks over part of the text clears it
+        row = _write_to_sparse_row(row, 8, "   ")
+        self.assertEqual(row, [(6, "ab")])
+        # Overlapping text overwrites, non-overlapping text is kept
+        row = _write_to_sparse_row(row, 0, "xyz")
+        row = _write_to_sparse_row(row, 7, "QR")
+        self.assertEqual(row, [(0, "xyz"), (6, "a"), (7, "QR")])
+        # Text around an overwritten area is split into two intervals
+        row = _write_to_sparse_row([(0, "abcdefgh")], 3, " ")
+        self.assertEqual(row, [(0, "abc"), (4, "efgh")])
+
+    def test_clean_sparse_page(self) -> None:
+        sparse_page = {
+            2: [(4, "Title")],
+            3: [(6, "a"), (10, "b")],
+            7: [(8, "end")],
+        }
+        expected_lines = ["", "Title", "  a   b", "", "    end"]
+        self.assertEqual(
+            _clean_sparse_page(sparse_page),
+            "\n".join(expected_lines) + "\n" + "=" * 87,
+        )
+        self.assertEqual(_clean_sparse_page({}), "\n" + "=" * 87)
@@ -0,0 +1,185 @@
+import json
+import os
+import sqlite3
+import tempfile
+from typing import Any, ClassVar
+from unittest import TestCase
+
+from ..convert_output import convert_output_to_items_list_and_relations
+from ..corpus_store import CorpusStore, load_documents_to_sqlite
+from ..output_to_tables import build_table_grids
+
+OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output.json"
+)
+FIGURE_EXTRACTED_TABLE_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_figure_extraction.json"
+)
+MULTI_PAGE_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "output_multi_page_locs.json"
+)
+ITEM_RELATIONS_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_item_relations.json"
+)
+
+
+class TestCorpusStore(TestCase):
+    extract_output: ClassVar[dict[str, Any]]
+    extract_output_figure_extraction: ClassVar[dict[str, Any]]
+    extract_output_multi_page: ClassVar[dict[str, Any]]
+    extract_output_item_relations: ClassVar[dict[str, Any]]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output = json.load(f)
+        with open(FIGURE_EXTRACTED_TABLE_OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output_figure_extraction = json.load(f)
+        with open(MULTI_PAGE_OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output_multi_page = json.load(f)
+        with open(ITEM_RELATIONS_OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output_item_relations = json.load(f)
+
+    def test_load_documents_to_sqlite(self) -> None:
+        documents = {
+            "base": self.extract_output,
+            "figure": self.extract_output_figure_extraction,
+            "multi_page": self.extract_output_multi_page,
+            "relations": self.extract_output_item_relations,
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            database_path = os.path.join(directory, "corpus.db")
+            # Small batches to insert rows of several documents in the same batch
+            num_items = load_documents_to_sqlite(documents, database_path, batch_size=7)
+            connection = sqlite3.connect(database_path)
+            self.assertEqual(
+                connection.execute("PRAGMA journal_mode").fetchone()[0], "wal"
+            )
+            expected_num_items = 0
+            for document_id, document in documents.items():
+                result = convert_output_to_items_list_and_relations(
+                    document, return_locations=True, return_relations=True
+                )
+                items = result.item_list
+                expected_num_items += len(items)
+                self.assertEqual(
+                    connection.execute(
+                        "SELECT content_id, category, text, page_number FROM items "
+                        "WHERE document_id = ? ORDER BY item_index",
+                        (document_id,),
+                    ).fetchall(),
+                    [
+                        (
+                            item["content_id"],
+                            item["category"],
+                            item["text"],
+                            (
+                                item["locations"][0].page_number
+                                if item["locations"]
+                                else None
+                            ),
+                        )
+                        for item in items
+                    ],
+                )
+                self.assertEqual(
+                    connection.execute(
+                        "SELECT relation_type, source_content_id, target_content_id "
+                        "FROM relations WHERE document_id = ? "
+                        "ORDER BY source_content_id, target_content_id",
+                        (document_id,),
+                    ).fetchall(),
+                    sorted(
+                        (
+                            relation["relation_type"],
+                            relation["source_content_id"],
+                            relation["target_content_id"],
+                        )
+                        for relation in result.relations or []
+                    ),
+                )
+                for item in items:
+                    self.assertEqual(
+                        connection.execute(
+                            "SELECT page_number, x, y, width, height FROM locations "
+                            "WHERE document_id = ? AND content_id = ? "
+                            "ORDER BY location_index",
+                            (document_id, item["content_id"]),
+                        ).fetchall(),
+                        [
+                            (
+                                location.page_number,
+                                location.x,
+                                location.y,
+                                location.width,
+                                location.height,
+                            )
+                            for location in item["locations"] or []
+                        ],
+                    )
+
+                # The cells fill the table grids without duplicating merged cells
+                for table_uid, table_grid_structure in build_table_grids(
+                    document, duplicate_merged_cells_content_flag=False
+                ).items():
+                    grid = [
+                        [cell_text.strip() for cell_text in row]
+                        for row in table_grid_structure.table_string_grid
+                    ]
+                    for row_index, col_index, cell_text in connection.execute(
+                        "SELECT row_index, col_index, text FROM table_cells "
+                        "WHERE document_id = ? AND table_uid = ?",
+                        (document_id, table_uid),
+                    ):
+                        self.assertEqual(grid[row_index][col_index], cell_text)
+            self.assertEqual(num_items, expected_num_items)
+            self.assertEqual(
+                connection.execute("SELECT SUM(num_items) FROM documents").fetchone()[
+                    0
+                ],
+                expected_num_items,
+            )
+            self.assertGreater(
+                connection.execute("SELECT COUNT(*) FROM relations").fetchone()[0], 0
+            )
+            self.assertGreater(
+                connection.execute("SELECT COUNT(*) FROM table_cells").fetchone()[0], 0
+            )
+            # Cross-document queries use the indexes
+            query_plan = " ".join(
+                row[-1]
+                for row in connection.execute(
+                    "EXPLAIN QUERY PLAN SELECT document_id, content_id FROM items "
+                    "WHERE category = 'table'"
+                )
+            )
+            self.assertIn("items_category", query_plan)
+            connection.close()
+
+    def test_replace_documents(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            database_path = os.path.join(directory, "corpus.db")
+            with CorpusStore(database_path) as corpus_store:
+                num_items = corpus_store.add_document(self.extract_output, "doc")
+                # Replaced, also when added twice in the same call
+                self.assertEqual(
+                    corpus_store.add_documents(
+                        [("doc", self.extract_output), ("doc", self.extract_output)]
+                    ),
+                    2 * num_items,
+                )
+                corpus_store.add_document(self.extract_output_multi_page, "other")
+                self.assertEqual(corpus_store.get_document_ids(), ["doc", "other"])
+                self.assertEqual(
+                    corpus_store.connection.execute(
+                        "SELECT COUNT(*) FROM items WHERE document_id = 'doc'"
+                    ).fetchone()[0],
+                    num_items,
+                )
+
+                # Failed calls add no documents
+                with self.assertRaises(ValueError):
+                    corpus_store.add_documents(
+                        [("new", self.extract_output), ("bad", None)]  # type: ignore[list-item]
+                    )
+                self.assertEqual(corpus_store.get_document_ids(), ["doc", "other"])
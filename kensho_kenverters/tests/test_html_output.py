@@ -0,0 +1,185 @@
+import io
+import json
+import os
+from html.parser import HTMLParser
+from typing import Any, ClassVar
+from unittest import TestCase
+
+from ..constants import TABLE_CONTENT_CATEGORIES
+from ..convert_output import convert_output_to_items_list_and_relations
+from ..html_output import convert_output_to_html, write_output_html
+from ..output_to_tables import build_table_grids
+
+OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output.json"
+)
+HIERARCHICAL_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_hierarchical.json"
+)
+HIERARCHICAL_v2_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_hierarchical_v2.json"
+)
+FIGURE_EXTRACTED_TABLE_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_figure_extraction.json"
+)
+MULTI_PAGE_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "output_multi_page_locs.json"
+)
+OUTPUT_NO_LOCS_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_no_locs.json"
+)
+
+
+class _TableGridParser(HTMLParser):
+    """Parse the HTML tables into grids, copying merged cells to every position they span."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.grids: list[list[list[str]]] = []
+        self._cell: tuple[int, int, list[str]] | None = None
+        self._occupied: dict[tuple[int, int], str] = {}
+        self._row = -1
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag == "table":
+            self._occupied = {}
+            self._row = -1
+        elif tag == "tr":
+            self._row += 1
+        elif tag in ("td", "th"):
+            attributes = dict(attrs)
+            self._cell = (
+                int(attributes.get("rowspan") or 1),
+                int(attributes.get("colspan") or 1),
+                [],
+            )
+
+    def handle_data(self, data: str) -> None:
+        if self._cell is not None:
+            self._cell[2].append(data)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in ("td", "th") and self._cell is not None:
+            row_span, col_span, texts = self._cell
+            col = 0
+            while (self._row, col) in self._occupied:
+                col += 1
+            for row_offset in range(row_span):
+                for col_offset in range(col_span):
+                    self._occupied[(self._row + row_offset, col + col_offset)] = (
+                        "".join(texts)
+                    )
+            self._cell = None
+        elif tag == "table":
+            n_rows = max(row for row, _ in self._occupied) + 1
+            n_cols = max(col for _, col in self._occupied) + 1
+            self.grids.append(
+                [
+                    [self._occupied.get((row, col), "") for col in range(n_cols)]
+                    for row in range(n_rows)
+                ]
+            )
+
+
+class TestHtmlOutput(TestCase):
+    extract_output: ClassVar[dict[str, Any]]
+    extract_output_hierarchical: ClassVar[dict[str, Any]]
+    extract_output_hierarchical_v2: ClassVar[dict[str, Any]]
+    extract_output_figure_extraction: ClassVar[dict[str, Any]]
+    extract_output_multi_page: ClassVar[dict[str, Any]]
+    extract_output_no_locs: ClassVar[dict[str, Any]]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output = json.load(f)
+        with open(HIERARCHICAL_OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output_hierarchical = json.load(f)
+        with open(HIERARCHICAL_v2_OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output_hierarchical_v2 = json.load(f)
+        with open(FIGURE_EXTRACTED_TABLE_OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output_figure_extraction = json.load(f)
+        with open(MULTI_PAGE_OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output_multi_page = json.load(f)
+        with open(OUTPUT_NO_LOCS_FILE_PATH, "r") as f:
+            cls.extract_output_no_locs = json.load(f)
+
+    def test_convert_output_to_html(self) -> None:
+        html_text = convert_output_to_html(self.extract_output)
+        self.assertTrue(html_text.startswith("<!DOCTYPE html>\n<html>"))
+        self.assertTrue(html_text.endswith("</body>\n</html>\n"))
+        self.assertIn(
+            '<section data-page-number="0">\n<p>2019</p>\n<p>test noise string at top</p>\n'
+            "<h1>Generated Toy File Title</h1>\n",
+            html_text,
+        )
+        self.assertIn(
+            "<table>\n<tr><th>Kensho Revenue in millions $</th><th>Q1</th><th>Q2</th>",
+            html_text,
+        )
+
+        body_html = convert_output_to_html(self.extract_output, full_document=False)
+        self.assertTrue(body_html.startswith('<section data-page-number="0">\n'))
+        self.assertTrue(body_html.endswith("</section>\n"))
+
+        # Headings keep their level
+        hierarchical_html = convert_output_to_html(self.extract_output_hierarchical)
+        # H1, H2, and table titles as H3
+        for heading_tag in ["<h1>", "<h2>", "<h3>"]:
+            self.assertIn(heading_tag, hierarchical_html)
+
+        # Documents without locations are not split into pages
+        no_locs_html = convert_output_to_html(
+            self.extract_output_no_locs, full_document=False
+        )
+        self.assertNotIn("<section", no_locs_html)
+        self.assertIn("<h1>Generated Toy File Title</h1>", no_locs_html)
+
+    def test_tables(self) -> None:
+        extract_outputs = [
+            self.extract_output,
+            self.extract_output_hierarchical,
+            self.extract_output_figure_extraction,
+            self.extract_output_multi_page,
+        ]
+        num_merged_cells = 0
+        for extract_output in extract_outputs:
+            html_text = convert_output_to_html(extract_output)
+            num_merged_cells += html_text.count("colspan=") + html_text.count(
+                "rowspan="
+            )
+            parser = _TableGridParser()
+            parser.feed(html_text)
+            table_grids = build_table_grids(extract_output)
+            expected_grids = [
+                [
+                    [cell.strip() for cell in row]
+                    for row in table_grids[item["content_id"]].table_string_grid
+                ]
+                for item in convert_output_to_items_list_and_relations(
+                    extract_output
+                ).item_list
+                if item["category"].upper() in TABLE_CONTENT_CATEGORIES
+            ]
+            self.assertEqual(parser.grids, expected_grids)
+        self.assertGreater(num_merged_cells, 0)
+
+    def test_write_output_html(self) -> None:
+        class _FlushCountingStream(io.StringIO):
+            num_flushes = 0
+
+            def flush(self) -> None:
+                self.num_flushes += 1
+                super().flush()
+
+        stream = _FlushCountingStream()
+        write_output_html(self.extract_output_multi_page, stream)
+        html_text = stream.getvalue()
+        self.assertEqual(
+            html_text, convert_output_to_html(self.extract_output_multi_page)
+        )
+        num_pages = html_text.count("<section ")
+        self.assertGreater(num_pages, 1)
+        self.assertEqual(html_text.count("</section>"), num_pages)
+        # Flushed after every page
+        self.assertEqual(stream.num_flushes, num_pages)
@@ -0,0 +1,125 @@
+import io
+import json
+import os
+import tempfile
+from typing import Any, ClassVar
+from unittest import TestCase
+from unittest.mock import patch
+
+from pydantic_core import to_json
+
+from ..convert_output import convert_output_to_items_list_and_relations
+from ..jsonl_export import DOCUMENT_ID_KEY, JsonlItemWriter, export_items_to_jsonl
+from ..utils import load_output_to_pydantic
+
+OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output.json"
+)
+FIGURE_EXTRACTED_TABLE_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_figure_extraction.json"
+)
+OUTPUT_NO_LOCS_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_no_locs.json"
+)
+
+
+def _get_expected_lines(extract_output: dict[str, Any]) -> list[dict[str, Any]]:
+    """Get the items of a document as they are expected in JSON lines."""
+    items = convert_output_to_items_list_and_relations(
+        extract_output, return_locations=True
+    ).item_list
+    return [json.loads(to_json(item)) for item in items]
+
+
+def _read_lines(jsonl_bytes: bytes) -> list[dict[str, Any]]:
+    return [json.loads(line) for line in jsonl_bytes.splitlines()]
+
+
+class TestJsonlExport(TestCase):
+    extract_output: ClassVar[dict[str, Any]]
+    extract_output_figure_extraction: ClassVar[dict[str, Any]]
+    extract_output_no_locs: ClassVar[dict[str, Any]]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output = json.load(f)
+        with open(FIGURE_EXTRACTED_TABLE_OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output_figure_extraction = json.load(f)
+        with open(OUTPUT_NO_LOCS_FILE_PATH, "r") as f:
+            cls.extract_output_no_locs = json.load(f)
+
+    def test_write_document(self) -> None:
+        stream = io.BytesIO()
+        with JsonlItemWriter(stream) as writer:
+            num_lines = writer.write_document(self.extract_output)
+        lines = _read_lines(stream.getvalue())
+        self.assertEqual(lines, _get_expected_lines(self.extract_output))
+        self.assertEqual(num_lines, len(lines))
+        self.assertEqual(set(lines[0]), {"content_id", "category", "text", "locations"})
+        self.assertTrue(any("table" in line for line in lines))
+
+        # Compact locations are written with the same values
+        stream = io.BytesIO()
+        with JsonlItemWriter(stream) as writer:
+            writer.write_document(
+                load_output_to_pydantic(self.extract_output, compact_locations=True)
+            )
+        self.assertEqual(
+            _read_lines(stream.getvalue()), _get_expected_lines(self.extract_output)
+        )
+
+        # Documents without locations
+        stream = io.BytesIO()
+        with JsonlItemWriter(stream) as writer:
+            writer.write_document(self.extract_output_no_locs)
+        self.assertEqual(
+            _read_lines(stream.getvalue()),
+            _get_expected_lines(self.extract_output_no_locs),
+        )
+
+    def test_export_items_to_jsonl(self) -> None:
+        documents = {
+            "first": self.extract_output,
+            "second": self.extract_output_figure_extraction,
+        }
+        expected_lines = [
+            {DOCUMENT_ID_KEY: document_id, **line}
+            for document_id, extract_output in documents.items()
+            for line in _get_expected_lines(extract_output)
+        ]
+        # A small buffer is written many times, and the fallback encoder gives the same lines
+        for buffer_size in [1, 1 << 20]:
+            for use_fallback_encoder in [False, True]:
+                stream = io.BytesIO()
+                if use_fallback_encoder:
+                    with patch(
+                        "kensho_kenverters.jsonl_export._get_encoder",
+                        return_value=to_json,
+                    ):
+                        num_lines = export_items_to_jsonl(
+                            documents, stream, buffer_size=buffer_size
+                        )
+                else:
+                    num_lines = export_items_to_jsonl(
+                        documents, stream, buffer_size=buffer_size
+                    )
+                self.assertEqual(_read_lines(stream.getvalue()), expected_lines)
+                self.assertEqual(num_lines, len(expected_lines))
+
+        # Documents without ids, written to a file
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "items.jsonl")
+            export_items_to_jsonl(documents.values(), file_path)
+            with open(file_path, "rb") as f:
+                self.assertEqual(
+                    _read_lines(f.read()),
+                    [
+                        {
+                            key: value
+                            for key, value in line.items()
+                            if key != DOCUMENT_ID_KEY
+                        }
+                        for line in expected_lines
+                    ],
+                )
@@ -0,0 +1,159 @@
+import json
+import os
+from typing import Any, ClassVar
+from unittest import TestCase
+
+from ..constants import ChunkBudgetUnitType
+from ..convert_output import convert_output_to_markdown, convert_output_to_str
+from ..output_to_chunks import (
+    _split_table_rows,
+    _split_text,
+    generate_chunks_from_output,
+)
+
+OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output.json"
+)
+MULTI_PAGE_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "output_multi_page_locs.json"
+)
+OUTPUT_NO_LOCS_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_no_locs.json"
+)
+
+TABLE_HEADER = (
+    "\n| Kensho Revenue in millions $ | Q1 | Q2 | Q3 | Q4 |"
+    "\n| --- | --- | --- | --- | --- |\n"
+)
+
+
+class TestChunks(TestCase):
+    extract_output: ClassVar[dict[str, Any]]
+    extract_output_multi_page: ClassVar[dict[str, Any]]
+    extract_output_no_locs: ClassVar[dict[str, Any]]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output = json.load(f)
+        with open(MULTI_PAGE_OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output_multi_page = json.load(f)
+        with open(OUTPUT_NO_LOCS_FILE_PATH, "r") as f:
+            cls.extract_output_no_locs = json.load(f)
+
+    def test_generate_chunks_from_output_large_budget(self) -> None:
+        # With a budget larger than the document, chunks are the sections
+        chunks = list(generate_chunks_from_output(self.extract_output, 100000))
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(
+            "\n".join(chunk.text for chunk in chunks),
+            convert_output_to_markdown(self.extract_output),
+        )
+        self.assertEqual(chunks[0].content_ids, ["1", "2"])
+        self.assertEqual(chunks[0].page_numbers, [0])
+        self.assertEqual(
+            chunks[0].locations,
+            [
+                {
+                    "height": 0.01425,
+                    "width": 0.05043,
+                    "x": 0.20001,
+                    "y": 0.0137,
+                    "page_number": 0,
+                },
+                {
+                    "height": 0.01425,
+                    "width": 0.20281,
+                    "x": 0.29527,
+                    "y": 0.0137,
+                    "page_number": 0,
+                },
+            ],
+        )
+        self.assertEqual(chunks[2].content_ids, ["5", "6", "32"])
+
+    def test_generate_chunks_from_output_plain_text(self) -> None:
+        chunks = generate_chunks_from_output(
+            self.extract_output, 100000, use_markdown=False
+        )
+        self.assertEqual(
+            "\n".join(chunk.text for chunk in chunks),
+            convert_output_to_str(self.extract_output),
+        )
+
+    def test_generate_chunks_from_output_budget(self) -> None:
+        budgets: list[tuple[int, ChunkBudgetUnitType, int]] = [
+            (200, "characters", 200),
+            (40, "tokens", 160),
+        ]
+        for budget, budget_unit, max_chars in budgets:
+            chunks = list(
+                generate_chunks_from_output(
+                    self.extract_output, budget, budget_unit=budget_unit
+                )
+            )
+            for chunk in chunks:
+                self.assertLessEqual(len(chunk.text), max_chars)
+                self.assertEqual(chunk.page_numbers, [0])
+            # No words are lost when splitting texts
+            chunk_words = " ".join(chunk.text for chunk in chunks).split()
+            table_free_words = [
+                word for word in chunk_words if word not in TABLE_HEADER.split()
+            ]
+            self.assertIn("analytics.", table_free_words)
+            self.assertEqual(
+                table_free_words.count("Machine"),
+                convert_output_to_str(self.extract_output).split().count("Machine"),
+            )
+
+    def test_generate_chunks_from_output_splits_tables(self) -> None:
+        chunks = list(generate_chunks_from_output(self.extract_output, 140))
+        table_chunks = [chunk for chunk in chunks if chunk.content_ids == ["6"]]
+        self.assertEqual(len(table_chunks), 4)
+        for chunk, year in zip(table_chunks, ("2020", "2021", "2022", "2023")):
+            self.assertTrue(chunk.text.startswith(TABLE_HEADER))
+            self.assertIn(f"| {year} |", chunk.text)
+            # One box for the header row and one box for the body row
+            self.assertEqual(len(chunk.locations), 2)
+        header_location, row_location = table_chunks[-1].locations
+        assert header_location is not None and row_location is not None
+        self.assertAlmostEqual(header_location["y"], 0.40464)
+        self.assertAlmostEqual(row_location["y"], 0.48464)
+        self.assertAlmostEqual(row_location["height"], 0.01188)
+
+    def test_generate_chunks_from_output_multi_page(self) -> None:
+        chunks = list(generate_chunks_from_output(self.extract_output_multi_page, 500))
+        page_numbers = {
+            page_number for chunk in chunks for page_number in chunk.page_numbers
+        }
+        self.assertGreater(len(page_numbers), 1)
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk.text), 500)
+
+    def test_generate_chunks_from_output_no_locs(self) -> None:
+        chunks = list(generate_chunks_from_output(self.extract_output_no_locs, 200))
+        self.assertGreater(len(chunks), 0)
+        for chunk in chunks:
+            self.assertEqual(chunk.locations, [])
+            self.assertEqual(chunk.page_numbers, [])
+
+    def test_generate_chunks_from_output_invalid_budget(self) -> None:
+        with self.assertRaises(ValueError):
+            generate_chunks_from_output(self.extract_output, 0)
+        with self.assertRaises(ValueError):
+            generate_chunks_from_output(
+                self.extract_output, 10, budget_unit="words"  # type: ignore[arg-type]
+            )
+
+    def test_split_text(self) -> None:
+        self.assertEqual(
+            _split_text("aa bb cc dddddddd e", 5), ["aa bb", "cc", "ddddd", "ddd e"]
+        )
+        self.assertEqual(_split_text("", 5), [])
+
+    def test_split_table_rows(self) -> None:
+        table = [["a", "b"], ["1", "2"], ["3", "4"], ["5", "6"]]
+        # The header takes 2 + 2 * 9 + 1 = 21 characters and every row takes 10
+        self.assertEqual(_split_table_rows(table, 41), [(1, 3), (3, 4)])
+        self.assertEqual(_split_table_rows(table, 1), [(1, 2), (2, 3), (3, 4)])
+        self.assertEqual(_split_table_rows(table, 1000), [(1, 4)])
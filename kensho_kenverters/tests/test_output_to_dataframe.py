@@ -0,0 +1,125 @@
+import json
+import math
+import os
+from typing import Any, ClassVar
+from unittest import TestCase
+
+from ..convert_output import convert_output_to_items_list_and_relations
+from ..output_to_dataframe import ITEMS_DF_COLUMNS, convert_output_to_items_df
+from ..output_to_tables import build_table_grids
+
+HIERARCHICAL_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_hierarchical.json"
+)
+MULTI_PAGE_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "output_multi_page_locs.json"
+)
+ITEM_RELATIONS_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_item_relations.json"
+)
+
+
+class TestOutputToDataFrame(TestCase):
+    extract_output_hierarchical: ClassVar[dict[str, Any]]
+    extract_output_multi_page: ClassVar[dict[str, Any]]
+    extract_output_item_relations: ClassVar[dict[str, Any]]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(HIERARCHICAL_OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output_hierarchical = json.load(f)
+        with open(MULTI_PAGE_OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output_multi_page = json.load(f)
+        with open(ITEM_RELATIONS_OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output_item_relations = json.load(f)
+
+    def test_convert_output_to_items_df(self) -> None:
+        extract_outputs = [
+            self.extract_output_hierarchical,
+            self.extract_output_multi_page,
+            self.extract_output_item_relations,
+        ]
+        for extract_output in extract_outputs:
+            items_df = convert_output_to_items_df(extract_output)
+            items = convert_output_to_items_list_and_relations(
+                extract_output, return_locations=True
+            ).item_list
+            self.assertEqual(list(items_df.columns), ITEMS_DF_COLUMNS)
+            self.assertEqual(
+                list(items_df["content_id"]), [item["content_id"] for item in items]
+            )
+            self.assertEqual(
+                list(items_df["category"]), [item["category"] for item in items]
+            )
+            self.assertEqual(list(items_df["text"]), [item["text"] for item in items])
+
+            # Table uids are the keys of the table grids
+            table_uids = items_df["table_uid"].dropna()
+            self.assertEqual(
+                list(table_uids),
+                list(items_df.loc[items_df["category"] == "table", "content_id"]),
+            )
+            self.assertTrue(set(table_uids) <= set(build_table_grids(extract_output)))
+
+            for item, page_number, x, y, width, height in zip(
+                items,
+                items_df["page_number"],
+                items_df["x"],
+                items_df["y"],
+                items_df["width"],
+                items_df["height"],
+            ):
+                if not item["locations"]:
+                    self.assertTrue(math.isnan(x))
+                    continue
+                first_page_locations = [
+                    location
+                    for location in item["locations"]
+                    if location.page_number == item["locations"][0].page_number
+                ]
+                self.assertEqual(page_number, item["locations"][0].page_number)
+                self.assertAlmostEqual(
+                    x, min(location.x for location in first_page_locations)
+                )
+                self.assertAlmostEqual(
+                    y, min(location.y for location in first_page_locations)
+                )
+                self.assertAlmostEqual(
+                    x + width,
+                    max(
+                        location.x + location.width for location in first_page_locations
+                    ),
+                )
+                self.assertAlmostEqual(
+                    y + height,
+                    max(
+                        location.y + location.height
+                        for location in first_page_locations
+                    ),
+                )
+
+    def test_parents_and_queries(self) -> None:
+        items_df = convert_output_to_items_df(self.extract_output_hierarchical)
+        items_by_id = items_df.set_index("content_id")
+        # Top level items are children of the DOCUMENT root
+        self.assertEqual(items_by_id.loc["1", "parent_content_id"], "0")
+        self.assertEqual(items_by_id.loc["1", "depth"], 1)
+        # Texts nested in a section
+        self.assertEqual(items_by_id.loc["4", "parent_content_id"], "3")
+        self.assertEqual(items_by_id.loc["4", "depth"], 2)
+        # No locations in this output
+        self.assertTrue(items_df["page_number"].isna().all())
+
+        items_df = convert_output_to_items_df(self.extract_output_multi_page)
+        self.assertGreater(items_df["page_number"].max(), 0)
+        self.assertTrue((items_df["last_page_number"] >= items_df["page_number"]).all())
+        wide_texts_after_first_page = items_df[
+            (items_df["category"] == "text")
+            & (items_df["page_number"] >= 1)
+            & (items_df["width"] > 0.5)
+        ]
+        self.assertGreater(len(wide_texts_after_first_page), 0)
+        self.assertEqual(
+            set(wide_texts_after_first_page["category"].astype(str)), {"text"}
+        )
+        self.assertTrue((wide_texts_after_first_page["width"] > 0.5).all())
@@ -3,7 +3,8 @@ import os
 from typing import Any, ClassVar
 from unittest import TestCase
 
-from ..output_to_sections import extract_organized_sections
+from ..extract_output_models import SectionNode
+from ..output_to_sections import extract_organized_sections, extract_section_tree
 
 OUTPUT_FILE_PATH = os.path.join(
     os.path.dirname(__file__), "data", "extract_output.json"
@@ -2069,3 +2070,107 @@ class TestMarkdownConversion(TestCase):
             [{"content_id": "34", "category": "title", "text": "Recommendation: BUY"}],
         ]
         self.assertEqual(sections, expected_sections)
+
+    def test_extract_section_tree(self) -> None:
+        categories = [
+            "TEXT",
+            "TITLE",
+            "H1",
+            "TEXT",
+            "H2",
+            "H3",
+            "TEXT",
+            "H2",
+            "H1",
+            "H5",
+        ]
+        serialized_document = {
+            "annotations": [],
+            "content_tree": {
+                "uid": "0",
+                "type": "DOCUMENT",
+                "content": None,
+                "children": [
+                    {
+                        "uid": str(index + 1),
+                        "type": category,
+                        "content": f"{category} {index}",
+                        "children": [],
+                    }
+                    for index, category in enumerate(categories)
+                ],
+            },
+        }
+        section_tree = extract_section_tree(serialized_document)
+        self.assertEqual(len(section_tree.item_list), len(categories))
+        expected_root = SectionNode(
+            heading_level=-1,
+            heading_index=None,
+            start_index=0,
+            end_index=10,
+            children=[
+                SectionNode(
+                    heading_level=0,
+                    heading_index=1,
+                    start_index=1,
+                    end_index=10,
+                    children=[
+                        SectionNode(
+                            heading_level=1,
+                            heading_index=2,
+                            start_index=2,
+                            end_index=8,
+                            children=[
+                                SectionNode(
+                                    heading_level=2,
+                                    heading_index=4,
+                                    start_index=4,
+                                    end_index=7,
+                                    children=[
+                                        SectionNode(
+                                            heading_level=3,
+                                            heading_index=5,
+                                            start_index=5,
+                                            end_index=7,
+                                        )
+                                    ],
+                                ),
+                                SectionNode(
+                                    heading_level=2,
+                                    heading_index=7,
+                                    start_index=7,
+                                    end_index=8,
+                                ),
+                            ],
+                        ),
+                        SectionNode(
+                            heading_level=1,
+                            heading_index=8,
+                            start_index=8,
+                            end_index=10,
+                            children=[
+                                SectionNode(
+                                    heading_level=5,
+                                    heading_index=9,
+                                    start_index=9,
+                                    end_index=10,
+                                )
+                            ],
+                        ),
+                    ],
+                )
+            ],
+        )
+        self.assertEqual(section_tree.root, expected_root)
+
+    def test_extract_section_tree_matches_organized_sections(self) -> None:
+        # Without H1-H5, top level sections are the same as the organized sections
+        section_tree = extract_section_tree(self.extract_output)
+        item_list = section_tree.item_list
+        top_level_sections = section_tree.root.children
+        sections = [item_list[: top_level_sections[0].start_index]]
+        for section in top_level_sections:
+            start_index, end_index = section.start_index, section.end_index
+            sections.append(item_list[start_index:end_index])
+            self.assertEqual(section.children, [])
+        self.assertEqual(sections, extract_organized_sections(self.extract_output))
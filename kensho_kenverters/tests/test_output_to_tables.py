@@ -14,11 +14,15 @@ from ..output_to_tables import (
     build_table_grids,
     extract_pd_dfs_from_output,
     extract_pd_dfs_with_locs_and_table_structure_from_output,
+    iter_table_grids,
 )
 
 OUTPUT_FILE_PATH = os.path.join(
     os.path.dirname(__file__), "data", "extract_output.json"
 )
+FIGURE_EXTRACTED_TABLE_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_figure_extraction.json"
+)
 
 
 class TestTableExtraction(TestCase):
@@ -440,6 +444,34 @@ class TestTableExtraction(TestCase):
         # Assert the tables are equal (logic for the tables is the same in the two fns)
         self.assertEqual(table_no_locs.to_csv(), table.df.to_csv())
 
+    def test_iter_table_grids(self) -> None:
+        with open(FIGURE_EXTRACTED_TABLE_OUTPUT_FILE_PATH, "r") as f:
+            extract_output = json.load(f)
+        table_grids = build_table_grids(
+            extract_output, duplicate_merged_cells_content_flag=False
+        )
+        self.assertEqual(
+            list(
+                iter_table_grids(
+                    extract_output, duplicate_merged_cells_content_flag=False
+                )
+            ),
+            list(table_grids.items()),
+        )
+        self.assertEqual(
+            [
+                table_uid
+                for table_uid, _ in iter_table_grids(
+                    extract_output, include_figure_extracted_table=False
+                )
+            ],
+            [
+                table_uid
+                for table_uid, table_grid in table_grids.items()
+                if table_grid.table_category_type != "FIGURE_EXTRACTED_TABLE"
+            ],
+        )
+
     def test_empty_tables(self) -> None:
         # Test that tables with no cells don't crash the code
         output_with_empty_table = {
@@ -0,0 +1,109 @@
+import json
+import os
+from typing import Any, ClassVar
+from unittest import TestCase
+
+from ..convert_output import (
+    convert_output_to_items_list_and_relations,
+    convert_output_to_markdown,
+    convert_output_to_str,
+    convert_output_with_renderer,
+)
+from ..renderers import (
+    _RENDERERS,
+    HTML_RENDERER,
+    MARKDOWN_RENDERER,
+    get_renderer,
+    register_renderer,
+    table_to_html,
+)
+
+OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output.json"
+)
+HIERARCHICAL_v2_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_hierarchical_v2.json"
+)
+
+
+class TestRenderers(TestCase):
+    extract_output: ClassVar[dict[str, Any]]
+    extract_output_hierarchical_v2: ClassVar[dict[str, Any]]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output = json.load(f)
+        with open(HIERARCHICAL_v2_OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output_hierarchical_v2 = json.load(f)
+
+    def test_convert_output_with_renderer(self) -> None:
+        for extract_output in [
+            self.extract_output,
+            self.extract_output_hierarchical_v2,
+        ]:
+            self.assertEqual(
+                convert_output_with_renderer(extract_output, "text"),
+                convert_output_to_str(extract_output),
+            )
+            self.assertEqual(
+                convert_output_with_renderer(extract_output, MARKDOWN_RENDERER),
+                convert_output_to_markdown(extract_output),
+            )
+        with self.assertRaises(ValueError):
+            convert_output_with_renderer(self.extract_output, "unknown")
+
+    def test_html_renderer(self) -> None:
+        items: list[dict[str, Any]] = [
+            {"category": "title", "text": "Title"},
+            {"category": "h2", "text": "Section"},
+            {"category": "table_title", "text": "Table Title"},
+            {"category": "text", "text": "A < B & C"},
+            {"category": "figure", "text": ""},
+            {"category": "table", "text": "", "table": [["A", "B"], ["1", "<2>"]]},
+        ]
+        self.assertEqual(
+            HTML_RENDERER.render(items),
+            "<h1>Title</h1>\n<h2>Section</h2>\n<h3>Table Title</h3>\n<p>A &lt; B &amp; C</p>",
+        )
+        self.assertEqual(
+            HTML_RENDERER.render_item(items[-1]),
+            "<table>\n<tr><th>A</th><th>B</th></tr>\n<tr><td>1</td><td>&lt;2&gt;</td></tr>\n"
+            "</table>",
+        )
+        html_text = convert_output_with_renderer(self.extract_output, "html")
+        self.assertIn("<h1>Generated Toy File Title</h1>", html_text)
+        self.assertEqual(
+            html_text.count("<table>"),
+            len(
+                [
+                    item
+                    for item in convert_output_to_items_list_and_relations(
+                        self.extract_output
+                    ).item_list
+                    if "table" in item
+                ]
+            ),
+        )
+        self.assertEqual(table_to_html([]), "<table>\n</table>")
+
+    def test_register_renderer(self) -> None:
+        renderer = MARKDOWN_RENDERER.with_handlers(
+            {"TABLE": lambda item: f"[table {item['content_id']}]"}
+        )
+        register_renderer("custom", renderer)
+        self.addCleanup(_RENDERERS.pop, "custom")
+        self.assertIs(get_renderer("custom"), renderer)
+        self.assertIn("table", renderer.handlers)
+        # The renderer it is derived from is unchanged
+        self.assertNotIn("table", MARKDOWN_RENDERER.handlers)
+
+        custom_text = convert_output_with_renderer(self.extract_output, "custom")
+        self.assertIn("# Generated Toy File Title", custom_text)
+        self.assertNotIn("|", custom_text)
+        self.assertIn("[table ", custom_text)
+
+        with self.assertRaises(ValueError):
+            register_renderer("custom", renderer)
+        register_renderer("custom", MARKDOWN_RENDERER, overwrite=True)
+        self.assertIs(get_renderer("custom"), MARKDOWN_RENDERER)
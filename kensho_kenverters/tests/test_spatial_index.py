@@ -0,0 +1,161 @@
+import json
+import os
+import random
+from typing import Any, ClassVar
+from unittest import TestCase
+
+from ..character_index import _iter_content_nodes
+from ..spatial_index import build_spatial_index
+from ..utils import load_output_to_pydantic
+
+OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output.json"
+)
+FIGURE_EXTRACTED_TABLE_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_figure_extraction.json"
+)
+MULTI_PAGE_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "output_multi_page_locs.json"
+)
+OUTPUT_NO_LOCS_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_no_locs.json"
+)
+
+
+def _get_boxes(
+    extract_output: dict[str, Any],
+) -> list[tuple[str, int, float, float, float, float]]:
+    """Get the boxes of the nodes, and of the table cells from their annotations."""
+    parsed_output = load_output_to_pydantic(extract_output)
+    boxes = []
+    boxed_uids = set()
+    for content in _iter_content_nodes(parsed_output.content_tree):
+        for location in content.locations or []:
+            boxed_uids.add(content.uid)
+            boxes.append(
+                (
+                    content.uid,
+                    location.page_number,
+                    location.x,
+                    location.y,
+                    location.x + location.width,
+                    location.y + location.height,
+                )
+            )
+    for annotation in parsed_output.annotations:
+        locations = getattr(annotation, "locations", None) or []
+        content_uid = getattr(annotation, "content_uids", [None])[0]
+        if content_uid in boxed_uids:
+            continue
+        for location in locations:
+            boxes.append(
+                (
+                    content_uid,
+                    location.page_number,
+                    location.x,
+                    location.y,
+                    location.x + location.width,
+                    location.y + location.height,
+                )
+            )
+    return boxes
+
+
+class TestSpatialIndex(TestCase):
+    extract_output: ClassVar[dict[str, Any]]
+    extract_output_figure_extraction: ClassVar[dict[str, Any]]
+    extract_output_multi_page: ClassVar[dict[str, Any]]
+    extract_output_no_locs: ClassVar[dict[str, Any]]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output = json.load(f)
+        with open(FIGURE_EXTRACTED_TABLE_OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output_figure_extraction = json.load(f)
+        with open(MULTI_PAGE_OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output_multi_page = json.load(f)
+        with open(OUTPUT_NO_LOCS_FILE_PATH, "r") as f:
+            cls.extract_output_no_locs = json.load(f)
+
+    def test_queries_match_linear_scan(self) -> None:
+        rng = random.Random(0)
+        extract_outputs = [
+            self.extract_output,
+            self.extract_output_figure_extraction,
+            self.extract_output_multi_page,
+        ]
+        num_found = 0
+        for extract_output in extract_outputs:
+            spatial_index = build_spatial_index(extract_output)
+            boxes = _get_boxes(extract_output)
+            uid_order = {
+                uid: index for index, uid in enumerate(spatial_index.content_uids)
+            }
+            self.assertEqual({box[0] for box in boxes}, set(uid_order))
+            page_numbers = sorted({box[1] for box in boxes})
+            for _ in range(200):
+                page_number = rng.choice(page_numbers + [max(page_numbers) + 1])
+                x, y = rng.uniform(-0.1, 1.0), rng.uniform(-0.1, 1.0)
+                width, height = rng.uniform(0, 0.6), rng.uniform(0, 0.6)
+                for contained in [False, True]:
+                    expected_uids = {
+                        uid
+                        for uid, box_page_number, x_start, y_start, x_end, y_end in boxes
+                        if box_page_number == page_number
+                        and (
+                            x_start >= x
+                            and y_start >= y
+                            and x_end <= x + width
+                            and y_end <= y + height
+                            if contained
+                            else x_start <= x + width
+                            and y_start <= y + height
+                            and x_end >= x
+                            and y_end >= y
+                        )
+                    }
+                    found_uids = spatial_index.query_rectangle(
+                        page_number, x, y, width, height, contained
+                    )
+                    num_found += len(found_uids)
+                    self.assertEqual(
+                        found_uids, sorted(expected_uids, key=uid_order.__getitem__)
+                    )
+                expected_uids = {
+                    uid
+                    for uid, box_page_number, x_start, y_start, x_end, y_end in boxes
+                    if box_page_number == page_number
+                    and x_start <= x <= x_end
+                    and y_start <= y <= y_end
+                }
+                self.assertEqual(
+                    spatial_index.query_point(page_number, x, y),
+                    sorted(expected_uids, key=uid_order.__getitem__),
+                )
+        self.assertGreater(num_found, 0)
+
+    def test_table_cells(self) -> None:
+        spatial_index = build_spatial_index(self.extract_output)
+        cell_uids = [
+            annotation["content_uids"][0]
+            for annotation in self.extract_output["annotations"]
+            if annotation["type"] == "table_structure"
+        ]
+        location = next(
+            annotation["locations"][0]
+            for annotation in self.extract_output["annotations"]
+            if annotation["content_uids"][0] == cell_uids[0]
+        )
+        found_uids = spatial_index.query_point(
+            location["page_number"],
+            location["x"] + location["width"] / 2,
+            location["y"] + location["height"] / 2,
+        )
+        self.assertIn(cell_uids[0], found_uids)
+
+    def test_no_locations(self) -> None:
+        spatial_index = build_spatial_index(self.extract_output_no_locs)
+        self.assertEqual(spatial_index.content_uids, [])
+        self.assertEqual(spatial_index.query_rectangle(0, 0.0, 0.0, 1.0, 1.0), [])
+        self.assertEqual(spatial_index.query_point(0, 0.5, 0.5), [])
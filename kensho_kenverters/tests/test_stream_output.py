@@ -0,0 +1,125 @@
+import io
+import json
+import os
+import tempfile
+from typing import Any, ClassVar
+from unittest import TestCase
+
+from ..convert_output import (
+    convert_output_to_items_list_and_relations,
+    convert_output_to_markdown,
+    convert_output_to_str,
+)
+from ..stream_output import (
+    _JsonPullReader,
+    convert_json_file_to_markdown,
+    convert_json_file_to_str,
+    iter_items_from_json_file,
+)
+
+OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output.json"
+)
+OUTPUT_CHAR_OFFSETS_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_char_offsets.json"
+)
+
+
+class TestStreamOutput(TestCase):
+    extract_output: ClassVar[dict[str, Any]]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output = json.load(f)
+
+    def _write_json(self, directory: str, serialized: Any) -> str:
+        file_path = os.path.join(directory, "output.json")
+        with open(file_path, "w") as f:
+            json.dump(serialized, f, indent=2)
+        return file_path
+
+    def test_json_pull_reader(self) -> None:
+        value = {
+            "a": [1, 23456, -7.5e-3, True, None, "long string " * 3],
+            "b": {"c": [], "d": {}},
+            "e": 12345678,
+        }
+        json_str = json.dumps(value, indent=1)
+        # Small chunks split numbers, literals and strings across reads
+        for chunk_size in [1, 2, 3, 7, 1000]:
+            reader = _JsonPullReader(io.StringIO(json_str), chunk_size=chunk_size)
+            self.assertEqual(reader.read_value(), value)
+
+            reader = _JsonPullReader(io.StringIO(json_str), chunk_size=chunk_size)
+            read_value: dict[str, Any] = {}
+            for key in reader.iter_object():
+                if key == "a":
+                    read_value[key] = [reader.read_value() for _ in reader.iter_array()]
+                elif key == "b":
+                    reader.skip_value()
+                else:
+                    read_value[key] = reader.read_value()
+            self.assertEqual(read_value, {"a": value["a"], "e": value["e"]})
+            self.assertEqual(reader.peek(), "")
+
+        reader = _JsonPullReader(io.StringIO('{"a" 1}'))
+        with self.assertRaises(ValueError):
+            list(reader.iter_object())
+
+    def test_iter_items_from_json_file(self) -> None:
+        with open(OUTPUT_CHAR_OFFSETS_FILE_PATH, "r") as f:
+            extract_output_char_offsets = json.load(f)
+        for serialized_document in [self.extract_output, extract_output_char_offsets]:
+            reordered_document = {
+                key: serialized_document[key]
+                for key in ["pdf_pages", "content_tree", "annotations"]
+                if key in serialized_document
+            }
+            for serialized in [
+                serialized_document,
+                # Content tree before the annotations
+                reordered_document,
+                # Extract response wrapping the output
+                {"status": "SUCCESS", "output": serialized_document},
+            ]:
+                with tempfile.TemporaryDirectory() as directory:
+                    file_path = self._write_json(directory, serialized)
+                    self.assertEqual(
+                        list(
+                            iter_items_from_json_file(file_path, return_locations=True)
+                        ),
+                        convert_output_to_items_list_and_relations(
+                            serialized_document, return_locations=True
+                        ).item_list,
+                    )
+                    self.assertEqual(
+                        convert_json_file_to_str(file_path),
+                        convert_output_to_str(serialized_document),
+                    )
+                    self.assertEqual(
+                        convert_json_file_to_markdown(file_path),
+                        convert_output_to_markdown(serialized_document),
+                    )
+
+    def test_iter_items_from_json_file_errors(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = self._write_json(
+                directory, {"content_tree": self.extract_output["content_tree"]}
+            )
+            with self.assertRaises(ValueError):
+                list(iter_items_from_json_file(file_path))
+
+            file_path = self._write_json(directory, {"annotations": []})
+            with self.assertRaises(ValueError):
+                list(iter_items_from_json_file(file_path))
+
+            file_path = self._write_json(
+                directory,
+                {
+                    "annotations": [],
+                    "content_tree": {"uid": "0", "type": "TEXT", "children": []},
+                },
+            )
+            with self.assertRaises(ValueError):
+                list(iter_items_from_json_file(file_path))
@@ -0,0 +1,140 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Any, ClassVar
+from unittest import TestCase
+from unittest.mock import patch
+
+from ..output_to_tables import (
+    build_uids_grid_from_table_cell_annotations,
+    extract_pd_dfs_from_output,
+)
+from ..table_export import export_tables_to_files, iter_table_texts, write_table_grid
+
+OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output.json"
+)
+FIGURE_EXTRACTED_TABLE_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_figure_extraction.json"
+)
+MULTI_PAGE_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "output_multi_page_locs.json"
+)
+
+
+class TestTableExport(TestCase):
+    extract_output: ClassVar[dict[str, Any]]
+    extract_output_figure_extraction: ClassVar[dict[str, Any]]
+    extract_output_multi_page: ClassVar[dict[str, Any]]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output = json.load(f)
+        with open(FIGURE_EXTRACTED_TABLE_OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output_figure_extraction = json.load(f)
+        with open(MULTI_PAGE_OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output_multi_page = json.load(f)
+
+    def test_write_table_grid(self) -> None:
+        stream = io.StringIO()
+        write_table_grid([["Name", "Note"], ["a,b", 'say "hi"']], stream)
+        self.assertEqual(stream.getvalue(), 'Name,Note\n"a,b","say ""hi"""\n')
+        stream = io.StringIO()
+        write_table_grid([["Name", "Note"], ["a,b", "c"]], stream, "tsv")
+        self.assertEqual(stream.getvalue(), "Name\tNote\na,b\tc\n")
+        with self.assertRaises(ValueError):
+            write_table_grid([["a"]], io.StringIO(), "xlsx")  # type: ignore[arg-type]
+
+    def test_iter_table_texts(self) -> None:
+        extract_outputs = [
+            self.extract_output,
+            self.extract_output_figure_extraction,
+            self.extract_output_multi_page,
+        ]
+        for extract_output in extract_outputs:
+            for include_figure_extracted_table in [False, True]:
+                table_dfs = extract_pd_dfs_from_output(
+                    extract_output,
+                    include_figure_extracted_table=include_figure_extracted_table,
+                )
+                # The same text as pandas with the first row as header
+                self.assertEqual(
+                    [
+                        table_text
+                        for _, table_text in iter_table_texts(
+                            extract_output,
+                            include_figure_extracted_table=include_figure_extracted_table,
+                        )
+                    ],
+                    [table_df.to_csv(index=False) for table_df in table_dfs],
+                )
+                self.assertEqual(
+                    [
+                        table_text
+                        for _, table_text in iter_table_texts(
+                            extract_output,
+                            "tsv",
+                            include_figure_extracted_table=include_figure_extracted_table,
+                        )
+                    ],
+                    [table_df.to_csv(index=False, sep="\t") for table_df in table_dfs],
+                )
+        self.assertEqual(
+            len(list(iter_table_texts(self.extract_output_figure_extraction))), 1
+        )
+        self.assertEqual(
+            len(
+                list(
+                    iter_table_texts(
+                        self.extract_output_figure_extraction,
+                        include_figure_extracted_table=True,
+                    )
+                )
+            ),
+            2,
+        )
+
+    def test_iter_table_texts_one_table_at_a_time(self) -> None:
+        with patch(
+            "kensho_kenverters.output_to_tables."
+            "build_uids_grid_from_table_cell_annotations",
+            wraps=build_uids_grid_from_table_cell_annotations,
+        ) as build_uids_grid:
+            table_texts = iter_table_texts(self.extract_output_multi_page)
+            next(table_texts)
+            # Only the grid of the first table is built
+            self.assertEqual(build_uids_grid.call_count, 1)
+            self.assertEqual(len(list(table_texts)), 1)
+            self.assertEqual(build_uids_grid.call_count, 2)
+
+    def test_export_tables_to_files(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            output_directory = os.path.join(directory, "tables")
+            file_paths = export_tables_to_files(
+                self.extract_output_multi_page, output_directory, "tsv"
+            )
+            table_texts = list(iter_table_texts(self.extract_output_multi_page, "tsv"))
+            self.assertEqual(
+                file_paths,
+                [
+                    os.path.join(output_directory, f"table_{table_uid}.tsv")
+                    for table_uid, _ in table_texts
+                ],
+            )
+            for file_path, (_, table_text) in zip(file_paths, table_texts):
+                with open(file_path, "r", encoding="utf-8", newline="") as f:
+                    self.assertEqual(f.read(), table_text)
+
+    def test_no_pandas_import(self) -> None:
+        code = (
+            "import json, sys\n"
+            "from kensho_kenverters.table_export import iter_table_texts\n"
+            f"with open({OUTPUT_FILE_PATH!r}) as f:\n"
+            "    list(iter_table_texts(json.load(f)))\n"
+            "assert 'pandas' not in sys.modules\n"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
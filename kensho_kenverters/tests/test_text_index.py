@@ -0,0 +1,182 @@
+import json
+import os
+import tempfile
+from typing import Any, ClassVar
+from unittest import TestCase
+
+from ..convert_output import convert_output_to_items_list_and_relations
+from ..output_to_tables import build_table_grids
+from ..text_index import TextIndex, tokenize
+
+OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output.json"
+)
+FIGURE_EXTRACTED_TABLE_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_figure_extraction.json"
+)
+MULTI_PAGE_OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "output_multi_page_locs.json"
+)
+
+
+class TestTextIndex(TestCase):
+    extract_output: ClassVar[dict[str, Any]]
+    extract_output_figure_extraction: ClassVar[dict[str, Any]]
+    extract_output_multi_page: ClassVar[dict[str, Any]]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output = json.load(f)
+        with open(FIGURE_EXTRACTED_TABLE_OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output_figure_extraction = json.load(f)
+        with open(MULTI_PAGE_OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output_multi_page = json.load(f)
+
+    def _get_expected_content_uids(
+        self, extract_output: dict[str, Any], phrase: str
+    ) -> list[str]:
+        """Scan the items and table cells containing the phrase, as separate words."""
+        words = tokenize(phrase)
+        texts = [
+            (item["content_id"], item["text"])
+            for item in convert_output_to_items_list_and_relations(
+                extract_output
+            ).item_list
+            if item["category"] not in ("table", "table_of_contents")
+        ]
+        for table_grid_structure in build_table_grids(
+            extract_output, duplicate_merged_cells_content_flag=False
+        ).values():
+            for annotation in table_grid_structure.table_structure_annotations:
+                row, col = annotation.data.index
+                texts.append(
+                    (
+                        annotation.content_uids[0],
+                        table_grid_structure.table_string_grid[row][col],
+                    )
+                )
+        content_uids = []
+        for content_uid, text in texts:
+            text_words = tokenize(text)
+            if any(
+                text_words[start : start + len(words)] == words  # noqa: E203
+                for start in range(len(text_words))
+            ):
+                content_uids.append(content_uid)
+        return content_uids
+
+    def test_search(self) -> None:
+        documents = {
+            "base": self.extract_output,
+            "figure": self.extract_output_figure_extraction,
+            "multi_page": self.extract_output_multi_page,
+        }
+        text_index = TextIndex()
+        for document_id, document in documents.items():
+            text_index.add_document(document, document_id)
+        self.assertEqual(text_index.document_ids, list(documents))
+
+        phrases = ["Kensho revenue", "learning", "Q1", "in millions $", "the", "2019"]
+        num_hits = 0
+        for phrase in phrases:
+            hits = text_index.search(phrase)
+            num_hits += len(hits)
+            self.assertEqual(
+                [(hit.document_id, hit.content_uid) for hit in hits],
+                [
+                    (document_id, content_uid)
+                    for document_id, document in documents.items()
+                    for content_uid in self._get_expected_content_uids(document, phrase)
+                ],
+            )
+            self.assertEqual(text_index.search(phrase, limit=1), hits[:1])
+        self.assertGreater(num_hits, 0)
+        self.assertEqual(text_index.search("millions Kensho"), [])
+        self.assertEqual(text_index.search("no such phrase anywhere"), [])
+        self.assertEqual(text_index.search("  ,. "), [])
+
+        # Hits are boxed by the table cell containing the phrase
+        hit = text_index.search("Kensho revenue in millions")[0]
+        self.assertEqual(hit.document_id, "base")
+        self.assertEqual(hit.page_number, 0)
+        self.assertIsNotNone(hit.bounding_box)
+        table_cell_uids = {
+            annotation.content_uids[0]
+            for table_grid_structure in build_table_grids(self.extract_output).values()
+            for annotation in table_grid_structure.table_structure_annotations
+        }
+        self.assertIn(hit.content_uid, table_cell_uids)
+
+    def test_phrase_words_in_different_documents(self) -> None:
+        text_index = TextIndex()
+        text_index.add_document(self.extract_output, "base")
+        text_index.add_document(self.extract_output_multi_page, "multi_page")
+        # Each document holds one word of the phrase, but not the phrase
+        self.assertIn("kensho", text_index._document_postings["base"])
+        self.assertNotIn("kensho", text_index._document_postings["multi_page"])
+        self.assertIn("torch", text_index._document_postings["multi_page"])
+        self.assertNotIn("torch", text_index._document_postings["base"])
+        self.assertEqual(text_index.search("kensho torch"), [])
+        self.assertEqual(text_index.search("torch kensho"), [])
+
+        documents = {
+            "base": self.extract_output,
+            "multi_page": self.extract_output_multi_page,
+        }
+        for phrase in ["000 1", "sample reference", "the learning"]:
+            self.assertEqual(
+                [
+                    (hit.document_id, hit.content_uid)
+                    for hit in text_index.search(phrase)
+                ],
+                [
+                    (document_id, content_uid)
+                    for document_id, document in documents.items()
+                    for content_uid in self._get_expected_content_uids(document, phrase)
+                ],
+            )
+
+    def test_update_and_persist(self) -> None:
+        text_index = TextIndex()
+        text_index.add_document(self.extract_output, "a")
+        text_index.add_document(self.extract_output_multi_page, "b")
+        hits = text_index.search("learning")
+        self.assertEqual({hit.document_id for hit in hits}, {"a", "b"})
+
+        # Replacing a document does not duplicate its hits
+        text_index.add_document(self.extract_output, "a")
+        self.assertEqual(len(text_index.search("learning")), len(hits))
+        self.assertTrue(text_index.remove_document("b"))
+        self.assertFalse(text_index.remove_document("b"))
+        self.assertEqual(
+            {hit.document_id for hit in text_index.search("learning")}, {"a"}
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(ValueError):
+                text_index.save()
+            text_index.save(directory)
+            loaded_index = TextIndex.load(directory)
+            self.assertEqual(loaded_index.document_ids, ["a"])
+            self.assertEqual(
+                loaded_index.search("learning"), text_index.search("learning")
+            )
+
+            # Only the changed documents are written again
+            file_names = set(os.listdir(directory))
+            loaded_index.add_document(self.extract_output_figure_extraction, "c")
+            loaded_index.save()
+            new_file_names = set(os.listdir(directory)) - file_names
+            self.assertEqual(len(new_file_names), 1)
+            loaded_index.remove_document("c")
+            loaded_index.save()
+            self.assertEqual(set(os.listdir(directory)), file_names)
+
+            loaded_index.add_document(self.extract_output_multi_page, "b")
+            loaded_index.save()
+            reloaded_index = TextIndex.load(directory)
+            self.assertEqual(reloaded_index.document_ids, ["a", "b"])
+            self.assertEqual(
+                reloaded_index.search("learning"), loaded_index.search("learning")
+            )
@@ -0,0 +1,426 @@
+import copy
+import json
+import os
+import pathlib
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, ClassVar
+from unittest import TestCase
+
+from pydantic_core._pydantic_core import ValidationError as PydanticValidationError
+
+from ..convert_output import (
+    _convert_parsed_output_to_items_list_and_relations,
+    convert_output_to_markdown,
+    convert_output_to_str_by_page,
+)
+from ..extract_output_models import (
+    CompactLocations,
+    ExtractOutputModel,
+    LazyTextNodeDataModel,
+    LocationModel,
+    TextNodeDataModel,
+)
+from ..output_to_tables import (
+    extract_pd_dfs_from_output,
+    extract_pd_dfs_with_locs_and_table_structure_from_output,
+)
+from ..utils import (
+    _get_document_index,
+    clear_parsed_document_cache,
+    disable_parsed_document_cache,
+    enable_parsed_document_cache,
+    load_output_from_json,
+    load_output_to_pydantic,
+)
+
+OUTPUT_CHAR_OFFSETS_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output_char_offsets.json"
+)
+OUTPUT_FILE_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "extract_output.json"
+)
+
+
+class TestLoadOutputToPydantic(TestCase):
+    extract_output_char_offsets: ClassVar[dict[str, Any]]
+    extract_output: ClassVar[dict[str, Any]]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(OUTPUT_CHAR_OFFSETS_FILE_PATH, "r") as f:
+            cls.extract_output_char_offsets = json.load(f)
+        with open(OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output = json.load(f)
+
+    def test_load_output_to_pydantic_lazy_text_node_data(self) -> None:
+        parsed = load_output_to_pydantic(self.extract_output_char_offsets)
+        lazy_parsed = load_output_to_pydantic(
+            self.extract_output_char_offsets, lazy_text_node_data=True
+        )
+        text_node_data = parsed.content_tree.children[0].text_node_data
+        lazy_text_node_data = lazy_parsed.content_tree.children[0].text_node_data
+        assert isinstance(text_node_data, TextNodeDataModel)
+        assert isinstance(lazy_text_node_data, LazyTextNodeDataModel)
+        self.assertNotIsInstance(text_node_data, LazyTextNodeDataModel)
+
+        # Nothing is validated until a field is read
+        self.assertFalse(lazy_text_node_data.is_parsed)
+        self.assertEqual(lazy_text_node_data.texts, text_node_data.texts)
+        self.assertTrue(lazy_text_node_data.is_parsed)
+        self.assertEqual(
+            lazy_text_node_data.text_locations, text_node_data.text_locations
+        )
+        self.assertEqual(
+            lazy_text_node_data.character_offsets, text_node_data.character_offsets
+        )
+
+        # Lazy and eager loads compare and serialize the same
+        self.assertEqual(
+            load_output_to_pydantic(
+                self.extract_output_char_offsets, lazy_text_node_data=True
+            ),
+            parsed,
+        )
+        self.assertEqual(
+            load_output_to_pydantic(
+                self.extract_output_char_offsets, lazy_text_node_data=True
+            ).model_dump(),
+            parsed.model_dump(),
+        )
+
+    def test_lazy_text_node_data_threads(self) -> None:
+        raw_text_node_data = self.extract_output_char_offsets["content_tree"][
+            "children"
+        ][0]["text_node_data"]
+        expected_text_node_data = TextNodeDataModel.model_validate(raw_text_node_data)
+        lazy_text_node_data_list = [
+            LazyTextNodeDataModel.from_raw_data(raw_text_node_data) for _ in range(2000)
+        ]
+
+        def read_fields() -> list[Any]:
+            return [
+                text_node_data.character_offsets
+                for text_node_data in lazy_text_node_data_list
+            ]
+
+        # Switch threads as often as possible, so threads read the same fields at once
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(8) as executor:
+                futures = [executor.submit(read_fields) for _ in range(8)]
+                results = [future.result() for future in futures]
+        finally:
+            sys.setswitchinterval(switch_interval)
+        for result in results:
+            self.assertEqual(
+                result,
+                [expected_text_node_data.character_offsets]
+                * len(lazy_text_node_data_list),
+            )
+
+    def test_load_output_to_pydantic_lazy_text_node_data_invalid(self) -> None:
+        serialized_document = copy.deepcopy(self.extract_output_char_offsets)
+        first_child = serialized_document["content_tree"]["children"][0]
+        first_child["text_node_data"]["character_offsets"] = [["not a float"]]
+        with self.assertRaises(PydanticValidationError):
+            load_output_to_pydantic(serialized_document)
+
+        # The error is raised when the text node data is read
+        lazy_parsed = load_output_to_pydantic(
+            serialized_document, lazy_text_node_data=True
+        )
+        lazy_text_node_data = lazy_parsed.content_tree.children[0].text_node_data
+        assert lazy_text_node_data is not None
+        with self.assertRaises(PydanticValidationError):
+            lazy_text_node_data.character_offsets
+
+    def test_load_output_to_pydantic_compact_locations(self) -> None:
+        for serialized_document in [
+            self.extract_output,
+            self.extract_output_char_offsets,
+        ]:
+            parsed = load_output_to_pydantic(serialized_document)
+            compact_parsed = load_output_to_pydantic(
+                serialized_document, compact_locations=True
+            )
+            # Compact documents serialize and convert the same
+            self.assertEqual(compact_parsed.model_dump(), parsed.model_dump())
+            for return_locations in [True, False]:
+                self.assertEqual(
+                    _convert_parsed_output_to_items_list_and_relations(
+                        compact_parsed, return_locations, return_relations=True
+                    ),
+                    _convert_parsed_output_to_items_list_and_relations(
+                        parsed, return_locations, return_relations=True
+                    ),
+                )
+
+        # All locations share a single array
+        compact_parsed = load_output_to_pydantic(
+            self.extract_output_char_offsets, compact_locations=True
+        )
+        first_child = compact_parsed.content_tree.children[0]
+        second_child = compact_parsed.content_tree.children[1]
+        assert isinstance(first_child.locations, CompactLocations)
+        assert isinstance(second_child.locations, CompactLocations)
+        assert first_child.text_node_data is not None
+        self.assertIs(first_child.locations._array, second_child.locations._array)
+        self.assertIsInstance(
+            first_child.text_node_data.text_locations, CompactLocations
+        )
+        character_offsets = first_child.text_node_data.character_offsets
+        assert character_offsets is not None
+        self.assertEqual(type(character_offsets[0]).__name__, "array")
+
+    def test_compact_locations(self) -> None:
+        locations = [
+            LocationModel(
+                height=0.01425, width=0.05043, x=0.20001, y=0.0137, page_number=0
+            ),
+            LocationModel(height=0.1, width=0.2, x=0.3, y=0.4, page_number=12),
+        ]
+        compact_locations = CompactLocations.from_locations(locations)
+        self.assertEqual(len(compact_locations), 2)
+        self.assertEqual(compact_locations.array.shape, (2, 5))
+        # Values are read back as in the original locations
+        self.assertEqual(compact_locations[0], locations[0])
+        self.assertEqual(compact_locations[-1], locations[1])
+        self.assertEqual(compact_locations[1:], locations[1:])
+        self.assertEqual(list(compact_locations), locations)
+        self.assertEqual(compact_locations, locations)
+        with self.assertRaises(IndexError):
+            compact_locations[2]
+        self.assertEqual(len(CompactLocations.from_locations([])), 0)
+
+    def test_load_output_to_pydantic_without_validation(self) -> None:
+        for serialized_document in [
+            self.extract_output,
+            self.extract_output_char_offsets,
+        ]:
+            for compact_locations in [True, False]:
+                parsed = load_output_to_pydantic(
+                    serialized_document, compact_locations=compact_locations
+                )
+                trusted_parsed = load_output_to_pydantic(
+                    serialized_document,
+                    compact_locations=compact_locations,
+                    validate=False,
+                )
+                self.assertEqual(trusted_parsed, parsed)
+                self.assertEqual(trusted_parsed.model_dump(), parsed.model_dump())
+                self.assertEqual(repr(trusted_parsed), repr(parsed))
+                self.assertEqual(
+                    _convert_parsed_output_to_items_list_and_relations(
+                        trusted_parsed, return_locations=True, return_relations=True
+                    ),
+                    _convert_parsed_output_to_items_list_and_relations(
+                        parsed, return_locations=True, return_relations=True
+                    ),
+                )
+
+        serialized_document = copy.deepcopy(self.extract_output)
+        serialized_document["annotations"][0]["type"] = "not a type"
+        with self.assertRaises(ValueError):
+            load_output_to_pydantic(serialized_document, validate=False)
+
+
+class TestLoadOutputFromJson(TestCase):
+    extract_output: ClassVar[dict[str, Any]]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output = json.load(f)
+
+    def test_load_output_from_json(self) -> None:
+        parsed = load_output_to_pydantic(self.extract_output)
+        json_bytes = pathlib.Path(OUTPUT_FILE_PATH).read_bytes()
+        wrapped_json_str = json.dumps({"output": self.extract_output, "status": "ok"})
+        json_data_list: list[bytes | str | pathlib.Path] = [
+            pathlib.Path(OUTPUT_FILE_PATH),
+            json_bytes,
+            json_bytes.decode(),
+            wrapped_json_str,
+        ]
+        for json_data in json_data_list:
+            self.assertEqual(load_output_from_json(json_data), parsed)
+            self.assertEqual(load_output_from_json(json_data, validate=False), parsed)
+        with self.assertRaises(PydanticValidationError):
+            load_output_from_json('{"output": {"annotations": []}}')
+
+    def test_converters_accept_loaded_output(self) -> None:
+        parsed = load_output_from_json(pathlib.Path(OUTPUT_FILE_PATH))
+        self.assertIs(load_output_to_pydantic(parsed), parsed)
+        self.assertEqual(
+            convert_output_to_markdown(parsed),
+            convert_output_to_markdown(self.extract_output),
+        )
+        self.assertEqual(
+            convert_output_to_str_by_page(parsed),
+            convert_output_to_str_by_page(self.extract_output),
+        )
+        tables = extract_pd_dfs_with_locs_and_table_structure_from_output(parsed)
+        expected_tables = extract_pd_dfs_with_locs_and_table_structure_from_output(
+            self.extract_output
+        )
+        self.assertEqual(len(tables), len(expected_tables))
+        for table, expected_table in zip(tables, expected_tables):
+            self.assertTrue(table.df.equals(expected_table.df))
+            self.assertEqual(table.locations, expected_table.locations)
+
+
+class TestParsedDocumentCache(TestCase):
+    extract_output: ClassVar[dict[str, Any]]
+    extract_output_char_offsets: ClassVar[dict[str, Any]]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(OUTPUT_FILE_PATH, "r") as f:
+            cls.extract_output = json.load(f)
+        with open(OUTPUT_CHAR_OFFSETS_FILE_PATH, "r") as f:
+            cls.extract_output_char_offsets = json.load(f)
+
+    def tearDown(self) -> None:
+        disable_parsed_document_cache()
+
+    def test_parsed_document_cache(self) -> None:
+        serialized_document = copy.deepcopy(self.extract_output)
+        self.assertIsNot(
+            load_output_to_pydantic(serialized_document),
+            load_output_to_pydantic(serialized_document),
+        )
+
+        enable_parsed_document_cache()
+        parsed = load_output_to_pydantic(serialized_document)
+        self.assertIs(load_output_to_pydantic(serialized_document), parsed)
+        # Other options, and equal but distinct documents, are parsed again
+        lazy_parsed = load_output_to_pydantic(
+            serialized_document, lazy_text_node_data=True
+        )
+        self.assertIsNot(lazy_parsed, parsed)
+        self.assertIs(
+            load_output_to_pydantic(serialized_document, lazy_text_node_data=True),
+            lazy_parsed,
+        )
+        compact_parsed = load_output_to_pydantic(
+            serialized_document, compact_locations=True
+        )
+        self.assertIsNot(compact_parsed, parsed)
+        self.assertIsInstance(
+            compact_parsed.content_tree.children[0].locations, CompactLocations
+        )
+        self.assertIsNot(
+            load_output_to_pydantic(copy.deepcopy(serialized_document)), parsed
+        )
+
+        # Documents built without validation are not returned to validating callers
+        other_document = copy.deepcopy(self.extract_output)
+        trusted_parsed = load_output_to_pydantic(other_document, validate=False)
+        self.assertIs(
+            load_output_to_pydantic(other_document, validate=False), trusted_parsed
+        )
+        validated_parsed = load_output_to_pydantic(other_document)
+        self.assertIsNot(validated_parsed, trusted_parsed)
+        self.assertIs(
+            load_output_to_pydantic(other_document, validate=False), validated_parsed
+        )
+
+        # Changes to the top level of the document are detected
+        serialized_document["annotations"] = serialized_document["annotations"][:-1]
+        changed_parsed = load_output_to_pydantic(serialized_document)
+        self.assertIsNot(changed_parsed, parsed)
+        self.assertEqual(
+            len(changed_parsed.annotations), len(self.extract_output["annotations"]) - 1
+        )
+
+        clear_parsed_document_cache()
+        self.assertIsNot(load_output_to_pydantic(serialized_document), changed_parsed)
+
+    def test_parsed_document_cache_threads(self) -> None:
+        serialized_document = copy.deepcopy(self.extract_output_char_offsets)
+        expected_character_offsets = [
+            content.text_node_data.character_offsets
+            for content in load_output_to_pydantic(
+                serialized_document
+            ).content_tree.children
+            if content.text_node_data is not None
+        ]
+        enable_parsed_document_cache()
+
+        def read_character_offsets() -> list[Any]:
+            # The threads share the cached document, and read its lazy text node data at once
+            parsed = load_output_to_pydantic(
+                serialized_document, lazy_text_node_data=True
+            )
+            return [
+                content.text_node_data.character_offsets
+                for content in parsed.content_tree.children
+                if content.text_node_data is not None
+            ]
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(8) as executor:
+                futures = [executor.submit(read_character_offsets) for _ in range(8)]
+                results = [future.result() for future in futures]
+        finally:
+            sys.setswitchinterval(switch_interval)
+        self.assertEqual(results, [expected_character_offsets] * 8)
+
+    def test_parsed_document_cache_bounds(self) -> None:
+        serialized_documents = [copy.deepcopy(self.extract_output) for _ in range(3)]
+        enable_parsed_document_cache(max_entries=2)
+        parsed_documents = [
+            load_output_to_pydantic(serialized_document)
+            for serialized_document in serialized_documents
+        ]
+        # The least recently used document was removed
+        self.assertIsNot(
+            load_output_to_pydantic(serialized_documents[0]), parsed_documents[0]
+        )
+        self.assertIs(
+            load_output_to_pydantic(serialized_documents[2]), parsed_documents[2]
+        )
+
+        enable_parsed_document_cache(max_size=1)
+        parsed = load_output_to_pydantic(serialized_documents[0])
+        self.assertIsNot(load_output_to_pydantic(serialized_documents[0]), parsed)
+
+    def test_parsed_document_cache_indexes(self) -> None:
+        serialized_document = copy.deepcopy(self.extract_output)
+        num_builds = 0
+
+        def build_index(parsed_serialized_document: ExtractOutputModel) -> int:
+            nonlocal num_builds
+            num_builds += 1
+            return len(parsed_serialized_document.annotations)
+
+        parsed = load_output_to_pydantic(serialized_document)
+        _get_document_index(parsed, build_index)
+        _get_document_index(parsed, build_index)
+        self.assertEqual(num_builds, 2)
+
+        enable_parsed_document_cache()
+        parsed = load_output_to_pydantic(serialized_document)
+        _get_document_index(parsed, build_index)
+        _get_document_index(parsed, build_index)
+        self.assertEqual(num_builds, 3)
+
+        # Converters give the same results with reused indexes, from several threads
+        expected_markdown = convert_output_to_markdown(self.extract_output)
+        expected_dfs = extract_pd_dfs_from_output(self.extract_output)
+        with ThreadPoolExecutor(4) as executor:
+            markdowns = list(
+                executor.map(convert_output_to_markdown, [serialized_document] * 8)
+            )
+            dfs_lists = list(
+                executor.map(extract_pd_dfs_from_output, [serialized_document] * 8)
+            )
+        self.assertEqual(markdowns, [expected_markdown] * 8)
+        for dfs in dfs_lists:
+            self.assertEqual(len(dfs), len(expected_dfs))
+            for df, expected_df in zip(dfs, expected_dfs):
+                self.assertTrue(df.equals(expected_df))
@@ -0,0 +1,327 @@
+# Copyright 2024-present Kensho Technologies, LLC.
+"""Incremental inverted index of the words of the items and table cells of many documents.
+
+Every item and table cell of a document is an entry of the document, and every word is mapped to
+the positions of its occurrences in the entries of each document. Phrase queries intersect the
+documents and entries of their words, starting from the rarest word, and check that the positions
+follow each other, so only the entries containing every word are read.
+
+Each document is indexed on its own, so documents are added, replaced or removed without
+rebuilding the others. On disk, the index is a directory with a file per document, and saving
+only writes the files of the documents changed since the last save.
+"""
+
+import hashlib
+import math
+import os
+import pickle
+import re
+import tempfile
+from typing import Sequence
+
+from .constants import (
+    CATEGORY_KEY,
+    CONTENT_ID_KEY,
+    LOCATIONS_KEY,
+    TABLE_CONTENT_CATEGORIES,
+    TEXT_KEY,
+)
+from .convert_output import _iter_document_items
+from .extract_output_models import (
+    LocationModel,
+    SerializedDocumentType,
+    TextSearchHit,
+)
+from .output_to_tables import build_table_grids
+from .utils import load_output_to_pydantic
+
+INDEX_FILE_SUFFIX = ".idx"
+TEMPORARY_FILE_SUFFIX = ".tmp"
+
+_WORD_PATTERN = re.compile(r"\w+")
+_TABLE_ITEM_CATEGORIES = {category.lower() for category in TABLE_CONTENT_CATEGORIES}
+
+# Content uid, page number and bounding box of an entry
+_EntryType = tuple[str, int | None, tuple[float, float, float, float] | None]
+# Word to the entry indexes and word positions of its occurrences in a document
+_PostingsType = dict[str, dict[int, list[int]]]
+
+
+def tokenize(text: str) -> list[str]:
+    """Split a text into lowercase words, as they are indexed and searched."""
+    return _WORD_PATTERN.findall(text.lower())
+
+
+def _get_entry(
+    content_uid: str, locations: Sequence[LocationModel] | None
+) -> _EntryType:
+    """Get the entry of an item or table cell, boxing its locations on their first page."""
+    if not locations:
+        return content_uid, None, None
+    page_number = locations[0].page_number
+    x_min = y_min = math.inf
+    x_max = y_max = -math.inf
+    for location in locations:
+        if location.page_number != page_number:
+            continue
+        x_min = min(x_min, location.x)
+        y_min = min(y_min, location.y)
+        x_max = max(x_max, location.x + location.width)
+        y_max = max(y_max, location.y + location.height)
+    return content_uid, page_number, (x_min, y_min, x_max - x_min, y_max - y_min)
+
+
+def _index_document(
+    serialized_document: SerializedDocumentType,
+) -> tuple[list[_EntryType], _PostingsType]:
+    """Get the entries of the items and table cells of a document, and their word postings.
+
+    Tables are indexed by cell, so their hits are boxed by the cell containing the phrase.
+    """
+    parsed_serialized_document = load_output_to_pydantic(
+        serialized_document, lazy_text_node_data=True
+    )
+    entries: list[_EntryType] = []
+    postings: _PostingsType = {}
+
+    def add_entry(
+        content_uid: str, text: str, locations: Sequence[LocationModel] | None
+    ) -> None:
+        entry_index = len(entries)
+        entries.append(_get_entry(content_uid, locations))
+        for position, word in enumerate(tokenize(text)):
+            postings.setdefault(word, {}).setdefault(entry_index, []).append(position)
+
+    for item in _iter_document_items(parsed_serialized_document, return_locations=True):
+        if item[CATEGORY_KEY] not in _TABLE_ITEM_CATEGORIES:
+            add_entry(item[CONTENT_ID_KEY], item[TEXT_KEY], item[LOCATIONS_KEY])
+    for table_grid_structure in build_table_grids(
+        parsed_serialized_document, duplicate_merged_cells_content_flag=False
+    ).values():
+        table_string_grid = table_grid_structure.table_string_grid
+        for annotation in table_grid_structure.table_structure_annotations:
+            row, col = annotation.data.index
+            add_entry(
+                annotation.content_uids[0],
+                table_string_grid[row][col],
+                annotation.locations,
+            )
+    return entries, postings
+
+
+def _get_file_name(document_id: str) -> str:
+    """Get the name of the index file of a document, whatever characters its id contains."""
+    return hashlib.blake2b(document_id.encode()).hexdigest() + INDEX_FILE_SUFFIX
+
+
+class TextIndex:
+    """Inverted index of the words of the items and table cells of many documents.
+
+    Indexes are saved with pickle, so only load index directories that no one else can write to.
+    """
+
+    def __init__(self) -> None:
+        """Create an empty index."""
+        self.directory: str | None = None
+        self._document_entries: dict[str, list[_EntryType]] = {}
+        self._document_postings: dict[str, _PostingsType] = {}
+        # Word to the postings of the documents containing it
+        self._word_postings: dict[str, dict[str, dict[int, list[int]]]] = {}
+        # Documents changed or removed since the index was last saved to its directory
+        self._changed_document_ids: set[str] = set()
+
+    def __contains__(self, document_id: object) -> bool:
+        """Check if a document is in the index."""
+        return document_id in self._document_entries
+
+    def __len__(self) -> int:
+        """Get the number of documents in the index."""
+        return len(self._document_entries)
+
+    @property
+    def document_ids(self) -> list[str]:
+        """Get the ids of the documents in the index.
+
+        Documents are in the order they were added, after the loaded documents sorted by id.
+        """
+        return list(self._document_entries)
+
+    def _insert_document(
+        self,
+        document_id: str,
+        entries: list[_EntryType],
+        postings: _PostingsType,
+    ) -> None:
+        """Insert the entries and postings of a document, which must not be in the index."""
+        self._document_entries[document_id] = entries
+        self._document_postings[document_id] = postings
+        word_postings = self._word_postings
+        for word, entry_positions in postings.items():
+            word_postings.setdefault(word, {})[document_id] = entry_positions
+
+    def add_document(
+        self, serialized_document: SerializedDocumentType, document_id: str
+    ) -> int:
+        """Index the items and table cells of a document, replacing the document with the same id.
+
+        Args:
+            serialized_document: a serialized document, or the ExtractOutputModel loaded from it
+            document_id: the id of the document in the index
+
+        Returns:
+            the number of items and table cells indexed
+        """
+        entries, postings = _index_document(serialized_document)
+        self.remove_document(document_id)
+        self._insert_document(document_id, entries, postings)
+        self._changed_document_ids.add(document_id)
+        return len(entries)
+
+    def remove_document(self, document_id: str) -> bool:
+        """Remove a document from the index, returning whether it was in the index."""
+        postings = self._document_postings.pop(document_id, None)
+        if postings is None:
+            return False
+        del self._document_entries[document_id]
+        word_postings = self._word_postings
+        for word in postings:
+            document_postings = word_postings[word]
+            del document_postings[document_id]
+            if not document_postings:
+                del word_postings[word]
+        self._changed_document_ids.add(document_id)
+        return True
+
+    def search(self, phrase: str, limit: int | None = None) -> list[TextSearchHit]:
+        """Find the items and table cells containing a phrase, ignoring case and punctuation.
+
+        Args:
+            phrase: the words to find, next to each other and in this order
+            limit: the maximum number of hits returned, or None to return all hits
+
+        Returns:
+            a TextSearchHit per item or table cell containing the phrase, with its document id,
+                content uid, page number and bounding box, in the order of document_ids and of
+                the entries of each document: items in reading order, then table cells
+        """
+        words = tokenize(phrase)
+        if not words:
+            return []
+        word_postings = self._word_postings
+        if any(word not in word_postings for word in words):
+            return []
+        # Words by increasing number of documents, to intersect from the rarest word
+        word_offsets = sorted(
+            enumerate(words), key=lambda offset_word: len(word_postings[offset_word[1]])
+        )
+        rarest_offset, rarest_word = word_offsets[0]
+        hits = []
+        # Documents are in the order they were added, in the postings of every word
+        for document_id, rarest_entry_positions in word_postings[rarest_word].items():
+            document_postings = self._document_postings[document_id]
+            # Documents with the rarest word may not have the other words of the phrase
+            if any(word not in document_postings for _, word in word_offsets[1:]):
+                continue
+            entries = self._document_entries[document_id]
+            for entry_index in sorted(rarest_entry_positions):
+                # Positions of the first word of the phrase
+                start_positions = {
+                    position - rarest_offset
+                    for position in rarest_entry_positions[entry_index]
+                }
+                for offset, word in word_offsets[1:]:
+                    word_positions = document_postings[word].get(entry_index)
+                    if word_positions is None:
+                        start_positions.clear()
+                        break
+                    start_positions.intersection_update(
+                        position - offset for position in word_positions
+                    )
+                    if not start_positions:
+                        break
+                if not start_positions:
+                    continue
+                content_uid, page_number, bounding_box = entries[entry_index]
+                hits.append(
+                    TextSearchHit(document_id, content_uid, page_number, bounding_box)
+                )
+                if limit is not None and len(hits) >= limit:
+                    return hits
+        return hits
+
+    def _write_document_file(self, directory: str, document_id: str) -> None:
+        """Write the index file of a document atomically."""
+        file_descriptor, temporary_file_path = tempfile.mkstemp(
+            dir=directory, suffix=TEMPORARY_FILE_SUFFIX
+        )
+        try:
+            with os.fdopen(file_descriptor, "wb") as f:
+                pickle.dump(
+                    (
+                        document_id,
+                        self._document_entries[document_id],
+                        self._document_postings[document_id],
+                    ),
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(
+                temporary_file_path,
+                os.path.join(directory, _get_file_name(document_id)),
+            )
+        except BaseException:
+            os.remove(temporary_file_path)
+            raise
+
+    def save(self, directory: str | os.PathLike[str] | None = None) -> None:
+        """Save the index to a directory, with a file per document.
+
+        Args:
+            directory: the directory to save to, created if needed, or None to save to the
+                directory the index was last saved to or loaded from. When saving to the same
+                directory, only the files of the documents added, replaced or removed since are
+                written or removed.
+        """
+        if directory is None:
+            if self.directory is None:
+                raise ValueError("The index has no directory to save to")
+            directory = self.directory
+        directory = os.fspath(directory)
+        if directory == self.directory:
+            document_ids = self._changed_document_ids
+        else:
+            os.makedirs(directory, exist_ok=True)
+            document_ids = set(self._document_entries)
+            # Remove the files of another index saved to the directory
+            with os.scandir(directory) as directory_entries:
+                for directory_entry in directory_entries:
+                    if directory_entry.name.endswith(INDEX_FILE_SUFFIX):
+                        os.remove(directory_entry.path)
+        for document_id in document_ids:
+            if document_id in self._document_entries:
+                self._write_document_file(directory, document_id)
+            else:
+                try:
+                    os.remove(os.path.join(directory, _get_file_name(document_id)))
+                except FileNotFoundError:
+                    pass
+        self.directory = directory
+        self._changed_document_ids = set()
+
+    @classmethod
+    def load(cls, directory: str | os.PathLike[str]) -> "TextIndex":
+        """Load an index saved to a directory, without indexing its documents again."""
+        text_index = cls()
+        directory = os.fspath(directory)
+        document_indexes = []
+        with os.scandir(directory) as directory_entries:
+            for directory_entry in directory_entries:
+                if directory_entry.name.endswith(INDEX_FILE_SUFFIX):
+                    with open(directory_entry.path, "rb") as f:
+                        document_indexes.append(pickle.load(f))
+        # Loaded documents are in the order of their ids
+        document_indexes.sort(key=lambda document_index: document_index[0])
+        for document_id, entries, postings in document_indexes:
+            text_index._insert_document(document_id, entries, postings)
+        text_index.directory = directory
+        return text_index
@@ -1,21 +1,602 @@
 # Copyright 2024-present Kensho Technologies, LLC.
 """Helper functions useful across modules."""
 
+import json
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import cache
 from logging import getLogger
-from typing import Any
+from typing import Annotated, Any, Callable, Sequence, TypeVar, Union
 
 # pylint: disable=no-name-in-module
+from pydantic import BaseModel, Field, TypeAdapter
 from pydantic_core._pydantic_core import ValidationError as PydanticValidationError
 
-from .extract_output_models import ExtractOutputModel
+from .constants import (
+    ANNOTATIONS_KEY,
+    CHILDREN_KEY,
+    CONTENT_TREE_KEY,
+    OUTPUT_KEY,
+    AnnotationType,
+)
+from .extract_output_models import (
+    COMPACT_LOCATIONS_CONTEXT_KEY,
+    LAZY_TEXT_NODE_DATA_CONTEXT_KEY,
+    AnnotationDataModel,
+    AnnotationModel,
+    CompactLocations,
+    ContentModel,
+    ExtractOutputModel,
+    ExtractOutputWrapperModel,
+    LazyTextNodeDataModel,
+    LocationModel,
+    PDFPageModel,
+    RelationAnnotationDataModel,
+    RelationAnnotationModel,
+    SerializedDocumentType,
+    TableStructureAnnotationModel,
+    TextNodeDataModel,
+)
 
 logger = getLogger(__name__)
 
+ModelType = TypeVar("ModelType", bound=BaseModel)
+IndexType = TypeVar("IndexType")
 
-def load_output_to_pydantic(serialized_document: dict[str, Any]) -> ExtractOutputModel:
-    """Convert output JSON format to pydantic model."""
+DEFAULT_PARSED_DOCUMENT_CACHE_MAX_ENTRIES = 16
+# Default bound of the approximate memory of the cached parsed documents, in bytes
+DEFAULT_PARSED_DOCUMENT_CACHE_MAX_SIZE = 256 << 20
+# Approximate memory of the parsed models, in bytes
+_CONTENT_SIZE_ESTIMATE = 700
+_ANNOTATION_SIZE_ESTIMATE = 1150
+_LOCATION_SIZE_ESTIMATE = 1000
+_COMPACT_LOCATION_SIZE_ESTIMATE = 20
+_TEXT_NODE_DATA_CHARACTER_SIZE_ESTIMATE = 40
+
+_TABLE_STRUCTURE_ANNOTATION_TYPES = (
+    AnnotationType.TABLE_STRUCTURE.value,
+    AnnotationType.FIGURE_EXTRACTED_TABLE_STRUCTURE.value,
+)
+_object_setattr = object.__setattr__
+
+
+def _construct_model(model_class: type[ModelType], values: dict[str, Any]) -> ModelType:
+    """Create a model from the trusted values of all its fields, as model_construct does.
+
+    model_construct handles defaults, aliases and extra values, which makes it slower than
+    validation. The values here are already complete, so only the model attributes are set.
+    """
+    model = model_class.__new__(model_class)
+    _object_setattr(model, "__dict__", values)
+    _object_setattr(model, "__pydantic_fields_set__", set(values))
+    _object_setattr(model, "__pydantic_extra__", None)
+    _object_setattr(model, "__pydantic_private__", None)
+    return model
+
+
+def _construct_location(location: dict[str, Any]) -> LocationModel:
+    """Build a location without validation."""
+    return _construct_model(
+        LocationModel,
+        {
+            "height": location["height"],
+            "width": location["width"],
+            "x": location["x"],
+            "y": location["y"],
+            "page_number": location["page_number"],
+        },
+    )
+
+
+def _construct_locations(
+    locations: list[dict[str, Any]] | None, compact_locations: bool
+) -> Sequence[LocationModel] | None:
+    """Build locations without validation."""
+    if locations is None:
+        return None
+    location_models = [_construct_location(location) for location in locations]
+    if compact_locations:
+        return CompactLocations.from_locations(location_models)
+    return location_models
+
+
+def _construct_text_node_data(
+    text_node_data: dict[str, Any] | None, compact_locations: bool
+) -> TextNodeDataModel | None:
+    """Build text node data without validation."""
+    if text_node_data is None:
+        return None
+    text_locations = text_node_data["text_locations"]
+    if text_locations is not None:
+        if compact_locations and all(
+            location is not None for location in text_locations
+        ):
+            text_locations = _construct_locations(text_locations, compact_locations)
+        else:
+            text_locations = [
+                None if location is None else _construct_location(location)
+                for location in text_locations
+            ]
+    character_offsets = text_node_data["character_offsets"]
+    if compact_locations and character_offsets is not None:
+        character_offsets = [
+            None if offsets is None else array("f", offsets)
+            for offsets in character_offsets
+        ]
+    return _construct_model(
+        TextNodeDataModel,
+        {
+            "texts": text_node_data["texts"],
+            "text_locations": text_locations,
+            "character_offsets": character_offsets,
+        },
+    )
+
+
+def _construct_content(
+    content: dict[str, Any], compact_locations: bool
+) -> ContentModel:
+    """Build a content node and its descendants without validation."""
+    return _construct_model(
+        ContentModel,
+        {
+            "uid": content["uid"],
+            "type": content["type"],
+            "content": content["content"],
+            "children": [
+                _construct_content(child, compact_locations)
+                for child in content["children"]
+            ],
+            "locations": _construct_locations(
+                content.get("locations"), compact_locations
+            ),
+            "text_node_data": _construct_text_node_data(
+                content.get("text_node_data"), compact_locations
+            ),
+        },
+    )
+
+
+def _construct_annotation(
+    annotation: dict[str, Any], compact_locations: bool
+) -> AnnotationModel:
+    """Build an annotation without validation, dispatching on its type."""
+    annotation_type = annotation["type"]
+    data = annotation["data"]
+    if annotation_type == AnnotationType.RELATION.value:
+        return _construct_model(
+            RelationAnnotationModel,
+            {
+                "data": _construct_model(
+                    RelationAnnotationDataModel,
+                    {
+                        "relation_type": data["relation_type"],
+                        "source_content_uid": data["source_content_uid"],
+                        "target_content_uid": data["target_content_uid"],
+                    },
+                ),
+                "type": annotation_type,
+            },
+        )
+    if annotation_type in _TABLE_STRUCTURE_ANNOTATION_TYPES:
+        return _construct_model(
+            TableStructureAnnotationModel,
+            {
+                "content_uids": annotation["content_uids"],
+                "data": _construct_model(
+                    AnnotationDataModel,
+                    {
+                        "index": tuple(data["index"]),
+                        "span": tuple(data["span"]),
+                        "value": data.get("value"),
+                        "is_column_header": data.get("is_column_header", False),
+                        "is_projected_row_header": data.get(
+                            "is_projected_row_header", False
+                        ),
+                    },
+                ),
+                "type": annotation_type,
+                "locations": _construct_locations(
+                    annotation.get("locations"), compact_locations
+                ),
+            },
+        )
+    raise ValueError(f"Unsupported annotation type {annotation_type}")
+
+
+def _construct_output_model(
+    serialized_document: dict[str, Any], compact_locations: bool
+) -> ExtractOutputModel:
+    """Build the pydantic model of trusted output without validation."""
+    pdf_pages = serialized_document.get("pdf_pages")
+    parsed_serialized_document = _construct_model(
+        ExtractOutputModel,
+        {
+            "annotations": [
+                _construct_annotation(annotation, compact_locations)
+                for annotation in serialized_document["annotations"]
+            ],
+            "content_tree": _construct_content(
+                serialized_document["content_tree"], compact_locations
+            ),
+            "pdf_pages": (
+                None
+                if pdf_pages is None
+                else [
+                    _construct_model(
+                        PDFPageModel,
+                        {
+                            "height": pdf_page["height"],
+                            "width": pdf_page["width"],
+                            "required_ccw_rotation": pdf_page["required_ccw_rotation"],
+                        },
+                    )
+                    for pdf_page in pdf_pages
+                ]
+            ),
+        },
+    )
+    if compact_locations:
+        parsed_serialized_document.share_location_arrays()
+    return parsed_serialized_document
+
+
+def _estimate_locations_size(locations: Sequence[LocationModel] | None) -> int:
+    """Estimate the memory of the locations of a node or annotation."""
+    if locations is None:
+        return 0
+    if isinstance(locations, CompactLocations):
+        return _COMPACT_LOCATION_SIZE_ESTIMATE * len(locations)
+    return _LOCATION_SIZE_ESTIMATE * len(locations)
+
+
+def _estimate_parsed_document_size(
+    parsed_serialized_document: ExtractOutputModel,
+) -> int:
+    """Estimate the memory of a parsed document, without the text node data not read yet."""
+    size = 0
+    content_stack = [parsed_serialized_document.content_tree]
+    while content_stack:
+        content = content_stack.pop()
+        size += (
+            _CONTENT_SIZE_ESTIMATE
+            + len(content.content or "")
+            + _estimate_locations_size(content.locations)
+        )
+        text_node_data = content.text_node_data
+        if text_node_data is not None and not (
+            isinstance(text_node_data, LazyTextNodeDataModel)
+            and not text_node_data.is_parsed
+        ):
+            size += _TEXT_NODE_DATA_CHARACTER_SIZE_ESTIMATE * sum(
+                len(text) for text in text_node_data.texts or []
+            )
+        content_stack.extend(content.children)
+    for annotation in parsed_serialized_document.annotations:
+        size += _ANNOTATION_SIZE_ESTIMATE
+        if isinstance(annotation, TableStructureAnnotationModel):
+            size += _estimate_locations_size(annotation.locations)
+    return size
+
+
+def _get_document_fingerprint(serialized_document: dict[str, Any]) -> tuple[int, ...]:
+    """Get a cheap fingerprint of the top level of a serialized document.
+
+    It catches documents whose content tree or number of annotations or top level children
+    changed, not changes deeper in the document.
+    """
+    content_tree = serialized_document.get(CONTENT_TREE_KEY)
+    return (
+        id(content_tree),
+        len(serialized_document.get(ANNOTATIONS_KEY) or ()),
+        (
+            len(content_tree.get(CHILDREN_KEY) or ())
+            if isinstance(content_tree, dict)
+            else -1
+        ),
+    )
+
+
+# Identity of the serialized document, and the lazy_text_node_data and compact_locations options
+_ParsedDocumentCacheKey = tuple[int, bool, bool]
+
+
+@dataclass
+class _ParsedDocumentCacheEntry:
+    """Parsed document cached for a serialized document, with the indexes built from it."""
+
+    serialized_document: dict[str, Any]
+    fingerprint: tuple[int, ...]
+    parsed_serialized_document: ExtractOutputModel
+    validated: bool
+    size: int
+    indexes: dict[Callable[[ExtractOutputModel], Any], Any] = field(
+        default_factory=dict
+    )
+
+
+class _ParsedDocumentCache:
+    """Thread-safe LRU cache of parsed documents, keyed by the identity of the serialized document.
+
+    Entries hold a reference to their serialized document, so its identity is not reused while it
+    is cached. Documents are also keyed by the options they were loaded with, so callers get
+    documents loaded as they asked.
+    """
+
+    def __init__(self, max_entries: int, max_size: int) -> None:
+        """Bound the cache to max_entries documents and about max_size bytes."""
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self._entries: OrderedDict[
+            _ParsedDocumentCacheKey, _ParsedDocumentCacheEntry
+        ] = OrderedDict()
+        self._parsed_document_id_to_key: dict[int, _ParsedDocumentCacheKey] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _remove(self, key: _ParsedDocumentCacheKey) -> None:
+        """Remove an entry, with the lock held."""
+        entry = self._entries.pop(key)
+        del self._parsed_document_id_to_key[id(entry.parsed_serialized_document)]
+        self._size -= entry.size
+
+    def get(
+        self,
+        serialized_document: dict[str, Any],
+        lazy_text_node_data: bool,
+        compact_locations: bool,
+        validate: bool,
+    ) -> ExtractOutputModel | None:
+        """Get the cached parsed document, or None if it is not cached or changed."""
+        key = (id(serialized_document), lazy_text_node_data, compact_locations)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if (
+                entry.serialized_document is not serialized_document
+                or entry.fingerprint != _get_document_fingerprint(serialized_document)
+                or (validate and not entry.validated)
+            ):
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry.parsed_serialized_document
+
+    def put(
+        self,
+        serialized_document: dict[str, Any],
+        lazy_text_node_data: bool,
+        compact_locations: bool,
+        validated: bool,
+        parsed_serialized_document: ExtractOutputModel,
+    ) -> None:
+        """Cache a parsed document, removing the least recently used ones past the bounds."""
+        size = _estimate_parsed_document_size(parsed_serialized_document)
+        if size > self.max_size:
+            return
+        key = (id(serialized_document), lazy_text_node_data, compact_locations)
+        entry = _ParsedDocumentCacheEntry(
+            serialized_document=serialized_document,
+            fingerprint=_get_document_fingerprint(serialized_document),
+            parsed_serialized_document=parsed_serialized_document,
+            validated=validated,
+            size=size,
+        )
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._parsed_document_id_to_key[id(parsed_serialized_document)] = key
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def get_index(
+        self,
+        parsed_serialized_document: ExtractOutputModel,
+        build_index: Callable[[ExtractOutputModel], IndexType],
+    ) -> IndexType:
+        """Get an index of a parsed document, building it once per cached document."""
+        with self._lock:
+            key = self._parsed_document_id_to_key.get(id(parsed_serialized_document))
+            entry = None if key is None else self._entries[key]
+            if entry is not None and build_index in entry.indexes:
+                return entry.indexes[build_index]  # type: ignore[no-any-return]
+        index = build_index(parsed_serialized_document)
+        if entry is not None:
+            with self._lock:
+                entry.indexes.setdefault(build_index, index)
+        return index
+
+    def clear(self) -> None:
+        """Remove all cached documents."""
+        with self._lock:
+            self._entries.clear()
+            self._parsed_document_id_to_key.clear()
+            self._size = 0
+
+
+_parsed_document_cache: _ParsedDocumentCache | None = None
+
+
+def enable_parsed_document_cache(
+    max_entries: int = DEFAULT_PARSED_DOCUMENT_CACHE_MAX_ENTRIES,
+    max_size: int = DEFAULT_PARSED_DOCUMENT_CACHE_MAX_SIZE,
+) -> None:
+    """Cache the documents parsed by load_output_to_pydantic in memory, with their indexes.
+
+    Converters called again on the same serialized document dictionary, with the same loading
+    options, then reuse its parsed document and the indexes built from it, without validating it
+    again. Documents are keyed by their identity, so cached documents are only valid as long as
+    the dictionary is not changed in place. A cheap fingerprint of the top level catches replaced
+    content trees and added or removed annotations or top level children, but not deeper
+    changes, so call clear_parsed_document_cache after changing a cached document.
+
+    The cache is thread-safe, and the cached documents are shared between threads, which may read
+    their lazy text node data at the same time. Enabling it again replaces it with an empty cache.
+
+    Args:
+        max_entries: the maximum number of cached documents
+        max_size: the maximum approximate memory of the cached parsed documents, in bytes.
+            Text node data that was not read yet is not counted.
+    """
+    global _parsed_document_cache  # pylint: disable=global-statement
+    _parsed_document_cache = _ParsedDocumentCache(max_entries, max_size)
+
+
+def disable_parsed_document_cache() -> None:
+    """Stop caching parsed documents and release the cached ones."""
+    global _parsed_document_cache  # pylint: disable=global-statement
+    _parsed_document_cache = None
+
+
+def clear_parsed_document_cache() -> None:
+    """Release the cached parsed documents, keeping the cache enabled."""
+    if _parsed_document_cache is not None:
+        _parsed_document_cache.clear()
+
+
+def _get_document_index(
+    parsed_serialized_document: ExtractOutputModel,
+    build_index: Callable[[ExtractOutputModel], IndexType],
+) -> IndexType:
+    """Get an index built from a parsed document, reusing it if the document is cached.
+
+    Indexes are shared between calls, so they must not be modified.
+    """
+    parsed_document_cache = _parsed_document_cache
+    if parsed_document_cache is None:
+        return build_index(parsed_serialized_document)
+    return parsed_document_cache.get_index(parsed_serialized_document, build_index)
+
+
+def load_output_to_pydantic(
+    serialized_document: SerializedDocumentType,
+    lazy_text_node_data: bool = False,
+    compact_locations: bool = False,
+    validate: bool = True,
+) -> ExtractOutputModel:
+    """Convert output JSON format to pydantic model.
+
+    If the parsed document cache is enabled with enable_parsed_document_cache, a document parsed
+    before with the same lazy_text_node_data and compact_locations is returned from the cache.
+    Documents built without validation are only returned when validate is False.
+
+    Args:
+        serialized_document: a serialized document. Documents that are already loaded, for
+            example with load_output_from_json, are returned as is and the options are ignored.
+        lazy_text_node_data: if True, keep the text node data of every content as raw data and
+            validate it the first time one of its fields is read. This skips the validation of
+            the character offsets for callers that do not need them.
+        compact_locations: if True, store the node and table cell locations of the document in
+            a single float32 array, viewed as LocationModel objects on demand, and the character
+            offsets in float32 arrays. This cuts the memory of documents kept loaded.
+        validate: if False, trust that the output is well formed and build the models without
+            validating them. Malformed output then fails later, or converts to wrong results.
+            The text node data is not validated either, so lazy_text_node_data has no effect.
+
+    Returns:
+        the parsed document
+    """
+    if isinstance(serialized_document, ExtractOutputModel):
+        return serialized_document
+    parsed_document_cache = _parsed_document_cache
+    if parsed_document_cache is not None:
+        cached_parsed_serialized_document = parsed_document_cache.get(
+            serialized_document, lazy_text_node_data, compact_locations, validate
+        )
+        if cached_parsed_serialized_document is not None:
+            return cached_parsed_serialized_document
+    if not validate:
+        parsed_serialized_document = _construct_output_model(
+            serialized_document, compact_locations
+        )
+    else:
+        try:
+            parsed_serialized_document = ExtractOutputModel.model_validate(
+                serialized_document,
+                context={
+                    LAZY_TEXT_NODE_DATA_CONTEXT_KEY: lazy_text_node_data,
+                    COMPACT_LOCATIONS_CONTEXT_KEY: compact_locations,
+                },
+            )
+        except PydanticValidationError as e:
+            logger.error(
+                "Error parsing output due to its format. Please check the format."
+            )
+            raise e
+    if parsed_document_cache is not None:
+        parsed_document_cache.put(
+            serialized_document,
+            lazy_text_node_data,
+            compact_locations,
+            validate,
+            parsed_serialized_document,
+        )
+    return parsed_serialized_document
+
+
+@cache
+def _get_json_type_adapter() -> (
+    TypeAdapter[ExtractOutputWrapperModel | ExtractOutputModel]
+):
+    """Get the type adapter parsing JSON of either the wrapped output or the bare output."""
+    return TypeAdapter(
+        Annotated[
+            Union[ExtractOutputWrapperModel, ExtractOutputModel],
+            Field(union_mode="left_to_right"),
+        ]
+    )
+
+
+def load_output_from_json(
+    json_data: bytes | str | os.PathLike[str],
+    lazy_text_node_data: bool = False,
+    compact_locations: bool = False,
+    validate: bool = True,
+) -> ExtractOutputModel:
+    """Load Extract output directly from JSON to the pydantic model.
+
+    The JSON is parsed by pydantic, without building the intermediate Python dictionaries of
+    json.load. The loaded model can be passed to every converter in place of the dictionary.
+
+    Args:
+        json_data: the JSON bytes or string, or the path of a JSON file. The JSON is either the
+            output itself or an Extract response with the output in its "output" key.
+        lazy_text_node_data: as in load_output_to_pydantic
+        compact_locations: as in load_output_to_pydantic
+        validate: as in load_output_to_pydantic. Without validation, the JSON is parsed with
+            json.loads before building the models.
+
+    Returns:
+        the parsed document
+    """
+    if isinstance(json_data, os.PathLike):
+        with open(json_data, "rb") as f:
+            json_data = f.read()
+    if not validate:
+        serialized_document = json.loads(json_data)
+        if (
+            CONTENT_TREE_KEY not in serialized_document
+            and OUTPUT_KEY in serialized_document
+        ):
+            serialized_document = serialized_document[OUTPUT_KEY]
+        return _construct_output_model(serialized_document, compact_locations)
     try:
-        return ExtractOutputModel(**serialized_document)
+        parsed = _get_json_type_adapter().validate_json(
+            json_data,
+            context={
+                LAZY_TEXT_NODE_DATA_CONTEXT_KEY: lazy_text_node_data,
+                COMPACT_LOCATIONS_CONTEXT_KEY: compact_locations,
+            },
+        )
     except PydanticValidationError as e:
         logger.error("Error parsing output due to its format. Please check the format.")
         raise e
+    if isinstance(parsed, ExtractOutputWrapperModel):
+        return parsed.output
+    return parsed
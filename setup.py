@@ -15,6 +15,7 @@ setup(
     download_url="https://github.com/kensho-technologies/kenverters/archive/refs/tags/v_2_0_0.tar.gz",  # noqa:E501
     keywords=["Kensho Extract", "Python Toolkit"],
     install_requires=[
+        "numpy",
         "pandas",
         "pydantic",
     ],